@@ -0,0 +1,127 @@
+#-------------------------------------------------------------------------------
+# Name:        affinity_funcs.py
+# Purpose:     give each ECOSSE instance a core of its own, physical cores before hyperthread siblings
+# Author:      Mike Martin
+# Created:     17/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#!/usr/bin/env python
+
+__prog__ = 'affinity_funcs.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+import os
+from glob import glob
+from heapq import heappush, heappop
+from os.path import join, basename
+
+CPU_SYSFS = '/sys/devices/system/cpu'
+NODE_SYSFS = '/sys/devices/system/node'
+
+def _read_int(path, default):
+    try:
+        with open(path, 'r') as fobj:
+            return int(fobj.read().strip())
+    except (OSError, ValueError):
+        return default
+
+def _parse_cpulist(text):
+    """
+    expand a sysfs cpu list such as 0-3,8-11 into a list of cpu numbers
+    """
+    cpus = []
+    for part in text.strip().split(','):
+        if part == '':
+            continue
+        if '-' in part:
+            first, last = part.split('-')
+            cpus.extend(range(int(first), int(last) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+def _numa_nodes():
+    """
+    return a dictionary of cpu: NUMA node, empty if there is no NUMA information
+    """
+    nodes = {}
+    for node_dir in glob(join(NODE_SYSFS, 'node[0-9]*')):
+        node = int(basename(node_dir)[4:])
+        try:
+            with open(join(node_dir, 'cpulist'), 'r') as fobj:
+                for cpu in _parse_cpulist(fobj.read()):
+                    nodes[cpu] = node
+        except (OSError, ValueError):
+            continue
+    return nodes
+
+def placement_order(cpus):
+    """
+    order cpus for placement: one hardware thread per physical core first, taking NUMA nodes in turn so that
+    memory bandwidth is shared evenly, then the remaining hyperthread siblings in the same order
+    """
+    nodes = _numa_nodes()
+    cores = {}      # (package, core): cpus sharing the core
+    for cpu in sorted(cpus):
+        package = _read_int(join(CPU_SYSFS, 'cpu{}'.format(cpu), 'topology', 'physical_package_id'), 0)
+        core = _read_int(join(CPU_SYSFS, 'cpu{}'.format(cpu), 'topology', 'core_id'), cpu)
+        cores.setdefault((package, core), []).append(cpu)
+
+    order = []
+    sibling_rank = 0
+    while len(order) < len(cpus):
+        by_node = {}
+        for key in sorted(cores):
+            if sibling_rank < len(cores[key]):
+                cpu = cores[key][sibling_rank]
+                by_node.setdefault(nodes.get(cpu, 0), []).append(cpu)
+
+        # interleave the nodes
+        # ====================
+        node_lists = [by_node[node] for node in sorted(by_node)]
+        for irank in range(max(len(cpu_list) for cpu_list in node_lists)):
+            for cpu_list in node_lists:
+                if irank < len(cpu_list):
+                    order.append(cpu_list[irank])
+        sibling_rank += 1
+
+    return order
+
+class CorePool(object):
+    """
+    Pool of cpus this process may use, handed out in placement order
+    """
+    def __init__(self):
+
+        self.available = hasattr(os, 'sched_getaffinity') and hasattr(os, 'sched_setaffinity')
+        self.free = []
+        self.rank = {}
+        if not self.available:
+            return
+
+        for rank, cpu in enumerate(placement_order(os.sched_getaffinity(0))):
+            self.rank[cpu] = rank
+            heappush(self.free, (rank, cpu))
+
+    def pin(self, pid):
+        """
+        pin a process to the best free cpu, returns the cpu or None if none is free or pinning failed
+        """
+        if len(self.free) == 0:
+            return None
+
+        rank, cpu = heappop(self.free)
+        try:
+            os.sched_setaffinity(pid, {cpu})
+        except OSError:
+            heappush(self.free, (rank, cpu))
+            return None
+        return cpu
+
+    def release(self, cpu):
+        """
+        return a cpu to the pool once its instance has finished
+        """
+        if cpu is not None:
+            heappush(self.free, (self.rank[cpu], cpu))
@@ -0,0 +1,216 @@
+#-------------------------------------------------------------------------------
+# Name:        archive_funcs.py
+# Purpose:     pack the files of successful simulations into compressed archives with an index of cells
+# Author:      Mike Martin
+# Created:     17/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#!/usr/bin/env python
+
+__prog__ = 'archive_funcs.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+from collections import OrderedDict
+from fnmatch import fnmatch
+from glob import glob
+from os import makedirs, replace, scandir
+from os.path import join, basename, isfile
+from queue import Queue
+from threading import Thread, Lock
+from zipfile import ZipFile, ZIP_LZMA, ZIP_DEFLATED, ZIP_STORED
+
+ARCHIVE_CELLS = 1000        # cells per archive
+ARCHIVE_FILES = ['*']       # files of each cell archived
+COMPRESSIONS = {'lzma': ZIP_LZMA, 'zlib': ZIP_DEFLATED, 'none': ZIP_STORED}
+ARCHIVE_STEM = 'cells{}_{:06d}'     # writer suffix and archive number
+INDEX_FNAME = 'archive_index{}.tsv'
+INDEX_HEADER = 'lat_id\tlon_id\tsoil_id\tsubdir\tarchive\n'
+OPEN_ARCHIVES = 16          # archives kept open by a reader
+
+def cell_key(lat_id, lon_id, soil_id):
+    """
+    identifiers as strings without leading zeros, as taken from directory names by RunSites._parse_sim_dir, so
+    that cells can be looked up by numbers or strings
+    """
+    key = []
+    for ident in (lat_id, lon_id, soil_id):
+        ident = str(ident)
+        key.append(str(int(ident)) if ident.isdigit() else ident)
+    return tuple(key)
+
+class ArchiveWriter(object):
+    """
+    Appends the files of successful simulations to a series of zip archives of cells_per_archive cells each, in a
+    daemon thread fed by an unbounded queue so that the scheduler never waits on compression. Each cell's files
+    are members named <subdirectory>/<file name>. An archive is written to a temporary name and renamed once
+    complete, then its cells are appended to the index and reported by pop_archived so that their directories can
+    be deleted. Each process writing to the same directory must use its own suffix
+    """
+    def __init__(self, out_dir, suffix = '', cells_per_archive = ARCHIVE_CELLS, compression = 'lzma',
+                                                                                        patterns = ARCHIVE_FILES):
+        self.out_dir = out_dir
+        self.suffix = suffix
+        self.cells_per_archive = cells_per_archive
+        self.compression = COMPRESSIONS[compression]
+        self.patterns = patterns
+        makedirs(out_dir, exist_ok = True)
+        self.index_fname = join(out_dir, INDEX_FNAME.format(suffix))
+        if not isfile(self.index_fname):
+            with open(self.index_fname, 'w') as fobj:
+                fobj.write(INDEX_HEADER)
+
+        existing = glob(join(out_dir, ARCHIVE_STEM.format(suffix, 0)[:-6] + '[0-9]*.zip'))
+        self.next_archive = 1 + max([int(basename(fname)[-10:-4]) for fname in existing], default = -1)
+
+        self.zip_file = None
+        self.cells = []         # (key, subdir, sim_dir) in the archive being written
+        self.archived = []      # simulation directories in complete archives, not yet reported
+        self.num_archived = 0
+        self.errors = []
+        self.lock = Lock()
+        self.queue = Queue()
+        self.thread = Thread(target = self._work, daemon = True)
+        self.thread.start()
+
+    def add(self, sim_dir, lat_id, lon_id, soil_id):
+        """
+        queue a successful simulation directory for archiving
+        """
+        self.queue.put_nowait((sim_dir, cell_key(lat_id, lon_id, soil_id)))
+
+    def pop_archived(self):
+        """
+        simulation directories whose files are in complete archives since the last call
+        """
+        with self.lock:
+            archived = self.archived
+            self.archived = []
+        return archived
+
+    def depth(self):
+        """
+        number of cells waiting to be archived or in the archive being written
+        """
+        return self.queue.qsize() + len(self.cells)
+
+    def _work(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                self._finish_archive()
+                self.queue.task_done()
+                break
+            sim_dir, key = item
+            try:
+                self._add_cell(sim_dir, key)
+            except OSError as err:
+                with self.lock:
+                    self.errors.append('{}: {}'.format(sim_dir, err))
+            self.queue.task_done()
+
+    def _add_cell(self, sim_dir, key):
+
+        if self.zip_file is None:
+            self.stem = ARCHIVE_STEM.format(self.suffix, self.next_archive)
+            self.next_archive += 1
+            self.zip_file = ZipFile(join(self.out_dir, self.stem + '.zip.tmp'), 'w', self.compression)
+
+        subdir = basename(sim_dir)
+        with scandir(sim_dir) as entries:
+            fnames = sorted(entry.name for entry in entries
+                            if entry.is_file() and any(fnmatch(entry.name, pattern) for pattern in self.patterns))
+        for fname in fnames:
+            self.zip_file.write(join(sim_dir, fname), subdir + '/' + fname)
+        self.cells.append((key, subdir, sim_dir))
+
+        if len(self.cells) >= self.cells_per_archive:
+            self._finish_archive()
+
+    def _finish_archive(self):
+        """
+        complete the archive being written, index its cells and report their directories
+        """
+        if self.zip_file is None:
+            return
+        fname = self.stem + '.zip'
+        try:
+            self.zip_file.close()
+            replace(join(self.out_dir, fname + '.tmp'), join(self.out_dir, fname))
+            with open(self.index_fname, 'a') as fobj:
+                for key, subdir, sim_dir in self.cells:
+                    fobj.write('\t'.join(key + (subdir, fname)) + '\n')
+        except OSError as err:
+            with self.lock:
+                self.errors.append('{}: {}'.format(fname, err))
+        else:
+            with self.lock:
+                self.archived += [sim_dir for key, subdir, sim_dir in self.cells]
+                self.num_archived += len(self.cells)
+        self.zip_file = None
+        self.cells = []
+
+    def close(self):
+        """
+        archive all queued cells, complete the last archive and stop the thread
+        """
+        self.queue.put_nowait(None)
+        self.thread.join()
+
+class ArchiveReader(object):
+    """
+    Fetches files of archived cells by lat/lon/soil key. The indexes of all writers are read into a dictionary
+    when the reader is created; an archive's directory is read the first time one of its cells is fetched and
+    the most recently used archives are kept open, so a lookup does not depend on the number of cells archived
+    """
+    def __init__(self, archive_dir, max_open = OPEN_ARCHIVES):
+
+        self.archive_dir = archive_dir
+        self.max_open = max_open
+        self.index = {}
+        self.archives = OrderedDict()
+        for index_fname in sorted(glob(join(archive_dir, INDEX_FNAME.format('*')))):
+            with open(index_fname, 'r') as fobj:
+                next(fobj, None)
+                for line in fobj:
+                    fields = line.rstrip('\n').split('\t')
+                    if len(fields) == 5:
+                        self.index[tuple(fields[:3])] = (fields[3], fields[4])
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, key):
+        return cell_key(*key) in self.index
+
+    def keys(self):
+        return self.index.keys()
+
+    def _archive(self, fname):
+
+        if fname in self.archives:
+            self.archives.move_to_end(fname)
+            return self.archives[fname]
+        zip_file = ZipFile(join(self.archive_dir, fname), 'r')
+        self.archives[fname] = zip_file
+        if len(self.archives) > self.max_open:
+            self.archives.popitem(last = False)[1].close()
+        return zip_file
+
+    def read(self, lat_id, lon_id, soil_id, fname = 'SUMMARY.OUT'):
+        """
+        contents of a file of an archived cell as bytes, raises KeyError if the cell or file was not archived
+        """
+        subdir, archive_fname = self.index[cell_key(lat_id, lon_id, soil_id)]
+        return self._archive(archive_fname).read(subdir + '/' + fname)
+
+    def read_summary(self, lat_id, lon_id, soil_id):
+        """
+        SUMMARY.OUT of an archived cell as text
+        """
+        return self.read(lat_id, lon_id, soil_id).decode('utf-8', 'replace')
+
+    def close(self):
+        for zip_file in self.archives.values():
+            zip_file.close()
+        self.archives.clear()
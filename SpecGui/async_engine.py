@@ -0,0 +1,325 @@
+#-------------------------------------------------------------------------------
+# Name:        async_engine.py
+# Purpose:     asyncio alternative to the synchronous spec_run scheduler
+# Author:      Mike Martin
+# Created:     17/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#!/usr/bin/env python
+
+__prog__ = 'async_engine.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from os.path import join
+from time import time
+
+from capture_funcs import READ_SIZE, EOF_WAIT
+from metrics_funcs import wait_rusage
+from reap_funcs import POLL_INTERVAL
+from watchdog_funcs import signal_instance
+
+PROGRESS_INTERVAL = 1.0     # seconds between progress bar updates and concurrency adjustments
+KILL_WAIT = 10.0            # seconds to wait for a killed instance to exit before giving up on it
+
+class SlotLimiter(object):
+    """
+    Semaphore whose size can be changed while tasks are waiting on it
+    """
+    def __init__(self, limit):
+
+        self.limit = limit
+        self.active = 0
+        self.cond = asyncio.Condition()
+
+    async def acquire(self):
+        async with self.cond:
+            await self.cond.wait_for(lambda: self.active < self.limit)
+            self.active += 1
+
+    async def release(self):
+        async with self.cond:
+            self.active -= 1
+            self.cond.notify_all()
+
+    async def resize(self, limit):
+        async with self.cond:
+            self.limit = limit
+            self.cond.notify_all()
+
+class PipeReader(object):
+    """
+    Drains the stdout pipes of instances into their captures on the event loop, taking the place of CaptureReader
+    for the asyncio engine. Pipes may be added from any thread e.g. by RunSites._spawn in a launcher thread
+    """
+    def __init__(self, loop):
+
+        self.loop = loop
+        self.pipes = {}         # capture: pipe being read
+        self.eofs = {}          # capture: future set at end of file
+
+    def add(self, pipe, capture):
+        """
+        start draining the stdout pipe of a newly launched instance into its capture
+        """
+        self.loop.call_soon_threadsafe(self._connect, pipe, capture)
+
+    def _connect(self, pipe, capture):
+
+        os.set_blocking(pipe.fileno(), False)
+        self.pipes[capture] = pipe
+        self.loop.add_reader(pipe.fileno(), self._read, pipe, capture)
+
+    def _read(self, pipe, capture):
+        try:
+            data = os.read(pipe.fileno(), READ_SIZE)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b''
+        if len(data) > 0:
+            capture.feed(data)
+        else:
+            self.discard(capture)
+
+    def discard(self, capture):
+        """
+        stop reading an instance's output, at end of file or when the pipe is held open e.g. by a process ECOSSE
+        forked; the output read so far is kept
+        """
+        pipe = self.pipes.pop(capture, None)
+        if pipe is not None:
+            self.loop.remove_reader(pipe.fileno())
+            pipe.close()
+        capture.close()
+        eof = self.eofs.pop(capture, None)
+        if eof is not None and not eof.done():
+            eof.set_result(None)
+
+    async def wait_eof(self, capture, timeout):
+        """
+        wait for the last of an instance's output, giving up after timeout seconds
+        """
+        if capture.done.is_set():
+            return
+        eof = self.eofs.setdefault(capture, self.loop.create_future())
+        try:
+            await asyncio.wait_for(asyncio.shield(eof), timeout)
+        except asyncio.TimeoutError:
+            self.discard(capture)
+
+    def close(self):
+        for capture in list(self.pipes):
+            self.discard(capture)
+
+class AsyncEngine(object):
+    """
+    Drives ECOSSE instances from asyncio tasks - each cell is a task which launches ECOSSE with RunSites._spawn,
+    waits for it to exit with its own timeout and checks for success. Concurrency follows RunSites._get_max_inst
+    An instance is reaped with os.wait4 as soon as its pidfd shows it has exited, independently of its output
+    pipe, so that every wait is bounded even if a process ECOSSE forked holds the pipe open
+    Bookkeeping which touches the files of a cell or the state of RunSites e.g. staging out, collecting results
+    and journalling runs in a single worker thread, so that it is done in order and never holds up the event loop
+    """
+    def __init__(self, sim):
+
+        self.sim = sim
+        self.max_inst = None
+        self.bookkeeper = None
+        self.reader = None
+
+    def run(self, discovery):
+        """
+        run all simulations, returns the number of instances permitted at the end of the run
+        """
+        self.bookkeeper = ThreadPoolExecutor(max_workers = 1)
+        try:
+            asyncio.run(self._main(discovery))
+        finally:
+            self.bookkeeper.shutdown(wait = True)
+            self.bookkeeper = None
+        return self.max_inst
+
+    async def _book(self, func, *args):
+        """
+        run a bookkeeping function of RunSites in the bookkeeping thread
+        """
+        return await asyncio.get_event_loop().run_in_executor(self.bookkeeper, func, *args)
+
+    async def _main(self, discovery):
+
+        sim = self.sim
+        loop = asyncio.get_event_loop()
+        if sim.stdout_mode == 'capture':
+            self.reader = PipeReader(loop)
+            sim.capture_reader = self.reader
+        self.max_inst = sim._get_max_inst()
+        limiter = SlotLimiter(self.max_inst)
+        monitor = asyncio.ensure_future(self._monitor(limiter, discovery))
+
+        # tasks are only created when a slot is free so that memory use does not grow with the number of cells
+        # ======================================================================================================
+        tasks = set()
+        sim_num = 0
+        while True:
+            await limiter.acquire()
+            # getting a cell may hash its inputs and place cached outputs, so is never done on the event loop
+            # ===============================================================================================
+            subdir = await loop.run_in_executor(None, discovery.get, True)
+            if subdir is None:
+                await limiter.release()
+                break
+
+            sim_dir = join(sim.run_dir, subdir)
+            task = asyncio.ensure_future(self._run_cell(limiter, sim_num, sim_dir, discovery.ref_sys_flag))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            sim_num += 1
+
+        if len(tasks) > 0:
+            await asyncio.gather(*tasks)
+
+        monitor.cancel()
+        try:
+            await monitor
+        except asyncio.CancelledError:
+            pass
+
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
+            sim.capture_reader = None
+
+    async def _monitor(self, limiter, discovery):
+        """
+        periodically re-read the config file, record memo hits and archived cells, resize the limiter and report
+        progress; the progress report, which may write to the GUI socket, runs in a worker thread
+        """
+        sim = self.sim
+        loop = asyncio.get_event_loop()
+        last_time = time()
+        while True:
+            await self._book(sim._update_config)
+            await self._book(sim._update_priority)
+            await self._book(sim._drain_memo)
+            await self._book(sim._drain_archived)
+            self.max_inst = sim._get_max_inst()
+            await limiter.resize(self.max_inst)
+            last_time = await loop.run_in_executor(None, sim._update_progress, last_time, discovery.num_sims, [],
+                                                                                                    self.max_inst)
+            await asyncio.sleep(PROGRESS_INTERVAL)
+
+    async def _wait_exit(self, proc, timeout):
+        """
+        wait up to timeout seconds for an instance to exit and reap it, with its resource usage where os.wait4 is
+        available. Returns (return code, rusage), the return code is None if the instance is still running
+        """
+        loop = asyncio.get_event_loop()
+        deadline = loop.time() + timeout
+        pidfd = None
+        if hasattr(os, 'pidfd_open'):
+            try:
+                pidfd = os.pidfd_open(proc.pid)
+            except OSError:
+                pass    # not supported by the kernel, or already reaped
+
+        try:
+            while True:
+                retcode, rusage = wait_rusage(proc)
+                if retcode is not None:
+                    return retcode, rusage
+                left = deadline - loop.time()
+                if left <= 0:
+                    return None, None
+
+                if pidfd is None:
+                    await asyncio.sleep(min(left, POLL_INTERVAL))
+                    continue
+
+                # the pidfd becomes readable when the instance exits
+                # ==================================================
+                exited = loop.create_future()
+                loop.add_reader(pidfd, lambda: exited.done() or exited.set_result(None))
+                try:
+                    await asyncio.wait([exited], timeout = left)
+                finally:
+                    loop.remove_reader(pidfd)
+        finally:
+            if pidfd is not None:
+                os.close(pidfd)
+
+    async def _stop(self, proc, sim_dir):
+        """
+        terminate an instance which has overrun its timeout, killing it if it does not stop within the grace period
+        returns (return code, rusage) as _wait_exit, the return code is None if the instance could not be reaped
+        """
+        sim = self.sim
+        signal_instance(proc, False, sim.process_groups)
+        retcode, rusage = await self._wait_exit(proc, sim.kill_grace)
+        if retcode is None:
+            sim.lgr.error('Simulation did not stop within {}s of being terminated, killed: {}'
+                                                                                    .format(sim.kill_grace, sim_dir))
+            signal_instance(proc, True, sim.process_groups)
+            retcode, rusage = await self._wait_exit(proc, KILL_WAIT)
+            if retcode is None:
+                sim.lgr.error('Simulation did not exit within {}s of being killed, abandoned: {}'
+                                                                                        .format(KILL_WAIT, sim_dir))
+        if sim.process_groups:
+            signal_instance(proc, True, True)
+        return retcode, rusage
+
+    async def _run_cell(self, limiter, sim_num, sim_dir, ref_sys_flag):
+        """
+        launch one ECOSSE instance, wait for it to finish or time out, then check for success
+        """
+        sim = self.sim
+        loop = asyncio.get_event_loop()
+        try:
+            try:
+                proc, stdout_path, work_dir, capture = await loop.run_in_executor(None, sim._spawn, sim_dir)
+            except OSError as err:
+                sim.lgr.error('Instance {} ({}) could not be launched: {}: {}'.format(sim_num, sim_dir, sim.cmd, err))
+                await self._book(sim._launch_failed, sim_dir)
+                return
+
+            inst = await self._book(sim._new_instance, proc, sim_num, sim_dir, stdout_path, ref_sys_flag, work_dir)
+            inst.capture = capture
+
+            retcode, inst.rusage = await self._wait_exit(proc, inst.timeout)
+            if retcode is None:
+                # ECOSSE has probably hung trying to spin-up
+                # ==========================================
+                sim.lgr.error('Simulation timed out: {}'.format(sim_dir))
+                retcode, inst.rusage = await self._stop(proc, sim_dir)
+                inst.end_time = time()
+                inst.exit_status = retcode
+                inst.successful = False
+                inst.timed_out = True
+            else:
+                inst.end_time = time()
+                inst.exit_status = retcode
+                if capture is not None:
+                    await self.reader.wait_eof(capture, EOF_WAIT)
+                if retcode != 0:
+                    sim.lgr.error('Instance failed giving return code: {} (instance {}) ({}) '
+                                                                            .format(retcode, sim_num, sim_dir))
+                    inst.successful = False
+                elif not await loop.run_in_executor(None, sim._sim_successful, inst):
+                    sim.lgr.error('Instance failed: (instance {}) ({}). Please check {} for details'
+                                                                            .format(sim_num, sim_dir, stdout_path))
+                    inst.successful = False
+                else:
+                    sim.lgr.info('Simulation sucessful: {} (instance {})'.format(sim_dir, sim_num))
+                    inst.successful = True
+
+            if not inst.successful:
+                sim.lgr.error('Simulation failed: {0}'.format(sim_dir))
+            if capture is not None:
+                await self.reader.wait_eof(capture, EOF_WAIT)
+            inst.finished = True
+            await self._book(sim._finish_inst, inst)
+        finally:
+            await limiter.release()
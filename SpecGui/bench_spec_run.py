@@ -0,0 +1,359 @@
+#-------------------------------------------------------------------------------
+# Name:        bench_spec_run.py
+# Purpose:     measure spec_run scheduler overhead using a stand-in for the ECOSSE executable
+# Author:      Mike Martin
+# Created:     17/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#!/usr/bin/env python
+
+__prog__ = 'bench_spec_run.py'
+__version__ = '0.0.3'
+__author__ = 's03mm5'
+
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from json import dump as json_dump
+from os import chmod, makedirs, environ, getcwd, chdir
+from os.path import join, isfile, isdir, abspath, dirname, split
+from resource import getrusage, RUSAGE_CHILDREN
+from shutil import rmtree
+from subprocess import Popen, PIPE, STDOUT
+from sys import executable
+from tempfile import mkdtemp
+from time import time, process_time
+
+from spec_run import RunSites
+from input_output_funcs import check_ecosse_success, SUCCESS_MARKER
+from fake_ecosse import FAKE_CONFIG_ENV, DEFAULT_CONFIG, DISTRIBUTIONS
+
+BENCH_MODES = {'poll': {'wait_mode': 'poll'}, 'event': {'wait_mode': 'event'}, 'asyncio': {'engine': 'asyncio'},
+               'pinned': {'pin_cpus': True}, 'capture': {'stdout_mode': 'capture'}}
+LAYOUTS = ['latlon', 'osgb']
+OSGB_SQUARES = ['NS', 'NT', 'NU', 'NX', 'NY', 'NZ', 'SD', 'SE', 'SJ', 'SK']
+STUDY = 'bench_study'
+
+# lat/lon cells are laid out over 50N to 60N, 10W to 0E on the 30 arc second grid used in directory names
+# ========================================================================================================
+BENCH_BBOX = [-10.0, 50.0, 0.0, 60.0]
+GRANULARITY = 120
+
+def make_sims_tree(sims_dir, num_cells, layout = 'latlon', soils = 1, input_file = True):
+    """
+    create a simulations directory of num_cells cell directories named as Global Ecosse names them, together with
+    a study definition file; each lat/lon or OSGB location has soils cell directories, one per dominant soil
+    if input_file is True each cell is given an input.txt as read by a limited data run
+    """
+    nrows = int((BENCH_BBOX[3] - BENCH_BBOX[1]) * GRANULARITY)
+    ncols = int((BENCH_BBOX[2] - BENCH_BBOX[0]) * GRANULARITY)
+    num_locations = -(-num_cells // soils)
+    stride = max(1, (nrows * ncols) // num_locations)
+
+    makedirs(sims_dir, exist_ok = True)
+    icell = 0
+    for iloc in range(num_locations):
+        for isoil in range(1, soils + 1):
+            if icell >= num_cells:
+                break
+            if layout == 'latlon':
+                ipos = iloc * stride
+                lat_id = int((90.0 - BENCH_BBOX[3]) * GRANULARITY) + ipos // ncols
+                lon_id = int((180.0 + BENCH_BBOX[0]) * GRANULARITY) + ipos % ncols
+                subdir = 'lat{:07d}_lon{:07d}_mu{:05d}_s{:02d}'.format(lat_id, lon_id, 1 + iloc % 97, isoil)
+            else:
+                square = OSGB_SQUARES[(iloc // 1000000) % len(OSGB_SQUARES)]
+                subdir = '{}{:03d}{:03d}_s{:02d}'.format(square, (iloc % 1000000) // 1000, iloc % 1000, isoil)
+
+            cell_dir = join(sims_dir, subdir)
+            makedirs(cell_dir, exist_ok = True)
+            if input_file:
+                with open(join(cell_dir, 'input.txt'), 'w') as fobj:
+                    fobj.write('fake ECOSSE input\n')
+            icell += 1
+
+        if iloc > 0 and iloc % 100000 == 0:
+            print('Created {} of {} cells'.format(icell, num_cells))
+
+    study_defn = {'studyDefn': {'bbox': BENCH_BBOX, 'resolution': 0.5, 'cropName': 'Unknown', 'land_use': 'bench',
+                    'luCsvFname': '', 'province': 'bench', 'climScnr': 'bench', 'futStrtYr': 2001, 'futEndYr': 2010,
+                    'study': STUDY, 'version': __version__}}
+    with open(join(split(sims_dir)[0], STUDY + '_study_definition.txt'), 'w') as fobj:
+        json_dump(study_defn, fobj, indent = 2)
+
+def install_fake_ecosse(bench_dir, fake_config):
+    """
+    copy the stand-in executable into the benchmark directory with a shebang naming this interpreter
+    and write its config file; returns the path of the executable
+    """
+    src_path = join(dirname(abspath(__file__)), 'fake_ecosse.py')
+    with open(src_path, 'r') as fobj:
+        lines = fobj.readlines()
+
+    exe_path = join(bench_dir, 'fake_ecosse.py')
+    with open(exe_path, 'w') as fobj:
+        fobj.write('#!{} -S\n'.format(executable))     # -S: no site packages, for a faster start
+        fobj.writelines(lines[1:])
+    chmod(exe_path, 0o755)
+
+    config_path = join(bench_dir, 'fake_ecosse.json')
+    with open(config_path, 'w') as fobj:
+        json_dump(fake_config, fobj, indent = 2)
+    environ[FAKE_CONFIG_ENV] = config_path
+
+    return exe_path
+
+def _write_config(bench_dir, sims_dir, exe_path, use_cpus, mode, timeout, limited_data):
+    """
+    write a spec_run config file for the benchmark, mode selects the Speed settings under test
+    """
+    config = {
+        'General': {'config_check_interval': 3600, 'cropName': 'limited_data' if limited_data else 'bench'},
+        'Simulations': {'delete_sim_dirs': False, 'exepath': exe_path, 'output_variables': [],
+                        'resume_frm_prev': False, 'sims_dir': sims_dir, 'timeout': timeout,
+                        'output_dir': join(bench_dir, 'results_' + mode)},
+        'Speed': {'use_cpus': use_cpus, 'fast': 1, 'slow': 1, 'workdays': [], 'start_work': '09:10',
+                  'end_work': '17:00'},
+        'Logging': {'log_dir': bench_dir, 'level': 'INFO'}
+    }
+    config['Speed'].update(BENCH_MODES[mode])
+    config_file = join(bench_dir, 'bench_config_{}.json'.format(mode))
+    with open(config_file, 'w') as fconfig:
+        json_dump(config, fconfig, indent=2, sort_keys=True)
+
+    return config_file
+
+def _read_events(events_log):
+    """
+    start and end times of the cells which completed, from the log appended to by the stand-in executable
+    """
+    events = []
+    if isfile(events_log):
+        with open(events_log, 'r') as fobj:
+            for line in fobj:
+                parts = line.split('\t')
+                if len(parts) == 3:
+                    events.append((float(parts[0]), float(parts[1])))
+    return events
+
+def run_benchmark(num_cells, use_cpus, modes, fake_config, layout = 'latlon', timeout = 600, sims_dir = None,
+                                                                                    soils = 1, limited_data = True):
+    """
+    run the same synthetic study once per mode and report, for each:
+        cells/sec           - cells finished per second of wall time
+        sched CPU           - cpu time used by spec_run itself, including its threads
+        sched share         - spec_run cpu time as a percentage of all cpu time used, including the instances
+        first launch        - seconds from the start of the run to the start of the first instance
+        slot idle           - percentage of slot time, slots x makespan, in which no instance was running
+                              start-up of the stand-in interpreter counts as idle, as do hung instances
+    modes are keys of BENCH_MODES; an existing simulations directory made by this harness can be reused
+    """
+    bench_dir = mkdtemp(prefix = 'spec_bench_')
+    results = {}
+    try:
+        if sims_dir is None:
+            sims_dir = join(bench_dir, STUDY)
+            gen_start = time()
+            make_sims_tree(sims_dir, num_cells, layout, soils, limited_data)
+            print('Created {} {} cells in {:.1f}s'.format(num_cells, layout, time() - gen_start))
+
+        for mode in modes:
+            events_log = join(bench_dir, 'events_{}.txt'.format(mode))
+            config = dict(fake_config, events_log = events_log)
+            exe_path = install_fake_ecosse(bench_dir, config)
+            config_file = _write_config(bench_dir, sims_dir, exe_path, use_cpus, mode, timeout, limited_data)
+            sim = RunSites(config_file)
+
+            wall_start = time()
+            cpu_start = process_time()
+            child_start = getrusage(RUSAGE_CHILDREN)
+            sim.run_ecosse()
+            wall = time() - wall_start
+            cpu = process_time() - cpu_start
+            child_end = getrusage(RUSAGE_CHILDREN)
+            child_cpu = (child_end.ru_utime - child_start.ru_utime) + (child_end.ru_stime - child_start.ru_stime)
+
+            events = _read_events(events_log)
+            slots = sim._get_max_inst()
+            first_launch = min(start for start, end in events) - wall_start if events else None
+            busy = sum(end - start for start, end in events)
+            idle = 100.0 * (1.0 - busy / (slots * wall))
+
+            results[mode] = {'wall': wall, 'cpu': cpu, 'cpu_share': 100.0 * cpu / max(cpu + child_cpu, 1e-9),
+                             'cells_per_sec': sim.completed / wall, 'first_launch': first_launch,
+                             'slot_idle': idle, 'slots': slots, 'completed': sim.completed, 'failed': sim.failed}
+    finally:
+        rmtree(bench_dir, ignore_errors = True)
+
+    print('\n\n{:<8}{:>10}{:>12}{:>14}{:>12}{:>14}{:>12}{:>10}'.format('mode', 'wall (s)', 'cells/sec',
+                                    'sched CPU (s)', 'sched share', 'first launch', 'slot idle', 'failed'))
+    for mode, res in results.items():
+        first_launch = '-' if res['first_launch'] is None else '{:.3f}s'.format(res['first_launch'])
+        print('{:<8}{:>10.2f}{:>12.1f}{:>14.2f}{:>11.1f}%{:>14}{:>11.1f}%{:>10}'.format(mode, res['wall'],
+                res['cells_per_sec'], res['cpu'], res['cpu_share'], first_launch, res['slot_idle'], res['failed']))
+
+    return results
+
+def _line_scan(stdout_path):
+    """
+    original success check: read the whole file line by line from the top
+    """
+    with open(stdout_path, 'r') as outfile:
+        for line in outfile:
+            if line.find(SUCCESS_MARKER) != -1:
+                return True
+    return False
+
+def run_scan_benchmark(size_mb, num_files):
+    """
+    compare full line scans and tail scans of ECOSSE redirected output files of roughly size_mb megabytes
+    """
+    bench_dir = mkdtemp(prefix = 'spec_scan_')
+    spin_up = ' Spin-up iteration {:6d}  SOC change {:12.6f}  converged F\n'
+    try:
+        paths = []
+        for ifile in range(num_files):
+            stdout_path = join(bench_dir, 'stdout_{}.txt'.format(ifile))
+            with open(stdout_path, 'w') as fobj:
+                nlines = int(size_mb * 1048576 / len(spin_up.format(0, 0.0)))
+                for iline in range(nlines):
+                    fobj.write(spin_up.format(iline, 1.0 / (iline + 1)))
+                fobj.write('\n ' + SUCCESS_MARKER + '\n')
+            paths.append(stdout_path)
+
+        results = {}
+        for name, func in (('full', _line_scan), ('tail', check_ecosse_success)):
+            wall_start = time()
+            if not all(func(stdout_path) for stdout_path in paths):
+                print('*** Error *** {} scan failed to find success phrase'.format(name))
+            results[name] = (time() - wall_start) / num_files
+    finally:
+        rmtree(bench_dir, ignore_errors = True)
+
+    print('\n{:<8}{:>16}'.format('scan', 'ms per file'))
+    for name, secs in results.items():
+        print('{:<8}{:>16.3f}'.format(name, secs * 1000.0))
+
+    return results
+
+def _spawn_chdir(exe_path, work_dir):
+    """
+    original launch: change into the working directory around Popen, only safe from one thread
+    """
+    cwd = getcwd()
+    chdir(work_dir)
+    try:
+        with open('stdout.txt', 'w') as fstdout:
+            proc = Popen(exe_path, shell = False, stdin = PIPE, stdout = fstdout, stderr = STDOUT)
+    finally:
+        chdir(cwd)
+    proc.stdin.write(b'1\n')
+    proc.stdin.close()
+    return proc
+
+def _spawn_cwd(exe_path, work_dir):
+    """
+    launch as spec_run does now: the working directory is passed to Popen
+    """
+    with open(join(work_dir, 'stdout.txt'), 'w') as fstdout:
+        proc = Popen(exe_path, shell = False, stdin = PIPE, stdout = fstdout, stderr = STDOUT, cwd = work_dir)
+    proc.stdin.write(b'1\n')
+    proc.stdin.close()
+    return proc
+
+def run_spawn_benchmark(num_spawns, threads_list):
+    """
+    time launching num_spawns instances of the stand-in executable at once, as when many slots free up at the
+    change from slow to fast: serially changing directory, serially passing cwd and from launcher pools
+    only the launches are timed, the instances are then waited for before the next method is tried
+    """
+    bench_dir = mkdtemp(prefix = 'spec_spawn_')
+    results = {}
+    try:
+        exe_path = install_fake_ecosse(bench_dir, dict(DEFAULT_CONFIG, mean = 0.0, output_kb = 0))
+        work_dirs = []
+        for ispawn in range(num_spawns):
+            work_dir = join(bench_dir, 'cells', 'cell_{:06d}'.format(ispawn))
+            makedirs(work_dir)
+            work_dirs.append(work_dir)
+
+        methods = [('chdir', _spawn_chdir, 1), ('cwd', _spawn_cwd, 1)]
+        methods += [('cwd x{}'.format(nthreads), _spawn_cwd, nthreads) for nthreads in threads_list]
+        for name, func, nthreads in methods:
+            wall_start = time()
+            if nthreads == 1:
+                procs = [func(exe_path, work_dir) for work_dir in work_dirs]
+            else:
+                with ThreadPoolExecutor(max_workers = nthreads) as launcher:
+                    procs = list(launcher.map(lambda work_dir: func(exe_path, work_dir), work_dirs))
+            elapsed = time() - wall_start
+            for proc in procs:
+                proc.wait()
+            results[name] = {'secs': round(elapsed, 3), 'spawns_per_sec': round(num_spawns / elapsed, 1)}
+    finally:
+        rmtree(bench_dir, ignore_errors = True)
+
+    print('\n{:<12}{:>10}{:>12}'.format('launch', 'secs', 'spawns/s'))
+    for name, res in results.items():
+        print('{:<12}{:>10.3f}{:>12.1f}'.format(name, res['secs'], res['spawns_per_sec']))
+
+    return results
+
+def main():
+    """
+    Entry point
+    """
+    argparser = ArgumentParser(prog = __prog__, description = 'Benchmark the spec_run scheduler.')
+    argparser.add_argument('--cells', type = int, default = 1000, help = 'Number of synthetic cells.')
+    argparser.add_argument('--layout', choices = LAYOUTS, default = 'latlon', help = 'Cell directory naming.')
+    argparser.add_argument('--soils', type = int, default = 1, help = 'Cell directories per location.')
+    argparser.add_argument('--sims-dir', default = None,
+                        help = 'Reuse a simulations directory made by an earlier run rather than create one.')
+    argparser.add_argument('--site-specific', action = 'store_true',
+                        help = 'Site specific run mode: no input.txt per cell, halving the inodes created.')
+    argparser.add_argument('--cpus', type = int, default = 8, help = 'Value of use_cpus in the config file.')
+    argparser.add_argument('--modes', nargs = '+', default = ['poll', 'event', 'asyncio'],
+                        choices = sorted(BENCH_MODES), help = 'Scheduler modes to compare e.g. event pinned.')
+    argparser.add_argument('--duration', type = float, default = DEFAULT_CONFIG['mean'],
+                        help = 'Mean seconds each fake ECOSSE runs for.')
+    argparser.add_argument('--distribution', choices = DISTRIBUTIONS, default = DEFAULT_CONFIG['distribution'],
+                        help = 'Distribution of fake ECOSSE run times.')
+    argparser.add_argument('--spread', type = float, default = DEFAULT_CONFIG['spread'],
+                        help = 'Uniform: fraction either side of the mean; lognormal: sigma.')
+    argparser.add_argument('--burn', action = 'store_true', help = 'Fake ECOSSE burns cpu rather than sleeping.')
+    argparser.add_argument('--fail', type = float, default = 0.0, help = 'Fraction of cells which fail.')
+    argparser.add_argument('--hang', type = float, default = 0.0, help = 'Fraction of cells which hang.')
+    argparser.add_argument('--orphan', type = float, default = 0.0,
+                        help = 'Fraction of cells which leave a process holding their output open.')
+    argparser.add_argument('--output-kb', type = float, default = DEFAULT_CONFIG['output_kb'],
+                        help = 'Output written by each fake ECOSSE before the success phrase.')
+    argparser.add_argument('--timeout', type = int, default = 600, help = 'Value of timeout in the config file.')
+    argparser.add_argument('--json', default = None, help = 'Also write the results to this file.')
+    argparser.add_argument('--scan-mb', type = float, default = None,
+                help = 'Instead of the scheduler, benchmark success detection on stdout files of this size (MB).')
+    argparser.add_argument('--scan-files', type = int, default = 20, help = 'Number of stdout files to scan.')
+    argparser.add_argument('--spawn', type = int, default = None,
+                help = 'Instead of the scheduler, benchmark launching this many instances at once.')
+    argparser.add_argument('--spawn-threads', type = int, nargs = '+', default = [4, 8, 16],
+                help = 'Launcher pool sizes to compare.')
+    args = argparser.parse_args()
+
+    if args.scan_mb is not None:
+        results = run_scan_benchmark(args.scan_mb, args.scan_files)
+    elif args.spawn is not None:
+        results = run_spawn_benchmark(args.spawn, args.spawn_threads)
+    else:
+        if args.sims_dir is not None and not isdir(args.sims_dir):
+            print('Simulations directory {} does not exist'.format(args.sims_dir))
+            return
+        fake_config = dict(DEFAULT_CONFIG, distribution = args.distribution, mean = args.duration,
+                           spread = args.spread, burn = args.burn, fail_fraction = args.fail,
+                           hang_fraction = args.hang, orphan_fraction = args.orphan, output_kb = args.output_kb)
+        results = run_benchmark(args.cells, args.cpus, args.modes, fake_config, args.layout, args.timeout,
+                                args.sims_dir, args.soils, not args.site_specific)
+
+    if args.json is not None:
+        with open(args.json, 'w') as fobj:
+            json_dump(results, fobj, indent = 2)
+
+if __name__ == '__main__':
+    main()
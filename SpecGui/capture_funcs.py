@@ -0,0 +1,150 @@
+#-------------------------------------------------------------------------------
+# Name:        capture_funcs.py
+# Purpose:     keep ECOSSE output in memory, checking for the success phrase as it arrives
+# Author:      Mike Martin
+# Created:     17/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#!/usr/bin/env python
+
+__prog__ = 'capture_funcs.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+import os
+import selectors
+from socket import socketpair
+from threading import Thread, Lock, Event
+
+from input_output_funcs import SUCCESS_MARKER, TAIL_BYTES
+
+STDOUT_MODES = ['file', 'capture']
+READ_SIZE = 65536
+EOF_WAIT = 5.0      # seconds to wait for the last of the output once ECOSSE has exited
+
+class OutputCapture(object):
+    """
+    Ring buffer holding the last capacity bytes of one instance's output; the success phrase is looked for in
+    each piece of output as it is fed in, carrying over enough bytes to catch a phrase split between pieces
+    """
+    def __init__(self, capacity = TAIL_BYTES):
+
+        self.capacity = capacity
+        self.marker = bytes(SUCCESS_MARKER, 'ascii')
+        self.buf = bytearray()
+        self.carry = b''
+        self.found = False
+        self.lock = Lock()
+        self.done = Event()     # set at end of file
+
+    def feed(self, data):
+        with self.lock:
+            if not self.found:
+                window = self.carry + data
+                self.found = self.marker in window
+                self.carry = window[1 - len(self.marker):]
+            self.buf += data
+            if len(self.buf) > self.capacity:
+                del self.buf[:len(self.buf) - self.capacity]
+
+    def close(self):
+        self.done.set()
+
+    def successful(self, timeout = EOF_WAIT):
+        """
+        return True if the success phrase was seen, waiting for end of file so that no output is missed
+        """
+        self.done.wait(timeout)
+        return self.found
+
+    def write_tail(self, path):
+        """
+        write the captured output to a file, raises OSError if it cannot be written
+        """
+        with self.lock:
+            tail = bytes(self.buf)
+        with open(path, 'wb') as fobj:
+            fobj.write(tail)
+
+class CaptureReader(object):
+    """
+    A single thread draining the stdout pipes of all instances, so that no instance can block on a full pipe
+    however many are running and whatever the scheduler is doing. Pipes are handed over through a wakeup socket
+    since a selector must not be modified while another thread is blocked in it
+    """
+    def __init__(self):
+
+        self.selector = selectors.DefaultSelector()
+        self.wakeup_socks = socketpair()
+        for sock in self.wakeup_socks:
+            sock.setblocking(False)
+        self.selector.register(self.wakeup_socks[0], selectors.EVENT_READ, None)
+        self.lock = Lock()
+        self.incoming = []
+        self.stopping = False
+        self.thread = Thread(target = self._run, daemon = True)
+        self.thread.start()
+
+    def add(self, pipe, capture):
+        """
+        start draining the stdout pipe of a newly launched instance into its capture
+        """
+        os.set_blocking(pipe.fileno(), False)
+        with self.lock:
+            self.incoming.append((pipe, capture))
+        self._wake()
+
+    def _wake(self):
+        try:
+            self.wakeup_socks[1].send(b'\0')
+        except BlockingIOError:
+            pass        # wakeup already pending
+
+    def _run(self):
+        while True:
+            for key, mask in self.selector.select():
+                if key.data is None:
+                    self._accept()
+                    continue
+
+                pipe, capture = key.data
+                try:
+                    data = os.read(key.fd, READ_SIZE)
+                except BlockingIOError:
+                    continue
+                except OSError:
+                    data = b''
+                if len(data) > 0:
+                    capture.feed(data)
+                else:
+                    self.selector.unregister(key.fd)
+                    pipe.close()
+                    capture.close()
+
+            if self.stopping and len(self.selector.get_map()) == 1:
+                break
+
+    def _accept(self):
+        try:
+            while self.wakeup_socks[0].recv(4096):
+                pass
+        except (BlockingIOError, InterruptedError):
+            pass
+
+        with self.lock:
+            incoming, self.incoming = self.incoming, []
+        for pipe, capture in incoming:
+            self.selector.register(pipe.fileno(), selectors.EVENT_READ, (pipe, capture))
+
+    def close(self):
+        """
+        stop once all pipes have reached end of file, giving up on pipes held open e.g. by a hung instance
+        """
+        self.stopping = True
+        self._wake()
+        self.thread.join(EOF_WAIT)
+        if self.thread.is_alive():
+            return
+        self.selector.close()
+        for sock in self.wakeup_socks:
+            sock.close()
@@ -0,0 +1,101 @@
+#-------------------------------------------------------------------------------
+# Name:        cleanup_funcs.py
+# Purpose:     remove the directories of successful simulations in the background to stay within inode quotas
+# Author:      Mike Martin
+# Created:     17/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#!/usr/bin/env python
+
+__prog__ = 'cleanup_funcs.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+from os import makedirs, replace
+from os.path import join, split, isfile
+from queue import Queue
+from shutil import rmtree, move
+from threading import Thread, Lock
+
+DELETE_THREADS = 2
+
+class Deleter(object):
+    """
+    Removes simulation directories using a fixed number of daemon threads fed by an unbounded queue, so adding a
+    directory never blocks the scheduler. Directories are first held and only queued for deletion when release is
+    called i.e. once the results collector has written the chunk holding their outputs. Files named in keep are
+    moved to keep_dir as <subdirectory>_<file name> before the directory is removed
+    """
+    def __init__(self, nthreads = DELETE_THREADS, keep = None, keep_dir = None):
+
+        self.keep = [] if keep is None else keep
+        self.keep_dir = keep_dir
+        if len(self.keep) > 0:
+            makedirs(keep_dir, exist_ok = True)
+
+        self.held = []
+        self.queue = Queue()
+        self.lock = Lock()
+        self.num_deleted = 0
+        self.errors = []
+        self.threads = [Thread(target = self._work, daemon = True) for ithread in range(nthreads)]
+        for thread in self.threads:
+            thread.start()
+
+    def hold(self, sim_dir):
+        """
+        mark a simulation directory for deletion once results up to this point have been recorded
+        """
+        self.held.append(sim_dir)
+
+    def release(self):
+        """
+        queue all held directories for deletion
+        """
+        for sim_dir in self.held:
+            self.queue.put_nowait(sim_dir)
+        self.held = []
+
+    def depth(self):
+        """
+        number of directories held or waiting to be deleted
+        """
+        return len(self.held) + self.queue.qsize()
+
+    def _work(self):
+        while True:
+            sim_dir = self.queue.get()
+            if sim_dir is None:
+                self.queue.task_done()
+                break
+            try:
+                self._delete(sim_dir)
+            except OSError as err:
+                with self.lock:
+                    self.errors.append('{}: {}'.format(sim_dir, err))
+            else:
+                with self.lock:
+                    self.num_deleted += 1
+            self.queue.task_done()
+
+    def _delete(self, sim_dir):
+        subdir = split(sim_dir)[1]
+        for fname in self.keep:
+            if isfile(join(sim_dir, fname)):
+                move(join(sim_dir, fname), join(self.keep_dir, subdir + '_' + fname))
+
+        # rename first so that a partly deleted directory is never mistaken for a cell still to be run
+        # ============================================================================================
+        doomed = join(split(sim_dir)[0], '.deleting_' + subdir)
+        replace(sim_dir, doomed)
+        rmtree(doomed)
+
+    def close(self):
+        """
+        delete all held and queued directories then stop the threads
+        """
+        self.release()
+        for thread in self.threads:
+            self.queue.put_nowait(None)
+        for thread in self.threads:
+            thread.join()
@@ -0,0 +1,267 @@
+#-------------------------------------------------------------------------------
+# Name:        cluster_funcs.py
+# Purpose:     share out simulation directories on a shared filesystem between spec_run workers on several hosts
+# Author:      Mike Martin
+# Created:     17/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#!/usr/bin/env python
+
+__prog__ = 'cluster_funcs.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+from collections import deque
+from hmac import compare_digest
+from json import dumps as json_dumps, loads as json_loads
+from socket import socket, AF_INET, SOCK_STREAM, gethostname
+from socketserver import ThreadingTCPServer, BaseRequestHandler
+from struct import Struct
+from threading import Lock, Thread
+from time import sleep
+from os import getpid
+
+COORDINATOR_PORT = 65433    # the GUI listens on 65432
+COORDINATOR_BIND = '127.0.0.1'  # interface the coordinator listens on unless told otherwise
+BATCH_SIZE = 16
+RETRY_WAIT = 1.0            # seconds a worker waits before asking again when no cells are free
+HEADER = Struct('!I')       # every message is a 4 byte length followed by that many bytes of JSON
+
+def send_msg(sock, msg):
+    """
+    send one framed message
+    """
+    data = bytes(json_dumps(msg), 'utf-8')
+    sock.sendall(HEADER.pack(len(data)) + data)
+
+def _recv_exact(sock, nbytes):
+    chunks = []
+    while nbytes > 0:
+        chunk = sock.recv(min(nbytes, 65536))
+        if len(chunk) == 0:
+            return None
+        chunks.append(chunk)
+        nbytes -= len(chunk)
+    return b''.join(chunks)
+
+def recv_msg(sock):
+    """
+    receive one framed message, returns None if the connection has closed
+    """
+    header = _recv_exact(sock, HEADER.size)
+    if header is None:
+        return None
+    data = _recv_exact(sock, HEADER.unpack(header)[0])
+    if data is None:
+        return None
+    return json_loads(str(data, 'utf-8'))
+
+class Coordinator(object):
+    """
+    Owns the list of cells: hands out batches of simulation subdirectories to workers and records their results
+    Cells handed to a worker which disconnects before reporting them are handed out again. Workers must present
+    the shared token in their hello; each is served by a thread of its own, so the source of cells and the
+    bookkeeping of results, neither of which is thread safe, are only used under source_lock
+    """
+    def __init__(self, sim, discovery, token, port = COORDINATOR_PORT, bind = COORDINATOR_BIND):
+
+        self.sim = sim
+        self.discovery = discovery
+        self.token = token
+        self.lock = Lock()
+        self.source_lock = Lock()
+        self.requeued = deque()
+        self.outstanding = {}       # worker id: set of subdirs handed out and not yet reported
+        self.max_insts = {}         # worker id: number of instances the worker is currently running
+        self.num_results = 0
+        self.next_worker_id = 0
+
+        coordinator = self
+
+        class _Handler(BaseRequestHandler):
+            def handle(self):
+                coordinator._serve_worker(self.request, self.client_address)
+
+        ThreadingTCPServer.allow_reuse_address = True
+        ThreadingTCPServer.daemon_threads = True
+        self.server = ThreadingTCPServer((bind, port), _Handler)
+        self.port = self.server.server_address[1]
+        self.thread = Thread(target = self.server.serve_forever, daemon = True)
+        self.thread.start()
+
+    def _next_batch(self, nmax):
+        """
+        take up to nmax cells, requeued cells first; waits for discovery if none are ready
+        """
+        batch = []
+        with self.lock:
+            while len(batch) < nmax and len(self.requeued) > 0:
+                batch.append(self.requeued.popleft())
+
+        discovery = self.discovery
+        while len(batch) < nmax:
+            with self.source_lock:
+                subdir = discovery.get(len(batch) == 0, RETRY_WAIT)
+                if subdir is None and (len(batch) > 0 or discovery.exhausted or discovery.finished):
+                    break
+            if subdir is not None:
+                batch.append(subdir)
+        return batch
+
+    def _hello(self, sock, address):
+        """
+        the first message from a worker must be a hello carrying the shared token, returns the hello or None if
+        the worker is refused
+        """
+        msg = recv_msg(sock)
+        if isinstance(msg, dict) and msg.get('type') == 'hello' and isinstance(msg.get('token'), str) and \
+                                            compare_digest(bytes(msg['token'], 'utf-8'), bytes(self.token, 'utf-8')):
+            return msg
+
+        self.sim.lgr.warning('Refused connection from {}: no hello with the cluster token'.format(address[0]))
+        if msg is not None:
+            send_msg(sock, {'type': 'refused', 'reason': 'cluster token not accepted by the coordinator'})
+        return None
+
+    def _serve_worker(self, sock, address):
+        """
+        conversation with one worker: hello, then any number of requests and results
+        """
+        sim = self.sim
+        try:
+            hello = self._hello(sock, address)
+        except (OSError, ValueError) as err:
+            sim.lgr.warning('Refused connection from {}: {}'.format(address[0], err))
+            hello = None
+        if hello is None:
+            sock.close()
+            return
+
+        with self.lock:
+            worker_id = self.next_worker_id
+            self.next_worker_id += 1
+            self.outstanding[worker_id] = set()
+        sim.lgr.info('Worker {} connected from {} (host {} pid {})'.format(worker_id, address[0], hello.get('host'),
+                                                                                                hello.get('pid')))
+
+        try:
+            while True:
+                msg = recv_msg(sock)
+                if msg is None:
+                    break
+
+                if msg['type'] == 'request':
+                    self.max_insts[worker_id] = msg['max_inst']
+                    batch = self._next_batch(msg['nmax'])
+                    if len(batch) > 0:
+                        with self.lock:
+                            self.outstanding[worker_id].update(batch)
+                        send_msg(sock, {'type': 'batch', 'subdirs': batch,
+                                                                'ref_sys_flag': self.discovery.ref_sys_flag})
+                    elif self.is_complete() or not self._any_outstanding():
+                        send_msg(sock, {'type': 'done'})
+                    else:
+                        send_msg(sock, {'type': 'wait', 'secs': RETRY_WAIT})
+
+                elif msg['type'] == 'result':
+                    with self.source_lock:
+                        sim._record_remote(msg['subdir'], msg['event'])
+                    with self.lock:
+                        self.outstanding[worker_id].discard(msg['subdir'])
+                        self.num_results += 1
+        except (OSError, ValueError) as err:
+            sim.lgr.error('Lost worker {}: {}'.format(worker_id, err))
+        finally:
+            with self.lock:
+                lost = self.outstanding.pop(worker_id)
+                self.requeued.extend(sorted(lost))
+                self.max_insts.pop(worker_id, None)
+            if len(lost) > 0:
+                sim.lgr.warning('Worker {} disconnected, {} cells will be handed out again'.format(worker_id, len(lost)))
+            sock.close()
+
+    def _any_outstanding(self):
+        with self.lock:
+            return len(self.requeued) > 0 or any(len(subdirs) > 0 for subdirs in self.outstanding.values())
+
+    def is_complete(self):
+        return self.discovery.finished and self.num_results >= self.discovery.num_sims
+
+    def num_workers(self):
+        return len(self.outstanding)
+
+    def total_inst(self):
+        return sum(self.max_insts.values())
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+class RemoteSource(object):
+    """
+    Worker side: has the same interface as Discovery but takes its simulation subdirectories from a coordinator
+    and reports each outcome back to it
+    """
+    def __init__(self, sim, address, token, batch_size = BATCH_SIZE):
+
+        self.sim = sim
+        self.batch_size = batch_size
+        self.lock = Lock()
+        self.pending = deque()
+        self.ref_sys_flag = None
+        self.num_found = 0
+        self.num_sims = 0
+        self.finished = False
+        self.exhausted = False
+        self.error = None
+
+        host, port = address.rsplit(':', 1)
+        self.sock = socket(AF_INET, SOCK_STREAM)
+        self.sock.connect((host, int(port)))
+        send_msg(self.sock, {'type': 'hello', 'host': gethostname(), 'pid': getpid(), 'token': token})
+
+    def get(self, block = False, timeout = None):
+        """
+        return the next simulation directory, fetching a batch from the coordinator when none are pending
+        """
+        if len(self.pending) == 0 and not self.exhausted:
+            self._fetch(block, timeout)
+
+        if len(self.pending) == 0:
+            return None
+        return self.pending.popleft()
+
+    def _fetch(self, block, timeout):
+        try:
+            with self.lock:
+                send_msg(self.sock, {'type': 'request', 'nmax': self.batch_size, 'max_inst': self.sim._get_max_inst()})
+                reply = recv_msg(self.sock)
+        except OSError as err:
+            self.error = err
+            reply = None
+
+        if reply is None or reply['type'] in ('done', 'refused'):
+            if reply is not None and reply['type'] == 'refused':
+                self.error = reply['reason']
+            self.finished = True
+            self.exhausted = True
+        elif reply['type'] == 'batch':
+            self.ref_sys_flag = reply['ref_sys_flag']
+            self.pending.extend(reply['subdirs'])
+            self.num_found += len(reply['subdirs'])
+            self.num_sims += len(reply['subdirs'])
+        elif block:
+            sleep(reply['secs'] if timeout is None else min(reply['secs'], timeout))
+
+    def report(self, subdir, event):
+        """
+        send the outcome of a simulation to the coordinator
+        """
+        try:
+            with self.lock:
+                send_msg(self.sock, {'type': 'result', 'subdir': subdir, 'event': event})
+        except OSError as err:
+            self.sim.lgr.error('Could not report {} for {} to coordinator: {}'.format(event, subdir, err))
+
+    def close(self):
+        self.sock.close()
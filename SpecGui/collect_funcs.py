@@ -0,0 +1,243 @@
+#-------------------------------------------------------------------------------
+# Name:        collect_funcs.py
+# Purpose:     gather output variables from SUMMARY.OUT files into NumPy chunks as simulations complete
+# Author:      Mike Martin
+# Created:     17/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#!/usr/bin/env python
+
+__prog__ = 'collect_funcs.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+from glob import glob
+from json import dump as json_dump, load as json_load
+from math import floor
+from os import makedirs, replace
+from os.path import join, basename, isfile
+
+try:
+    import numpy as np
+    HAVE_NUMPY = True
+except ImportError:
+    HAVE_NUMPY = False
+
+RESULTS_BATCH = 1000
+GRANULARITY = 120       # lat/lon directory names are indices of the 30 arc second HWSD grid
+MAX_SOILS = 8
+RASTER_DEFN_FNAME = 'raster_definition.json'
+KEY_DTYPE = [('lat_id', 'U16'), ('lon_id', 'U16'), ('soil_id', 'U8')]
+CHUNK_STEM = '{}_{:06d}'       # writer prefix and chunk number
+KEYS_SUFFIX = '_keys.npy'
+
+def read_summary(summary_path, varnames):
+    """
+    return a dictionary of varname: list of values, one per time step, from an ECOSSE SUMMARY.OUT file
+    the header line is the first line naming all the variables; non numeric lines after it are skipped
+    raises ValueError if a variable is not found, OSError if the file cannot be read
+    """
+    columns = None
+    values = {varname: [] for varname in varnames}
+    with open(summary_path, 'r') as fobj:
+        for line in fobj:
+            tokens = line.split()
+            if columns is None:
+                if len(tokens) > 0 and all(varname in tokens for varname in varnames):
+                    columns = [tokens.index(varname) for varname in varnames]
+                continue
+            try:
+                row = [float(tokens[icol]) for icol in columns]
+            except (ValueError, IndexError):
+                continue
+            for varname, val in zip(varnames, row):
+                values[varname].append(val)
+
+    if columns is None:
+        raise ValueError('variables {} not found in {}'.format(varnames, summary_path))
+    return values
+
+class ResultsCollector(object):
+    """
+    Buffers the output variables of successful simulations and writes them in batches as NumPy chunks:
+        <prefix>_NNNNNN_keys.npy        - structured array of lat_id, lon_id, soil_id
+        <prefix>_NNNNNN_<varname>.npy   - float array of cells by time steps, NaN padded
+    Chunks are written to a temporary name and renamed so that a chunk is either complete or absent. Each process
+    writing to the same directory e.g. workers on several hosts must use its own prefix
+    """
+    def __init__(self, out_dir, varnames, batch_size = RESULTS_BATCH, prefix = 'chunk'):
+
+        self.out_dir = out_dir
+        self.varnames = varnames
+        self.batch_size = batch_size
+        self.prefix = prefix.replace('_', '-')
+        self.keys = []
+        self.rows = []
+        self.num_collected = 0
+
+        makedirs(out_dir, exist_ok = True)
+        existing = glob(join(out_dir, self.prefix + '_[0-9]*' + KEYS_SUFFIX))
+        self.next_chunk = 1 + max([int(basename(fname).split('_')[1]) for fname in existing], default = -1)
+
+    def add(self, lat_id, lon_id, soil_id, values):
+        """
+        buffer the output variables of a successful simulation as returned by read_summary
+        """
+        self.keys.append((lat_id, lon_id, soil_id))
+        self.rows.append(values)
+        self.num_collected += 1
+        if len(self.keys) >= self.batch_size:
+            self.flush()
+
+    def _save(self, fname, arr):
+        tmp_fname = join(self.out_dir, fname + '.tmp')
+        with open(tmp_fname, 'wb') as fobj:
+            np.save(fobj, arr)
+        replace(tmp_fname, join(self.out_dir, fname))
+
+    def flush(self):
+        """
+        write buffered results as a new chunk, variables first so that a keys file implies a complete chunk
+        """
+        if len(self.keys) == 0:
+            return
+
+        stem = CHUNK_STEM.format(self.prefix, self.next_chunk)
+        nsteps = max(len(row[varname]) for row in self.rows for varname in self.varnames)
+        for varname in self.varnames:
+            arr = np.full((len(self.rows), nsteps), np.nan)
+            for irow, row in enumerate(self.rows):
+                arr[irow, :len(row[varname])] = row[varname]
+            self._save(stem + '_' + varname + '.npy', arr)
+
+        self._save(stem + KEYS_SUFFIX, np.array(self.keys, dtype = KEY_DTYPE))
+
+        self.next_chunk += 1
+        self.keys = []
+        self.rows = []
+
+    def close(self):
+        self.flush()
+
+def load_results(out_dir, varnames):
+    """
+    read all complete chunks, returns the keys array and a dictionary of varname: array
+    """
+    keys, values = [], {varname: [] for varname in varnames}
+    for keys_fname in sorted(glob(join(out_dir, '*' + KEYS_SUFFIX))):
+        stem = keys_fname[:-len(KEYS_SUFFIX)]
+        keys.append(np.load(keys_fname))
+        for varname in varnames:
+            values[varname].append(np.load(stem + '_' + varname + '.npy'))
+
+    if len(keys) == 0:
+        return None, None
+
+    # chunks may differ in number of time steps
+    # =========================================
+    for varname in varnames:
+        nsteps = max(arr.shape[1] for arr in values[varname])
+        padded = [np.pad(arr, ((0, 0), (0, nsteps - arr.shape[1])), constant_values = np.nan)
+                                                                                    for arr in values[varname]]
+        values[varname] = np.concatenate(padded)
+
+    return np.concatenate(keys), values
+
+class RasterWriter(object):
+    """
+    One memory mapped .npy raster per output variable, shape soils x rows x columns x time steps, plus a mask of
+    the same shape less time steps which is set to 1 once a cell's values have been written. The grid is defined by
+    the bbox and resolution of the study definition; rasters can be opened by other programs with
+    numpy.load(mmap_mode = 'r') while the run is going. Rasters are created when the first cell is written since
+    the number of time steps is not known until then
+    """
+    def __init__(self, out_dir, varnames, study_defn, granularity = GRANULARITY, max_soils = MAX_SOILS,
+                                                                                    flush_every = RESULTS_BATCH):
+        self.out_dir = out_dir
+        self.varnames = varnames
+        self.flush_every = flush_every
+        self.num_unflushed = 0
+        self.granularity = granularity
+        self.max_soils = max_soils
+
+        # bbox is lower left longitude, lower left latitude, upper right longitude, upper right latitude
+        # ============================================================================================
+        self.ll_lon, self.ll_lat, self.ur_lon, self.ur_lat = [float(val) for val in study_defn['bbox']]
+        self.resol = float(study_defn['resolution'])
+        if self.resol <= 0.0:
+            raise ValueError('study resolution must be positive to define the raster grid')
+
+        self.nrows = int(round((self.ur_lat - self.ll_lat) / self.resol))
+        self.ncols = int(round((self.ur_lon - self.ll_lon) / self.resol))
+        self.rasters = None
+        self.mask = None
+        self.num_outside = 0
+        makedirs(out_dir, exist_ok = True)
+
+    def _open(self, nsteps):
+        """
+        create the rasters or reopen those of an interrupted run if they have the same shape
+        """
+        defn_fname = join(self.out_dir, RASTER_DEFN_FNAME)
+        shape = (self.max_soils, self.nrows, self.ncols, nsteps)
+        defn = {'varnames': self.varnames, 'shape': list(shape), 'dtype': 'float32', 'resolution': self.resol,
+                'bbox': [self.ll_lon, self.ll_lat, self.ur_lon, self.ur_lat], 'granularity': self.granularity,
+                'first_row': 'upper'}
+        mode = 'w+'
+        if isfile(defn_fname):
+            with open(defn_fname, 'r') as fobj:
+                if json_load(fobj) == defn:
+                    mode = 'r+'
+
+        self.mask = np.lib.format.open_memmap(join(self.out_dir, 'mask.npy'), mode = mode, dtype = 'uint8',
+                                                                                                shape = shape[:3])
+        self.rasters = {}
+        for varname in self.varnames:
+            self.rasters[varname] = np.lib.format.open_memmap(join(self.out_dir, varname + '.npy'), mode = mode,
+                                                                                    dtype = 'float32', shape = shape)
+        with open(defn_fname, 'w') as fobj:
+            json_dump(defn, fobj, indent = 2)
+
+    def add(self, lat_id, lon_id, soil_id, values):
+        """
+        write the output variables of a lat/lon cell into its grid slot, returns False if it cannot be placed
+        on the grid i.e. it lies outside the bbox or is identified by an OSGB grid reference
+        """
+        try:
+            lat = 90.0 - int(lat_id) / self.granularity
+            lon = int(lon_id) / self.granularity - 180.0
+        except ValueError:
+            self.num_outside += 1
+            return False
+        irow = int(floor((self.ur_lat - lat) / self.resol))
+        icol = int(floor((lon - self.ll_lon) / self.resol))
+        isoil = int(soil_id) - 1 if soil_id else 0
+        if not (0 <= irow < self.nrows and 0 <= icol < self.ncols and 0 <= isoil < self.max_soils):
+            self.num_outside += 1
+            return False
+
+        if self.rasters is None:
+            self._open(max(len(values[varname]) for varname in self.varnames))
+
+        for varname in self.varnames:
+            raster = self.rasters[varname]
+            series = values[varname][:raster.shape[3]]
+            raster[isoil, irow, icol, :len(series)] = series
+        self.mask[isoil, irow, icol] = 1
+
+        self.num_unflushed += 1
+        if self.num_unflushed >= self.flush_every:
+            self.flush()
+        return True
+
+    def flush(self):
+        self.num_unflushed = 0
+        if self.rasters is not None:
+            for raster in self.rasters.values():
+                raster.flush()
+            self.mask.flush()
+
+    def close(self):
+        self.flush()
+        self.rasters = None
+        self.mask = None
@@ -0,0 +1,120 @@
+#-------------------------------------------------------------------------------
+# Name:        config_watch_funcs.py
+# Purpose:     detect changes to the spec_run config file as soon as they are made
+# Author:      Mike Martin
+# Created:     17/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#!/usr/bin/env python
+
+__prog__ = 'config_watch_funcs.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+import ctypes
+import ctypes.util
+import os
+import struct
+from os.path import abspath, split
+from time import time
+
+# inotify constants from <sys/inotify.h>
+# ======================================
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+EVENT_HEADER = struct.Struct('iIII')    # wd, mask, cookie, len
+READ_SIZE = 65536
+STAT_INTERVAL = 3600    # seconds between stat checks when inotify is in use, a backstop e.g. for network filesystems
+
+class ConfigWatcher(object):
+    """
+    Reports whether the config file has changed since it was last read. Two mechanisms are used:
+        inotify - the directory holding the config file is watched so that files replaced by renaming, as most
+                  editors do, are seen (Linux)
+        stat    - modification time, size and inode are compared at each check (elsewhere or if inotify fails)
+    Either way a check costs a single system call, so can be made at every scheduler tick
+    """
+    def __init__(self, fname, stat_interval = STAT_INTERVAL):
+
+        self.fname = abspath(fname)
+        self.dirname, self.basename = split(self.fname)
+        self.basename = os.fsencode(self.basename)
+        self.stat_interval = stat_interval
+        self.signature = self._stat()
+        self.last_stat = time()
+        self.inotify_fd = None
+        self.mode = 'stat'
+
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno = True)
+            inotify_init1 = libc.inotify_init1
+            inotify_add_watch = libc.inotify_add_watch
+        except (OSError, AttributeError, TypeError):
+            return
+
+        fd = inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            return
+        if inotify_add_watch(fd, os.fsencode(self.dirname), WATCH_MASK) < 0:
+            os.close(fd)
+            return
+        self.inotify_fd = fd
+        self.mode = 'inotify'
+
+    def _stat(self):
+        try:
+            stat_res = os.stat(self.fname)
+        except OSError:
+            return None
+        return stat_res.st_mtime_ns, stat_res.st_size, stat_res.st_ino
+
+    def _stat_changed(self):
+        signature = self._stat()
+        self.last_stat = time()
+        if signature == self.signature:
+            return False
+        self.signature = signature
+        return True
+
+    def _inotify_changed(self):
+        """
+        drain pending events, returns True if any concern the config file
+        """
+        changed = False
+        while True:
+            try:
+                data = os.read(self.inotify_fd, READ_SIZE)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset + EVENT_HEADER.size <= len(data):
+                wd, mask, cookie, name_len = EVENT_HEADER.unpack_from(data, offset)
+                name = data[offset + EVENT_HEADER.size: offset + EVENT_HEADER.size + name_len].rstrip(b'\0')
+                if mask & IN_Q_OVERFLOW or name == self.basename:
+                    changed = True
+                offset += EVENT_HEADER.size + name_len
+        return changed
+
+    def changed(self):
+        """
+        True if the config file has changed since the last check
+        """
+        if self.inotify_fd is None:
+            return self._stat_changed()
+
+        if self._inotify_changed():
+            self._stat_changed()
+            return True
+        if time() - self.last_stat > self.stat_interval:
+            return self._stat_changed()
+        return False
+
+    def close(self):
+        if self.inotify_fd is not None:
+            os.close(self.inotify_fd)
+            self.inotify_fd = None
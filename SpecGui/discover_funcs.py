@@ -0,0 +1,129 @@
+#-------------------------------------------------------------------------------
+# Name:        discover_funcs.py
+# Purpose:     find simulation directories in the background so that ECOSSE can start on the first one found
+# Author:      Mike Martin
+# Created:     17/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#!/usr/bin/env python
+
+__prog__ = 'discover_funcs.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+from os import scandir
+from queue import Queue, Empty
+from threading import Thread
+
+REF_SYSTEMS = ['WGS84', 'OSGB']
+MAX_BATCH = 256     # batches start at one directory and double up to this size
+
+def classify_subdir(subdir):
+    """
+    return WGS84 for lat/lon simulation directories, OSGB for grid reference simulation directories
+    or None for anything else e.g. weather directories
+    """
+    if subdir[0:5] == 'lat00':
+        return 'WGS84'
+    elif subdir[:2].isupper():
+        return 'OSGB'
+    elif len(subdir.split('_')) == 2:   # eastings_northings
+        return 'OSGB'
+    else:
+        return None
+
+def scan_sim_dirs(run_dir, ref_sys = None):
+    """
+    generator yielding (subdir, ref_sys_flag) as simulation directories are found
+    lat/lon directories take precedence, as they always have: OSGB style names are held back until the scan has
+    completed and yielded only if no lat/lon directory was found. When the reference system of the study is known
+    from the config file, directories of that system are yielded as they are found and the others skipped
+    """
+    found_wgs84 = False
+    pending = []
+    with scandir(run_dir) as entries:
+        for entry in entries:
+            if not entry.is_dir():
+                continue
+
+            flag = classify_subdir(entry.name)
+            if flag is None:
+                continue
+
+            if ref_sys is not None:
+                if flag == ref_sys:
+                    yield entry.name, flag
+            elif flag == 'WGS84':
+                found_wgs84 = True
+                pending = []
+                yield entry.name, flag
+            elif not found_wgs84:
+                pending.append(entry.name)
+
+    for subdir in pending:
+        yield subdir, 'OSGB'
+
+class Discovery(object):
+    """
+    Scans the simulations directory in a background thread and queues simulation directories for the scheduler
+    num_found counts simulation directories found so far, num_sims those queued to be run i.e. after directories
+    already performed have been removed by filter_func. ref_sys, if given, is the reference system of the study
+    """
+    def __init__(self, run_dir, filter_func = None, ref_sys = None):
+
+        self.run_dir = run_dir
+        self.filter_func = filter_func
+        self.ref_sys = ref_sys
+        self.queue = Queue()
+        self.ref_sys_flag = None
+        self.num_found = 0
+        self.num_sims = 0
+        self.finished = False       # scan has completed
+        self.exhausted = False      # scan has completed and all queued directories have been taken
+        self.error = None
+
+        self.thread = Thread(target = self._scan, daemon = True)
+        self.thread.start()
+
+    def _put(self, batch):
+        if self.filter_func is not None and len(batch) > 0:
+            batch = self.filter_func(batch)
+        for subdir in batch:
+            self.num_sims += 1
+            self.queue.put(subdir)
+
+    def _scan(self):
+        batch = []
+        batch_size = 1
+        try:
+            for subdir, ref_sys_flag in scan_sim_dirs(self.run_dir, self.ref_sys):
+                self.ref_sys_flag = ref_sys_flag
+                self.num_found += 1
+                batch.append(subdir)
+                if len(batch) >= batch_size:
+                    self._put(batch)
+                    batch = []
+                    batch_size = min(2 * batch_size, MAX_BATCH)
+
+            self._put(batch)
+        except OSError as err:
+            self.error = err
+        finally:
+            self.finished = True
+            self.queue.put(None)
+
+    def get(self, block = False, timeout = None):
+        """
+        return the next simulation directory, or None if none is available within the timeout or the scan is
+        exhausted
+        """
+        if self.exhausted:
+            return None
+        try:
+            subdir = self.queue.get(block, timeout)
+        except Empty:
+            return None
+
+        if subdir is None:
+            self.exhausted = True
+        return subdir
@@ -0,0 +1,153 @@
+#-------------------------------------------------------------------------------
+# Name:        eta_funcs.py
+# Purpose:     estimate the time left in a run from recent throughput and the concurrency to come
+# Author:      Mike Martin
+# Created:     17/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#!/usr/bin/env python
+
+__prog__ = 'eta_funcs.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+from collections import deque
+from math import sqrt
+
+WINDOW_SECS = 600       # throughput is measured over the last ten minutes
+MIN_SAMPLES = 10        # completions needed in the window, otherwise the whole run so far is used
+MAX_DURATIONS = 1000    # recent simulation durations kept for their spread
+MAX_SEGMENTS = 1000     # concurrency changes projected ahead before giving up
+Z_95 = 1.96
+
+class EtaEstimator(object):
+    """
+    Throughput is measured per slot i.e. completions divided by slot seconds, the integral of the number of
+    instances permitted over time, so that it can be projected forward through the changes of concurrency set by the
+    workday window. The confidence band combines the uncertainty in the measured rate (Poisson in the number of
+    completions) with the spread of simulation durations over the simulations still to run
+    """
+    def __init__(self, window_secs = WINDOW_SECS, min_samples = MIN_SAMPLES):
+
+        self.window_secs = window_secs
+        self.min_samples = min_samples
+        self.completions = deque()      # completion times within the window
+        self.slot_samples = deque()     # (time, slots) within the window
+        self.durations = deque(maxlen = MAX_DURATIONS)
+        self.start_time = None
+        self.num_total = 0
+        self.slot_secs_total = 0.0
+        self.last_sample = None
+
+    def record(self, end_time, duration = None):
+        """
+        a simulation has finished, duration is its wall time if known
+        """
+        self.completions.append(end_time)
+        self.num_total += 1
+        if duration is not None:
+            self.durations.append(duration)
+
+    def sample(self, now, slots):
+        """
+        record the number of instances currently permitted, called at each progress update
+        """
+        if self.last_sample is not None:
+            self.slot_secs_total += self.last_sample[1] * (now - self.last_sample[0])
+        else:
+            self.start_time = now
+        self.last_sample = (now, slots)
+        self.slot_samples.append((now, slots))
+
+        cutoff = now - self.window_secs
+        while len(self.completions) > 0 and self.completions[0] < cutoff:
+            self.completions.popleft()
+        while len(self.slot_samples) > 1 and self.slot_samples[1][0] <= cutoff:
+            self.slot_samples.popleft()
+
+    def _window_slot_secs(self, now):
+
+        slot_secs = 0.0
+        cutoff = now - self.window_secs
+        samples = list(self.slot_samples)
+        for isample, (tstamp, slots) in enumerate(samples):
+            seg_start = max(tstamp, cutoff)
+            seg_end = samples[isample + 1][0] if isample + 1 < len(samples) else now
+            slot_secs += slots * max(seg_end - seg_start, 0.0)
+        return slot_secs
+
+    def rate(self, now):
+        """
+        completions per slot second and the number of completions it is based on, or None if nothing has finished
+        """
+        num = len(self.completions)
+        slot_secs = self._window_slot_secs(now)
+        if num < self.min_samples:
+            num = self.num_total
+            slot_secs = self.slot_secs_total + (0.0 if self.last_sample is None else
+                                                            self.last_sample[1] * (now - self.last_sample[0]))
+        if num == 0 or slot_secs <= 0.0:
+            return None, 0
+        return num / slot_secs, num
+
+    def _spread(self):
+        """
+        coefficient of variation of simulation durations
+        """
+        if len(self.durations) < 2:
+            return 1.0
+        mean = sum(self.durations) / len(self.durations)
+        if mean <= 0.0:
+            return 1.0
+        var = sum((dur - mean) ** 2 for dur in self.durations) / (len(self.durations) - 1)
+        return sqrt(var) / mean
+
+    def _project(self, now, remaining, rate, slots, cap_func, next_change_func):
+        """
+        seconds until remaining simulations are done at rate per slot second, following the concurrency to come
+        concurrency is the window cap scaled by the ratio of the instances permitted now to the cap now e.g. as
+        reduced by the adaptive controller
+        """
+        scale = 1.0
+        if cap_func is not None:
+            cap_now = cap_func(now)
+            scale = slots / cap_now if cap_now > 0 else 1.0
+
+        tstamp = now
+        left = float(remaining)
+        for isegment in range(MAX_SEGMENTS):
+            if cap_func is None or next_change_func is None:
+                cap, seg_end = slots, None
+            else:
+                cap, seg_end = cap_func(tstamp) * scale, next_change_func(tstamp)
+
+            throughput = rate * cap
+            if throughput > 0.0:
+                if seg_end is None or throughput * (seg_end - tstamp) >= left:
+                    return tstamp + left / throughput - now
+                left -= throughput * (seg_end - tstamp)
+            elif seg_end is None:
+                return None
+            tstamp = seg_end
+        return None
+
+    def estimate(self, now, remaining, slots, cap_func = None, next_change_func = None):
+        """
+        return (expected, earliest, latest) seconds left, or None if there is not yet a basis for an estimate
+        cap_func maps a time stamp to the number of instances the workday window permits and next_change_func
+        gives the time stamp at which that next changes
+        """
+        if remaining <= 0:
+            return 0.0, 0.0, 0.0
+
+        rate, num = self.rate(now)
+        if rate is None:
+            return None
+
+        rel = Z_95 * sqrt(1.0 / num + self._spread() ** 2 / remaining)
+        estimates = []
+        for factor in (1.0, 1.0 + rel, max(1.0 - rel, 0.1)):
+            estimates.append(self._project(now, remaining, rate * factor, slots, cap_func, next_change_func))
+        if estimates[0] is None:
+            return None
+        return tuple(estimates)
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+#-------------------------------------------------------------------------------
+# Name:        fake_ecosse.py
+# Purpose:     stand-in for the ECOSSE executable used to benchmark spec_run
+# Author:      Mike Martin
+# Created:     17/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+
+__prog__ = 'fake_ecosse.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+import os
+import signal
+import sys
+from json import load as json_load
+from subprocess import Popen
+from random import Random
+from time import time, sleep
+from zlib import crc32
+
+FAKE_CONFIG_ENV = 'FAKE_ECOSSE_CONFIG'
+FAKE_CONFIG_FNAME = 'fake_ecosse.json'
+SUCCESS_MARKER = 'SIMULATION SUCCESSFULLY COMPLETED'
+DISTRIBUTIONS = ['fixed', 'uniform', 'exponential', 'lognormal']
+
+# behaviour when there is no config file
+# ======================================
+DEFAULT_CONFIG = {
+    'distribution': 'fixed',    # one of DISTRIBUTIONS
+    'mean': 0.05,               # mean run time in seconds
+    'spread': 0.5,              # uniform: +/- fraction of the mean, lognormal: sigma
+    'burn': False,              # burn cpu rather than sleep
+    'fail_fraction': 0.0,       # fraction of cells which exit without the success phrase
+    'hang_fraction': 0.0,       # fraction of cells which never finish
+    'ignore_term': False,       # cells which hang ignore SIGTERM, so have to be killed
+    'orphan_fraction': 0.0,     # fraction of cells which leave a process holding stdout open when they exit
+    'orphan_secs': 30,          # seconds the left behind process runs for
+    'output_kb': 4,             # size of the progress output written before the success phrase
+    'varnames': ['total_soc', 'co2_c', 'ch4_c', 'no3_n'],
+    'nsteps': 10,               # time steps written to SUMMARY.OUT
+    'events_log': None          # file to which a start and end time line is appended per cell
+}
+
+def read_config():
+    """
+    the config file is named by an environment variable or sits next to this script
+    """
+    fname = os.environ.get(FAKE_CONFIG_ENV, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                                                            FAKE_CONFIG_FNAME))
+    config = dict(DEFAULT_CONFIG)
+    if os.path.isfile(fname):
+        with open(fname, 'r') as fobj:
+            config.update(json_load(fobj))
+    return config
+
+def read_user_input():
+    """
+    read the responses spec_run writes to ECOSSE's stdin: run mode 3 (limited data) is followed by the name of
+    the input file, which must exist in the working directory; mode 1 (site specific) needs nothing more
+    returns an error message or None
+    """
+    tokens = sys.stdin.read().split()
+    if len(tokens) == 0:
+        return 'no run mode given'
+    if tokens[0] == '3':
+        if len(tokens) < 2:
+            return 'no input file given for limited data run'
+        if not os.path.isfile(tokens[1]):
+            return 'input file {} not found'.format(tokens[1])
+    elif tokens[0] != '1':
+        return 'run mode {} not recognised'.format(tokens[0])
+    return None
+
+def draw_duration(config, rng):
+
+    mean = config['mean']
+    dist = config['distribution']
+    if dist == 'uniform':
+        return rng.uniform(mean * (1 - config['spread']), mean * (1 + config['spread']))
+    elif dist == 'exponential':
+        return rng.expovariate(1.0 / mean)
+    elif dist == 'lognormal':
+        sigma = config['spread']
+        return rng.lognormvariate(0.0, sigma) * mean / (2.718281828 ** (sigma * sigma / 2))
+    return mean
+
+def run(duration, burn):
+    if burn:
+        end_time = time() + duration
+        while time() < end_time:
+            sum(ival * ival for ival in range(1000))
+    else:
+        sleep(duration)
+
+def write_summary(config, rng):
+
+    with open('SUMMARY.OUT', 'w') as fobj:
+        fobj.write('  Year ' + ' '.join('{:>12}'.format(varname) for varname in config['varnames']) + '\n')
+        for istep in range(config['nsteps']):
+            vals = ' '.join('{:12.4f}'.format(rng.uniform(0.0, 100.0)) for varname in config['varnames'])
+            fobj.write('{:6d} {}\n'.format(2001 + istep, vals))
+
+def main():
+
+    start_time = time()
+    config = read_config()
+    cell = os.path.basename(os.getcwd())
+
+    # the fate of a cell depends only on its name so that repeated runs are comparable
+    # =================================================================================
+    rng = Random(crc32(bytes(cell, 'utf-8')))
+    fate = rng.random()
+    orphan = rng.random() < config['orphan_fraction']
+
+    error = read_user_input()
+    if error is not None:
+        print('Error: ' + error)
+        return 1
+
+    line = ' Spin-up iteration {:6d}  SOC change {:12.6f}  converged F\n'
+    nlines = int(config['output_kb'] * 1024 / len(line.format(0, 0.0)))
+    for iline in range(nlines):
+        sys.stdout.write(line.format(iline, 1.0 / (iline + 1)))
+
+    # a process forked by ECOSSE which inherits its stdout keeps the pipe open after ECOSSE itself has exited
+    # =======================================================================================================
+    if orphan:
+        sys.stdout.flush()
+        Popen([sys.executable, '-S', '-c', 'import time; time.sleep({})'.format(config['orphan_secs'])])
+
+    if fate < config['hang_fraction']:
+        sys.stdout.flush()
+        if config['ignore_term'] and hasattr(signal, 'SIGTERM'):
+            signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        while True:
+            sleep(3600)
+
+    run(draw_duration(config, rng), config['burn'])
+
+    if fate < config['hang_fraction'] + config['fail_fraction']:
+        print(' Error: simulation did not converge')
+    else:
+        write_summary(config, rng)
+        print(' ' + SUCCESS_MARKER)
+
+    if config['events_log'] is not None:
+        with open(config['events_log'], 'a') as fobj:
+            fobj.write('{:.6f}\t{:.6f}\t{}\n'.format(start_time, time(), cell))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
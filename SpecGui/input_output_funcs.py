@@ -19,6 +19,44 @@ from os.path import join, isfile, split
 cropName =  'cropName'
 REQUIRED_KEYS = list(['bbox', 'climScnr', cropName, 'resolution', 'futEndYr', 'futStrtYr', 'land_use', 'study'])
 
+SUCCESS_MARKER = 'SIMULATION SUCCESSFULLY COMPLETED'
+TAIL_BYTES = 65536          # ECOSSE writes the success phrase at the very end of its output
+SCAN_CHUNK = 1048576
+
+def check_ecosse_success(stdout_path, tail_bytes = TAIL_BYTES):
+    """
+    return True if the ECOSSE redirected output file contains the success phrase
+    only the last tail_bytes of the file are read; the remainder is scanned only if the tail does not contain the
+    phrase and does not cover the whole file. Raises OSError if the file cannot be read
+    """
+    marker = bytes(SUCCESS_MARKER, 'ascii')
+    with open(stdout_path, 'rb') as fobj:
+        fobj.seek(0, 2)
+        size = fobj.tell()
+        tail_start = max(size - tail_bytes, 0)
+        fobj.seek(tail_start)
+        if marker in fobj.read():
+            return True
+
+        if tail_start == 0:
+            return False
+
+        # tail is inconclusive - scan the rest of the file in chunks which overlap by the length of the phrase
+        # =====================================================================================================
+        fobj.seek(0)
+        scan_end = tail_start + len(marker) - 1
+        overlap = b''
+        while fobj.tell() < scan_end:
+            chunk = fobj.read(min(SCAN_CHUNK, scan_end - fobj.tell()))
+            if len(chunk) == 0:
+                break
+            window = overlap + chunk
+            if marker in window:
+                return True
+            overlap = window[1 - len(marker):]
+
+    return False
+
 def _check_study_defn(study_defn_fname, study_defn):
     """
     validate study definition file contents
@@ -0,0 +1,151 @@
+#-------------------------------------------------------------------------------
+# Name:        journal_funcs.py
+# Purpose:     append-only record of simulation launches and outcomes, used to resume interrupted runs
+# Author:      Mike Martin
+# Created:     17/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#!/usr/bin/env python
+
+__prog__ = 'journal_funcs.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+from glob import glob
+from os import fsync, replace, SEEK_END
+from os.path import join, isfile
+from time import time
+
+JOURNAL_FNAME = 'spec_run_journal{}.txt'
+JOURNAL_EVENTS = ['launch', 'success', 'failure', 'timeout']
+READ_BACK = 4096
+
+def _truncate_torn_line(fname):
+    """
+    cut a torn final line, written as the previous run was killed, so that appended records start on a line of
+    their own
+    """
+    if not isfile(fname):
+        return
+    with open(fname, 'r+b') as fobj:
+        end = fobj.seek(0, SEEK_END)
+        pos = end
+        while pos > 0:
+            start = max(pos - READ_BACK, 0)
+            fobj.seek(start)
+            block = fobj.read(pos - start)
+            inl = block.rfind(b'\n')
+            if inl >= 0:
+                pos = start + inl + 1
+                break
+            pos = start
+        if pos < end:
+            fobj.truncate(pos)
+
+class Journal(object):
+    """
+    One tab separated line per event: time, event, simulation subdirectory
+    Lines are flushed as they are written so the journal survives the run being killed; a torn final line is cut
+    when the journal is resumed. Lines reach the disk, surviving a crash of the host, when sync is called e.g.
+    before the directories of successful simulations are deleted. Each shard of a sharded run keeps a journal of
+    its own, named by suffix
+    """
+    def __init__(self, sims_dir, resume = True, suffix = ''):
+
+        self.fname = join(sims_dir, JOURNAL_FNAME.format(suffix))
+        if resume:
+            _truncate_torn_line(self.fname)
+        mode = 'a' if resume else 'w'
+        self.fobj = open(self.fname, mode, buffering = 1)
+        self.unsynced = False
+
+    def record(self, event, subdir):
+        """
+        append an event for a simulation subdirectory
+        """
+        self.fobj.write('{}\t{}\t{}\n'.format(int(time()), event, subdir))
+        self.unsynced = True
+
+    def sync(self):
+        """
+        force the lines written so far to disk
+        """
+        if self.unsynced:
+            self.fobj.flush()
+            fsync(self.fobj.fileno())
+            self.unsynced = False
+
+    def close(self):
+        self.fobj.flush()
+        fsync(self.fobj.fileno())
+        self.fobj.close()
+
+def journal_fnames(sims_dir):
+    """
+    the journal of an unsharded run followed by those of the shards of sharded runs
+    """
+    fnames = [join(sims_dir, JOURNAL_FNAME.format(''))]
+    fnames = [fname for fname in fnames if isfile(fname)]
+    return fnames + sorted(glob(join(sims_dir, JOURNAL_FNAME.format('_shard*'))))
+
+def _read_events(fname):
+    """
+    (time, event, subdir) of each complete line
+    """
+    events = []
+    with open(fname, 'r') as fobj:
+        for line in fobj:
+            if not line.endswith('\n'):
+                break       # torn line written as the previous run was killed
+            parts = line.rstrip('\n').split('\t')
+            if len(parts) != 3 or parts[1] not in JOURNAL_EVENTS:
+                continue
+            try:
+                events.append((int(parts[0]), parts[1], parts[2]))
+            except ValueError:
+                continue
+    return events
+
+def read_last_events(sims_dir):
+    """
+    return a dictionary of subdir: (time, event) of the last event recorded for each simulation subdirectory
+    over all journals, those of shards included, or None if there is no journal
+    """
+    fnames = journal_fnames(sims_dir)
+    if len(fnames) == 0:
+        return None
+
+    last_events = {}
+    for fname in fnames:
+        for tstamp, event, subdir in _read_events(fname):
+            if subdir not in last_events or tstamp >= last_events[subdir][0]:
+                last_events[subdir] = (tstamp, event)
+    return last_events
+
+def read_journal(sims_dir):
+    """
+    return a dictionary of the last event recorded for each simulation subdirectory
+    or None if there is no journal
+    """
+    last_events = read_last_events(sims_dir)
+    if last_events is None:
+        return None
+    return {subdir: event for subdir, (tstamp, event) in last_events.items()}
+
+def merge_journals(sims_dir):
+    """
+    write the last event of each simulation subdirectory, from all journals, to the journal of an unsharded run
+    so that merging again gives the same result. Returns the number of subdirectories, None if there are no journals
+    """
+    last_events = read_last_events(sims_dir)
+    if last_events is None:
+        return None
+
+    fname = join(sims_dir, JOURNAL_FNAME.format(''))
+    with open(fname + '.tmp', 'w') as fobj:
+        for subdir, (tstamp, event) in sorted(last_events.items(), key = lambda item: item[1][0]):
+            fobj.write('{}\t{}\t{}\n'.format(tstamp, event, subdir))
+        fobj.flush()
+        fsync(fobj.fileno())
+    replace(fname + '.tmp', fname)
+    return len(last_events)
@@ -0,0 +1,125 @@
+#-------------------------------------------------------------------------------
+# Name:        load_funcs.py
+# Purpose:     adjust the number of ECOSSE instances to what the machine is actually doing
+# Author:      Mike Martin
+# Created:     17/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#!/usr/bin/env python
+
+__prog__ = 'load_funcs.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+from math import ceil
+from time import time
+
+LOADAVG_PATH = '/proc/loadavg'
+MEMINFO_PATH = '/proc/meminfo'
+PRESSURE_PATH = '/proc/pressure/{}'
+
+def read_loadavg():
+    """
+    return the one minute load average or None if unavailable e.g. not Linux
+    """
+    try:
+        with open(LOADAVG_PATH, 'r') as fobj:
+            return float(fobj.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+
+def read_mem_available():
+    """
+    return MemAvailable in MB or None if unavailable
+    """
+    try:
+        with open(MEMINFO_PATH, 'r') as fobj:
+            for line in fobj:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) / 1024.0
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+def read_pressure(resource):
+    """
+    return the "some" avg10 pressure stall percentage for cpu, memory or io, or None if PSI is unavailable
+    """
+    try:
+        with open(PRESSURE_PATH.format(resource), 'r') as fobj:
+            for line in fobj:
+                fields = line.split()
+                if fields[0] == 'some':
+                    return float(fields[1].split('=')[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+class ConcurrencyController(object):
+    """
+    Feedback controller for the number of ECOSSE instances
+    Each tick the load average, available memory and pressure stall information are read:
+        memory short or memory pressure high    - cut the instance count by a quarter
+        load or cpu pressure above target       - reduce the instance count by one
+        otherwise                               - increase by the spare cpu capacity, at least one
+    The result always lies between min_inst and the cap supplied by the caller i.e. the workday window
+    """
+    def __init__(self, ncpus):
+
+        self.ncpus = ncpus
+        self.current = None
+        self.last_tick = 0.0
+        self.available = read_loadavg() is not None
+        self.configure()
+
+    def configure(self, min_inst = 1, target_load = 1.0, min_free_mem = 2048, max_cpu_pressure = 25.0,
+                                                                                max_mem_pressure = 5.0, interval = 5):
+        """
+        target_load is a fraction of the cpus on the machine, min_free_mem is in MB, pressures are percentages
+        """
+        self.min_inst = min_inst
+        self.target_load = target_load
+        self.min_free_mem = min_free_mem
+        self.max_cpu_pressure = max_cpu_pressure
+        self.max_mem_pressure = max_mem_pressure
+        self.interval = interval
+
+    def update(self, cap):
+        """
+        return the number of instances permitted, re-evaluated at most once per interval
+        """
+        if not self.available:
+            return cap
+
+        if self.current is None:
+            self.current = cap
+
+        if time() - self.last_tick >= self.interval:
+            self.last_tick = time()
+            self.current = self._next_value(cap)
+
+        return max(min(self.current, cap), min(self.min_inst, cap))
+
+    def _next_value(self, cap):
+
+        current = min(self.current, cap)
+        load = read_loadavg()
+        if load is None:
+            return cap      # load average could not be read this tick, leave the caller's cap in force
+        mem_avail = read_mem_available()
+        cpu_pressure = read_pressure('cpu')
+        mem_pressure = read_pressure('memory')
+
+        if (mem_avail is not None and mem_avail < self.min_free_mem) or \
+                                    (mem_pressure is not None and mem_pressure > self.max_mem_pressure):
+            current = int(current * 0.75)
+
+        elif load > self.target_load * self.ncpus or \
+                                    (cpu_pressure is not None and cpu_pressure > self.max_cpu_pressure):
+            current -= 1
+
+        elif mem_avail is None or mem_avail > 2 * self.min_free_mem:
+            spare = self.target_load * self.ncpus - load
+            current += max(1, int(ceil(spare)))
+
+        return max(self.min_inst, min(current, cap))
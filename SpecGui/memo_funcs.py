@@ -0,0 +1,346 @@
+#-------------------------------------------------------------------------------
+# Name:        memo_funcs.py
+# Purpose:     run ECOSSE once for simulation directories with identical inputs and share the outputs
+# Author:      Mike Martin
+# Created:     17/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#!/usr/bin/env python
+
+__prog__ = 'memo_funcs.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+import sqlite3
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatch
+from hashlib import sha256
+from os import scandir, makedirs, link, replace, getpid
+from os.path import join, isdir
+from shutil import copy2, rmtree
+from threading import Condition, Lock
+from time import time
+
+MEMO_EXCLUDE = ['*.OUT', 'stdout.txt']  # outputs of an earlier run, not part of a simulation's inputs
+MEMO_THREADS = 4
+MEMO_DEPTH = 32                         # simulation directories hashed ahead of use
+MEMO_MAX_GB = 10.0
+MEMO_MAX_AGE_DAYS = 90
+INDEX_FNAME = 'index.sqlite'
+READ_SIZE = 1048576
+POLL_INTERVAL = 1.0
+MEMO_ERRORS = (OSError, sqlite3.Error)
+
+def file_digest(path):
+    hasher = sha256()
+    with open(path, 'rb') as fobj:
+        for block in iter(lambda: fobj.read(READ_SIZE), b''):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+def input_digest(sim_dir, prefix, exclude = MEMO_EXCLUDE):
+    """
+    digest of the names and contents of the input files of a simulation directory, prefixed by the digest of the
+    ECOSSE executable and user input; returns the digest and the names of the input files
+    """
+    names = []
+    with scandir(sim_dir) as entries:
+        for entry in entries:
+            if entry.is_file() and not any(fnmatch(entry.name, pattern) for pattern in exclude):
+                names.append(entry.name)
+
+    hasher = sha256(bytes(prefix, 'utf-8'))
+    for name in sorted(names):
+        hasher.update(bytes('\0{}\0{}'.format(name, file_digest(join(sim_dir, name))), 'utf-8'))
+    return hasher.hexdigest(), set(names)
+
+def _place(src_path, dst_path, use_links):
+    """
+    copy or hard link a file into place, replacing any existing file; links fall back to copies e.g. across
+    filesystems
+    """
+    tmp_path = '{}.memo-{}'.format(dst_path, getpid())
+    if use_links:
+        try:
+            link(src_path, tmp_path)
+        except OSError:
+            copy2(src_path, tmp_path)
+    else:
+        copy2(src_path, tmp_path)
+    replace(tmp_path, dst_path)
+
+class MemoCache(object):
+    """
+    Outputs of simulations keyed by input digest, held in <cache_dir>/objects/<2 hex digits>/<digest> and indexed
+    in an SQLite database with their size and time of last use so that the cache can be shared by several runs
+    and studies and trimmed by age and size. Outputs are copied into simulation directories unless use_links is set;
+    hard links save space but a cached output would be changed by anything rewriting the linked file in place
+    """
+    def __init__(self, cache_dir, use_links = False):
+
+        self.cache_dir = cache_dir
+        self.use_links = use_links
+        makedirs(join(cache_dir, 'objects'), exist_ok = True)
+        self.lock = Lock()
+        self.conn = sqlite3.connect(join(cache_dir, INDEX_FNAME), timeout = 60, check_same_thread = False)
+        with self.conn:
+            self.conn.execute('CREATE TABLE IF NOT EXISTS entries (digest TEXT PRIMARY KEY, size INTEGER, '
+                              'created REAL, last_used REAL, nfiles INTEGER)')
+
+    def _entry_dir(self, digest):
+        return join(self.cache_dir, 'objects', digest[:2], digest)
+
+    def fan_out(self, digest, dst_dir):
+        """
+        place the cached outputs for digest in dst_dir, returns False if there are none
+        """
+        with self.lock:
+            row = self.conn.execute('SELECT nfiles FROM entries WHERE digest = ?', (digest,)).fetchone()
+        entry_dir = self._entry_dir(digest)
+        if row is None or not isdir(entry_dir):
+            return False
+
+        with scandir(entry_dir) as entries:
+            for entry in entries:
+                _place(entry.path, join(dst_dir, entry.name), self.use_links)
+        with self.lock, self.conn:
+            self.conn.execute('UPDATE entries SET last_used = ? WHERE digest = ?', (time(), digest))
+        return True
+
+    def store(self, digest, src_dir, input_names):
+        """
+        copy the outputs of a successful simulation i.e. the files which are not inputs into the cache
+        """
+        entry_dir = self._entry_dir(digest)
+        if isdir(entry_dir):
+            return
+        tmp_dir = '{}.tmp-{}'.format(entry_dir, getpid())
+        makedirs(tmp_dir, exist_ok = True)
+        size = nfiles = 0
+        try:
+            with scandir(src_dir) as entries:
+                for entry in entries:
+                    if entry.is_file() and entry.name not in input_names:
+                        copy2(entry.path, join(tmp_dir, entry.name))
+                        size += entry.stat().st_size
+                        nfiles += 1
+            replace(tmp_dir, entry_dir)
+        except OSError:
+            rmtree(tmp_dir, ignore_errors = True)
+            if not isdir(entry_dir):
+                raise
+            return      # stored by another run in the meantime
+
+        now = time()
+        with self.lock, self.conn:
+            self.conn.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)',
+                                                                                (digest, size, now, now, nfiles))
+
+    def evict(self, max_bytes, max_age):
+        """
+        remove entries not used for max_age seconds, then the least recently used until the cache is no larger
+        than max_bytes; returns the number of entries and bytes removed
+        """
+        with self.lock:
+            rows = self.conn.execute('SELECT digest, size, last_used FROM entries ORDER BY last_used').fetchall()
+        total = sum(row[1] for row in rows)
+        cutoff = time() - max_age
+        evicted = []
+        for digest, size, last_used in rows:
+            if last_used >= cutoff and total <= max_bytes:
+                break
+            evicted.append(digest)
+            total -= size
+
+        num_bytes = 0
+        for digest in evicted:
+            with self.lock, self.conn:
+                num_bytes += self.conn.execute('SELECT size FROM entries WHERE digest = ?', (digest,)).fetchone()[0]
+                self.conn.execute('DELETE FROM entries WHERE digest = ?', (digest,))
+            rmtree(self._entry_dir(digest), ignore_errors = True)
+        return len(evicted), num_bytes
+
+    def close(self):
+        self.conn.close()
+
+class MemoSource(object):
+    """
+    Wraps a source of simulation subdirectories, such as Discovery, hashing the inputs of each a little ahead of
+    use. Simulations whose outputs are in the cache are not handed out: the outputs are placed in the directory and
+    the subdirectory is queued for the scheduler to record as successful. Of simulations with the same digest in
+    this run only the first, the representative, is handed out; the others wait for its outcome and either receive
+    its outputs or, if it fails, are handed out in their own right
+    """
+    def __init__(self, source, cache, run_dir, prefix, exclude = MEMO_EXCLUDE, nthreads = MEMO_THREADS,
+                                                                                                depth = MEMO_DEPTH):
+        self.source = source
+        self.cache = cache
+        self.run_dir = run_dir
+        self.prefix = prefix
+        self.exclude = exclude
+        self.depth = depth
+        self.executor = ThreadPoolExecutor(max_workers = nthreads)
+        self.storer = ThreadPoolExecutor(max_workers = 1)  # stores outputs and fans them out off the scheduler
+        self.cond = Condition()
+        self.ahead = deque()        # (subdir, future) being hashed
+        self.waiting = {}           # digest: subdirs waiting for the representative with that digest
+        self.reps = {}              # subdir of each representative running: (digest, input names)
+        self.stored = set()         # digests stored in this run, possibly after their duplicates were hashed
+        self.ready = deque()        # subdirs released when their representative failed
+        self.hits = deque()         # subdirs given outputs, for the scheduler to record
+        self.num_cached = 0         # outputs from the cache i.e. earlier runs or studies
+        self.num_shared = 0         # outputs from a representative in this run
+        self.num_storing = 0        # representatives finished but not yet dealt with by the storer
+
+    def __getattr__(self, name):
+        return getattr(self.source, name)
+
+    @property
+    def exhausted(self):
+        with self.cond:
+            return (self.source.exhausted and len(self.ahead) == 0 and len(self.waiting) == 0 and
+                                                                    len(self.ready) == 0 and self.num_storing == 0)
+
+    def _hash(self, subdir):
+        """
+        runs in the thread pool: digest of a simulation's inputs, placing cached outputs if there are any
+        returns (digest, input names, hit), digest is None if the inputs could not be read
+        """
+        sim_dir = join(self.run_dir, subdir)
+        try:
+            digest, names = input_digest(sim_dir, self.prefix, self.exclude)
+            hit = self.cache.fan_out(digest, sim_dir)
+        except MEMO_ERRORS:
+            return None, None, False
+        return digest, names, hit
+
+    def _top_up(self, block, timeout):
+        while len(self.ahead) < self.depth:
+            subdir = self.source.get(block and len(self.ahead) == 0, timeout)
+            if subdir is None:
+                break
+            self.ahead.append((subdir, self.executor.submit(self._hash, subdir)))
+            block = False
+
+    def _next(self):
+        """
+        the next subdirectory to hand out from those hashed, recording cache hits and duplicates on the way
+        """
+        while len(self.ahead) > 0:
+            subdir, future = self.ahead.popleft()
+            digest, names, hit = future.result()
+            shared = False
+            if not hit and digest in self.stored:
+                try:
+                    shared = self.cache.fan_out(digest, join(self.run_dir, subdir))
+                except MEMO_ERRORS:
+                    pass
+            with self.cond:
+                if digest is None:
+                    return subdir
+                if hit or shared:
+                    self.hits.append(subdir)
+                    if digest in self.stored:
+                        self.num_shared += 1
+                    else:
+                        self.num_cached += 1
+                elif digest in self.waiting:
+                    self.waiting[digest].append(subdir)
+                else:
+                    self.waiting[digest] = []
+                    self.reps[subdir] = (digest, names)
+                    return subdir
+        return None
+
+    def get(self, block = False, timeout = None):
+
+        deadline = None if timeout is None else time() + timeout
+        while True:
+            with self.cond:
+                if len(self.ready) > 0:
+                    return self.ready.popleft()
+
+            self._top_up(False, None)
+            subdir = self._next()
+            if subdir is not None:
+                return subdir
+            if not block or self.exhausted:
+                return None
+
+            wait = POLL_INTERVAL
+            if deadline is not None:
+                wait = min(wait, deadline - time())
+                if wait <= 0:
+                    return None
+
+            # nothing hashed, wait for the source or for a representative to finish
+            # =======================================================================
+            if self.source.exhausted:
+                with self.cond:
+                    if len(self.ready) == 0:
+                        self.cond.wait(wait)
+            else:
+                self._top_up(True, wait)
+
+    def finished(self, subdir, successful, sim_dir):
+        """
+        a simulation has finished for good: if it was a representative, store its outputs and give them to the
+        simulations waiting for it, or release them to be run if it failed. Raises one of MEMO_ERRORS if the outputs
+        could not be stored, in which case the waiting simulations are released
+        """
+        with self.cond:
+            if subdir not in self.reps:
+                return
+            digest, names = self.reps.pop(subdir)
+
+        # duplicates stay waiting until the outputs are stored so that none is handed out as a new representative
+        # ========================================================================================================
+        try:
+            if successful:
+                self.cache.store(digest, sim_dir, names)
+                with self.cond:
+                    self.stored.add(digest)
+                    waiting = list(self.waiting[digest])
+                for dup_subdir in waiting:
+                    if self.cache.fan_out(digest, join(self.run_dir, dup_subdir)):
+                        with self.cond:
+                            self.waiting[digest].remove(dup_subdir)
+                            self.hits.append(dup_subdir)
+                            self.num_shared += 1
+        finally:
+            with self.cond:
+                self.ready.extend(self.waiting.pop(digest))
+                self.cond.notify_all()
+
+    def finish_later(self, subdir, successful, sim_dir):
+        """
+        finished, run by the storer thread so that copying outputs does not hold up the scheduler. Returns a future
+        whose result is that of finished, or None if subdir is not a representative and there is nothing to do
+        """
+        with self.cond:
+            if subdir not in self.reps:
+                return None
+            self.num_storing += 1
+        return self.storer.submit(self._finish_stored, subdir, successful, sim_dir)
+
+    def _finish_stored(self, subdir, successful, sim_dir):
+        try:
+            self.finished(subdir, successful, sim_dir)
+        finally:
+            with self.cond:
+                self.num_storing -= 1
+                self.cond.notify_all()
+
+    def pop_hits(self):
+        """
+        subdirectories given outputs since the last call
+        """
+        with self.cond:
+            hits = list(self.hits)
+            self.hits.clear()
+        return hits
+
+    def close(self):
+        self.storer.shutdown(wait = True)
+        self.executor.shutdown(wait = True)
@@ -0,0 +1,152 @@
+#-------------------------------------------------------------------------------
+# Name:        metrics_funcs.py
+# Purpose:     record the resources used by each ECOSSE simulation and summarise them at the end of the run
+# Author:      Mike Martin
+# Created:     17/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#!/usr/bin/env python
+
+__prog__ = 'metrics_funcs.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+import os
+from json import dump as json_dump
+from math import ceil, floor
+from os import makedirs
+from os.path import join
+from sys import platform
+
+METRICS_FNAME = 'spec_run_metrics{}.tsv'
+SUMMARY_FNAME = 'spec_run_metrics{}_summary.json'
+METRICS_HEADER = ['subdir', 'soil_id', 'region', 'event', 'exit_status', 'wall', 'user', 'sys', 'max_rss_mb']
+PERCENTILES = [50, 90, 99, 100]
+REGION_DEGREES = 10
+GRANULARITY = 120       # lat/lon directory names are indices of the 30 arc second HWSD grid
+
+# ru_maxrss is in kilobytes on Linux, bytes on macOS
+# ==================================================
+RSS_TO_MB = 1.0 / (1024 * 1024) if platform == 'darwin' else 1.0 / 1024
+
+def wait_rusage(proc):
+    """
+    non blocking reap of a Popen process which also returns its resource usage
+    returns (return code, rusage) - return code is None if the process is still running and rusage is None if
+    os.wait4 is not available on this platform, in which case Popen.poll is used. Once a return code has been
+    returned the caller keeps it: Popen does not know the real one, so proc.returncode must not be relied on
+    """
+    if not hasattr(os, 'wait4'):
+        return proc.poll(), None
+
+    try:
+        pid, status, rusage = os.wait4(proc.pid, os.WNOHANG)
+    except ChildProcessError:
+        return proc.poll(), None    # already reaped elsewhere
+    if pid == 0:
+        return None, None
+
+    # Popen finds the process gone straight away, while its pid cannot yet have been reused, rather than
+    # waiting on the pid later e.g. when the Popen object is garbage collected
+    # ===================================================================================================
+    proc.poll()
+    return os.waitstatus_to_exitcode(status), rusage
+
+def region_key(lat_id, lon_id, degrees = REGION_DEGREES):
+    """
+    coarse region of a cell: a block of degrees x degrees for lat/lon cells, the 100 km square for OSGB cells
+    """
+    try:
+        lat = 90.0 - int(lat_id) / GRANULARITY
+        lon = int(lon_id) / GRANULARITY - 180.0
+    except ValueError:
+        return lat_id[:2]
+
+    lat_band = int(floor(lat / degrees)) * degrees
+    lon_band = int(floor(lon / degrees)) * degrees
+    lat_hemi = 'S' if lat_band < 0 else 'N'
+    lon_hemi = 'W' if lon_band < 0 else 'E'
+    return '{}{}_{}{}'.format(abs(lat_band), lat_hemi, abs(lon_band), lon_hemi)
+
+def percentiles(values, pcnts = PERCENTILES):
+    """
+    nearest rank percentiles of a list of numbers
+    """
+    ordered = sorted(values)
+    result = {}
+    for pcnt in pcnts:
+        irank = max(int(ceil(pcnt / 100.0 * len(ordered))) - 1, 0)
+        result['p{}'.format(pcnt)] = round(ordered[irank], 3)
+    return result
+
+class MetricsRecorder(object):
+    """
+    Writes one tab separated line per finished simulation, flushed as written, and keeps the numbers so that
+    percentiles of wall time, cpu time and peak memory by soil and by region can be written at the end of the run
+    cpu and memory are blank when the resource usage of an instance is not available e.g. it was terminated
+    """
+    def __init__(self, out_dir, suffix = '', resume = False, region_degrees = REGION_DEGREES):
+
+        makedirs(out_dir, exist_ok = True)
+        self.summary_fname = join(out_dir, SUMMARY_FNAME.format(suffix))
+        self.region_degrees = region_degrees
+        self.groups = {'all': {}, 'soil_id': {}, 'region': {}}
+        self.num_recorded = 0
+
+        fname = join(out_dir, METRICS_FNAME.format(suffix))
+        write_header = not (resume and os.path.isfile(fname))
+        self.fobj = open(fname, 'a' if resume else 'w', buffering = 1)
+        if write_header:
+            self.fobj.write('\t'.join(METRICS_HEADER) + '\n')
+
+    def record(self, inst, event):
+        """
+        record the resources used by a finished instance
+        """
+        wall = inst.end_time - inst.start_time
+        user = sys_time = max_rss = None
+        if inst.rusage is not None:
+            user = round(inst.rusage.ru_utime, 3)
+            sys_time = round(inst.rusage.ru_stime, 3)
+            max_rss = round(inst.rusage.ru_maxrss * RSS_TO_MB, 1)
+
+        region = region_key(inst.lat_id, inst.lon_id, self.region_degrees)
+        fields = [os.path.split(inst.sim_dir)[1], inst.soil_id, region, event, inst.exit_status, round(wall, 3),
+                  user, sys_time, max_rss]
+        self.fobj.write('\t'.join('' if val is None else str(val) for val in fields) + '\n')
+
+        for grp, key in (('all', 'all'), ('soil_id', inst.soil_id), ('region', region)):
+            stats = self.groups[grp].setdefault(key, {'wall': [], 'cpu': [], 'max_rss_mb': [], 'failed': 0})
+            stats['wall'].append(wall)
+            if inst.rusage is not None:
+                stats['cpu'].append(user + sys_time)
+                stats['max_rss_mb'].append(max_rss)
+            if event != 'success':
+                stats['failed'] += 1
+        self.num_recorded += 1
+
+    def summary(self):
+        """
+        percentiles overall, by soil and by region of the simulations recorded in this run
+        """
+        summary = {}
+        for grp, by_key in self.groups.items():
+            summary[grp] = {}
+            for key in sorted(by_key):
+                stats = by_key[key]
+                entry = {'count': len(stats['wall']), 'failed': stats['failed']}
+                for metric in ['wall', 'cpu', 'max_rss_mb']:
+                    if len(stats[metric]) > 0:
+                        entry[metric] = percentiles(stats[metric])
+                summary[grp][key] = entry
+        return summary
+
+    def close(self):
+        """
+        write the summary, returns it
+        """
+        self.fobj.close()
+        summary = self.summary()
+        with open(self.summary_fname, 'w') as fobj:
+            json_dump(summary, fobj, indent = 2)
+        return summary
@@ -0,0 +1,212 @@
+#-------------------------------------------------------------------------------
+# Name:        order_funcs.py
+# Purpose:     launch the simulations expected to take longest first so that the run ends with few stragglers
+# Author:      Mike Martin
+# Created:     17/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#!/usr/bin/env python
+
+__prog__ = 'order_funcs.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+from argparse import ArgumentParser
+from datetime import timedelta
+from fnmatch import fnmatch
+from heapq import heappush, heappop
+from os import scandir
+from os.path import isfile, join
+
+from memo_funcs import MEMO_EXCLUDE
+
+ORDERS = ['discovery', 'longest_first']
+
+def _median(values):
+    ordered = sorted(values)
+    return ordered[len(ordered) // 2]
+
+class RuntimePredictor(object):
+    """
+    Predicts the wall time of a simulation from the metrics files of earlier runs, see metrics_funcs.py
+    in order of preference: the time the same cell took, the median for its soil and region, for its soil, for its
+    region and finally the median of all cells
+    """
+    def __init__(self, metrics_fnames):
+
+        self.by_cell = {}
+        by_feature = {}
+        walls = []
+        for fname in metrics_fnames:
+            if not isfile(fname):
+                continue
+            with open(fname, 'r') as fobj:
+                header = fobj.readline().rstrip('\n').split('\t')
+                try:
+                    icols = [header.index(col) for col in ('subdir', 'soil_id', 'region', 'wall')]
+                except ValueError:
+                    continue
+                for line in fobj:
+                    fields = line.rstrip('\n').split('\t')
+                    try:
+                        subdir, soil_id, region, wall = [fields[icol] for icol in icols]
+                        wall = float(wall)
+                    except (IndexError, ValueError):
+                        continue
+                    self.by_cell[subdir] = wall     # latest run wins
+                    for key in ((soil_id, region), (soil_id, None), (None, region)):
+                        by_feature.setdefault(key, []).append(wall)
+                    walls.append(wall)
+
+        self.by_feature = {key: _median(vals) for key, vals in by_feature.items()}
+        self.default = _median(walls) if len(walls) > 0 else None
+
+    @property
+    def has_history(self):
+        return self.default is not None
+
+    def predict(self, subdir, soil_id, region):
+        """
+        expected wall time in seconds, 0 if there is no history at all
+        """
+        if subdir in self.by_cell:
+            return self.by_cell[subdir]
+        for key in ((soil_id, region), (soil_id, None), (None, region)):
+            if key in self.by_feature:
+                return self.by_feature[key]
+        return 0.0 if self.default is None else self.default
+
+class InputSizePredictor(object):
+    """
+    Stands in for RuntimePredictor when no earlier run has recorded wall times. ECOSSE's run time grows with the
+    number of years simulated, which shows in the size of the weather and management files, so the total size of a
+    simulation's input files is used as a relative estimate. The predictions are bytes rather than seconds, so
+    has_history is False and no makespan is reported for them
+    """
+    def __init__(self, run_dir, exclude = MEMO_EXCLUDE):
+
+        self.run_dir = run_dir
+        self.exclude = exclude
+
+    @property
+    def has_history(self):
+        return False
+
+    def predict(self, subdir, soil_id, region):
+        """
+        total size in bytes of the input files, 0 if the directory cannot be read
+        """
+        total = 0
+        try:
+            with scandir(join(self.run_dir, subdir)) as entries:
+                for entry in entries:
+                    if entry.is_file() and not any(fnmatch(entry.name, pattern) for pattern in self.exclude):
+                        total += entry.stat().st_size
+        except OSError:
+            return 0.0
+        return float(total)
+
+def simulate_makespan(durations, slots):
+    """
+    makespan when durations are run in the order given, each starting as soon as one of slots slots is free
+    """
+    free_at = [0.0] * max(slots, 1)
+    for duration in durations:
+        start = heappop(free_at)
+        heappush(free_at, start + duration)
+    return max(free_at)
+
+def order_report(durations, slots):
+    """
+    makespans for the order given and for longest first, together with the lower bound: the larger of the longest
+    single duration and the total spread evenly over the slots
+    """
+    lower_bound = max(max(durations, default = 0.0), sum(durations) / max(slots, 1))
+    as_given = simulate_makespan(durations, slots)
+    longest_first = simulate_makespan(sorted(durations, reverse = True), slots)
+    saving = 100.0 * (as_given - longest_first) / as_given if as_given > 0 else 0.0
+    return {'cells': len(durations), 'slots': slots, 'discovery': as_given, 'longest_first': longest_first,
+            'lower_bound': lower_bound, 'saving_pcnt': saving}
+
+def format_report(report):
+
+    hms = {key: str(timedelta(seconds = int(report[key]))) for key in ('discovery', 'longest_first', 'lower_bound')}
+    return ('Predicted makespan for {} cells on {} slots: discovery order {}, longest first {} (saving {:.1f}%), '
+            'lower bound {}'.format(report['cells'], report['slots'], hms['discovery'], hms['longest_first'],
+                                                                        report['saving_pcnt'], hms['lower_bound']))
+
+class LongestFirstSource(object):
+    """
+    Wraps a source of simulation subdirectories, such as Discovery, handing out the subdirectory with the longest
+    predicted wall time of those found so far. Once the scan has finished the whole study is in longest first
+    order; before then only the subdirectories found so far are ordered so that launching starts straight away
+    features_func maps a subdirectory to its soil_id and region
+    """
+    def __init__(self, source, predictor, features_func):
+
+        self.source = source
+        self.predictor = predictor
+        self.features_func = features_func
+        self.heap = []
+        self.predictions = []       # in discovery order, for the report
+
+    def __getattr__(self, name):
+        return getattr(self.source, name)
+
+    @property
+    def exhausted(self):
+        return self.source.exhausted and len(self.heap) == 0
+
+    def _push(self, subdir):
+        soil_id, region = self.features_func(subdir)
+        wall = self.predictor.predict(subdir, soil_id, region)
+        heappush(self.heap, (-wall, len(self.predictions), subdir))
+        self.predictions.append(wall)
+
+    def get(self, block = False, timeout = None):
+
+        while True:
+            subdir = self.source.get(False)
+            if subdir is None:
+                break
+            self._push(subdir)
+
+        if len(self.heap) == 0 and block:
+            subdir = self.source.get(True, timeout)
+            if subdir is not None:
+                self._push(subdir)
+
+        if len(self.heap) == 0:
+            return None
+        return heappop(self.heap)[2]
+
+    def report(self, slots):
+        return order_report(self.predictions, slots)
+
+def main():
+    """
+    report what longest first ordering would have saved on an earlier run, from its metrics file
+    cells are taken in the order of the metrics file which is roughly the order they were launched
+    """
+    argparser = ArgumentParser(prog = __prog__, description = 'Compare launch orders using recorded wall times.')
+    argparser.add_argument('metrics', nargs = '+', help = 'spec_run_metrics.tsv files from earlier runs.')
+    argparser.add_argument('--slots', type = int, nargs = '+', default = [8, 16, 32, 64],
+                                                                    help = 'Numbers of instances to report for.')
+    args = argparser.parse_args()
+
+    for fname in args.metrics:
+        durations = []
+        with open(fname, 'r') as fobj:
+            iwall = fobj.readline().rstrip('\n').split('\t').index('wall')
+            for line in fobj:
+                try:
+                    durations.append(float(line.split('\t')[iwall]))
+                except (IndexError, ValueError):
+                    continue
+
+        print(fname)
+        for slots in args.slots:
+            print('    ' + format_report(order_report(durations, slots)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+#-------------------------------------------------------------------------------
+# Name:        priority_funcs.py
+# Purpose:     lower the cpu and I/O priority of running ECOSSE instances during working hours
+# Author:      Mike Martin
+# Created:     17/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#!/usr/bin/env python
+
+__prog__ = 'priority_funcs.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+import ctypes
+import ctypes.util
+import os
+import platform
+
+THROTTLES = ['concurrency', 'priority']
+THROTTLE_NICE = 19
+
+# ioprio_set is not wrapped by Python; constants from <linux/ioprio.h>
+# ===================================================================
+IOPRIO_SYSCALLS = {'x86_64': 251, 'i386': 289, 'i686': 289, 'aarch64': 30, 'armv7l': 315, 'ppc64le': 273,
+                   's390x': 282}
+IOPRIO_WHO_PROCESS = 1
+IOPRIO_WHO_PGRP = 2
+IOPRIO_CLASS_SHIFT = 13
+IO_CLASSES = {'none': 0, 'best-effort': 2, 'idle': 3}
+IO_BEST_EFFORT_LOWEST = 7
+
+def _ioprio_set():
+    """
+    return a function which sets the I/O priority of a process or process group, None if not supported
+    """
+    syscall_num = IOPRIO_SYSCALLS.get(platform.machine())
+    if os.name == 'nt' or syscall_num is None:
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno = True)
+        syscall = libc.syscall
+    except (OSError, AttributeError, TypeError):
+        return None
+
+    def ioprio_set(who, pid, io_class, data = 0):
+        if syscall(syscall_num, who, pid, (io_class << IOPRIO_CLASS_SHIFT) | data) < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+    return ioprio_set
+
+class PriorityThrottle(object):
+    """
+    Keeps the pids of running instances and lowers their cpu priority, and I/O priority where the kernel allows it,
+    while throttled e.g. during the workday window. Instances launched while throttled are lowered straight away
+    Unprivileged processes cannot raise cpu priority again, so instances lowered during the window keep running at
+    the lower priority once it ends; instances launched afterwards run at normal priority. Instances started in a
+    session of their own are lowered as a process group so that any processes ECOSSE forks are included
+    """
+    def __init__(self, niceness = THROTTLE_NICE, io_class = 'idle', group = False):
+
+        self.niceness = niceness
+        self.io_class = IO_CLASSES[io_class]
+        self.group = group
+        self.available = hasattr(os, 'setpriority')
+        self.base_nice = os.getpriority(os.PRIO_PROCESS, 0) if self.available else 0   # restored to, as inherited
+        self.ioprio_set = _ioprio_set()
+        self.pids = set()
+        self.throttled = False
+        self.num_stuck = 0      # instances whose priority could not be raised again
+        self.io_error = None
+
+    def _set(self, pid, throttled):
+        """
+        lower or restore the priority of one instance, returns False if it could not be restored
+        """
+        which = os.PRIO_PGRP if self.group else os.PRIO_PROCESS
+        restored = True
+        try:
+            os.setpriority(which, pid, max(self.niceness, self.base_nice) if throttled else self.base_nice)
+        except ProcessLookupError:
+            return True
+        except PermissionError:
+            restored = False
+
+        if self.ioprio_set is not None:
+            who = IOPRIO_WHO_PGRP if self.group else IOPRIO_WHO_PROCESS
+            data = IO_BEST_EFFORT_LOWEST if self.io_class == IO_CLASSES['best-effort'] else 0
+            try:
+                if throttled:
+                    self.ioprio_set(who, pid, self.io_class, data)
+                else:
+                    self.ioprio_set(who, pid, IO_CLASSES['none'])
+            except ProcessLookupError:
+                pass
+            except OSError as err:
+                self.io_error = err
+                self.ioprio_set = None
+        return restored
+
+    def add(self, pid):
+        """
+        an instance has been launched
+        """
+        self.pids.add(pid)
+        if self.throttled:
+            self._set(pid, True)
+
+    def remove(self, pid):
+        self.pids.discard(pid)
+
+    def update(self, throttled):
+        """
+        apply a change of throttling to all running instances, returns True if it changed
+        """
+        if throttled == self.throttled:
+            return False
+        self.throttled = throttled
+        for pid in list(self.pids):
+            if not self._set(pid, throttled):
+                self.num_stuck += 1
+        return True
@@ -0,0 +1,130 @@
+#-------------------------------------------------------------------------------
+# Name:        reap_funcs.py
+# Purpose:     block the spec_run scheduler until an ECOSSE subprocess exits
+# Author:      Mike Martin
+# Created:     17/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#!/usr/bin/env python
+
+__prog__ = 'reap_funcs.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+import os
+import signal
+import selectors
+from socket import socketpair
+from threading import current_thread, main_thread
+from time import sleep
+
+POLL_INTERVAL = 0.05    # seconds, used only when no exit notification mechanism is available
+WAIT_MODES = ['event', 'poll']
+
+class ChildWaiter(object):
+    """
+    Waits for ECOSSE subprocesses to exit so that free slots can be refilled immediately.
+    Three mechanisms are used, in order of preference:
+        pidfd   - one pollable file descriptor per process (Linux 5.3 onwards)
+        sigchld - SIGCHLD is routed to a self-pipe via signal.set_wakeup_fd (other POSIX systems)
+        poll    - fixed interval sleep (Windows or when requested in the config file)
+    """
+    def __init__(self, wait_mode = 'event'):
+
+        self.selector = None
+        self.pidfds = {}
+        self.wakeup_socks = None
+        self.old_handler = None
+        self.old_wakeup_fd = None
+        self.mode = 'poll'
+
+        if wait_mode != 'event':
+            return
+
+        if hasattr(os, 'pidfd_open'):
+            try:
+                os.close(os.pidfd_open(os.getpid()))
+            except OSError:
+                pass
+            else:
+                self.selector = selectors.DefaultSelector()
+                self.mode = 'pidfd'
+                return
+
+        if hasattr(signal, 'SIGCHLD') and current_thread() is main_thread():
+            rsock, wsock = socketpair()
+            rsock.setblocking(False)
+            wsock.setblocking(False)
+            self.old_wakeup_fd = signal.set_wakeup_fd(wsock.fileno())
+            self.old_handler = signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+            self.wakeup_socks = (rsock, wsock)
+            self.selector = selectors.DefaultSelector()
+            self.selector.register(rsock, selectors.EVENT_READ)
+            self.mode = 'sigchld'
+
+    def register(self, popen):
+        """
+        start watching a newly launched subprocess
+        """
+        if self.mode != 'pidfd':
+            return
+        try:
+            pidfd = os.pidfd_open(popen.pid)
+        except OSError:
+            return      # already reaped - will be picked up by the next poll of the instances
+
+        self.pidfds[popen.pid] = pidfd
+        self.selector.register(pidfd, selectors.EVENT_READ, popen)
+
+    def unregister(self, popen):
+        """
+        stop watching a subprocess which has finished or been terminated
+        """
+        pidfd = self.pidfds.pop(popen.pid, None)
+        if pidfd is not None:
+            self.selector.unregister(pidfd)
+            os.close(pidfd)
+
+    def wait(self, timeout):
+        """
+        block for up to timeout seconds or until at least one subprocess exits
+        returns True if woken by a subprocess exit
+        """
+        if self.mode == 'poll':
+            sleep(min(timeout, POLL_INTERVAL))
+            return False
+
+        try:
+            events = self.selector.select(timeout)
+        except InterruptedError:
+            return True
+
+        if self.mode == 'sigchld' and len(events) > 0:
+            # drain the wakeup bytes - any number of signals may have been coalesced
+            # =====================================================================
+            try:
+                while self.wakeup_socks[0].recv(4096):
+                    pass
+            except (BlockingIOError, InterruptedError):
+                pass
+
+        return len(events) > 0
+
+    def close(self):
+        """
+        release file descriptors and restore signal handling
+        """
+        for pidfd in self.pidfds.values():
+            os.close(pidfd)
+        self.pidfds = {}
+
+        if self.mode == 'sigchld':
+            signal.set_wakeup_fd(self.old_wakeup_fd)
+            signal.signal(signal.SIGCHLD, self.old_handler)
+            for sock in self.wakeup_socks:
+                sock.close()
+            self.wakeup_socks = None
+
+        if self.selector is not None:
+            self.selector.close()
+            self.selector = None
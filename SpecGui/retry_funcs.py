@@ -0,0 +1,148 @@
+#-------------------------------------------------------------------------------
+# Name:        retry_funcs.py
+# Purpose:     rerun failed and timed out simulations within the same run, with backoff between attempts
+# Author:      Mike Martin
+# Created:     17/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#!/usr/bin/env python
+
+__prog__ = 'retry_funcs.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+from heapq import heappush, heappop
+from os import makedirs
+from os.path import join
+from threading import Condition
+from time import time
+
+RETRIES_FNAME = 'spec_run_retries{}.tsv'
+MAX_ATTEMPTS = 1        # no retries
+RETRY_DELAY = 60.0      # seconds before the first retry, doubled for each further attempt
+RETRY_BACKOFF = 2.0
+POLL_INTERVAL = 1.0     # longest wait on the wrapped source before checking for retries falling due
+
+class RetrySource(object):
+    """
+    Wraps a source of simulation subdirectories, such as Discovery, handing out simulations which failed or timed
+    out again after a delay which grows with each attempt. Retries have lower priority than first attempts: they are
+    only handed out when the wrapped source has nothing ready. The source is not exhausted until every simulation
+    handed out has had its outcome and no retries are pending
+    """
+    def __init__(self, source, max_attempts = MAX_ATTEMPTS, delay = RETRY_DELAY, backoff = RETRY_BACKOFF):
+
+        self.source = source
+        self.max_attempts = max_attempts
+        self.delay = delay
+        self.backoff = backoff
+        self.cond = Condition()
+        self.heap = []          # (due time, subdir) of retries waiting for their delay
+        self.attempts = {}      # attempt number of each simulation handed out or pending
+        self.in_flight = 0
+        self.history = {}       # outcomes of each attempt of simulations which have failed at least once
+
+    def __getattr__(self, name):
+        return getattr(self.source, name)
+
+    @property
+    def exhausted(self):
+        with self.cond:
+            return self.source.exhausted and len(self.heap) == 0 and self.in_flight == 0
+
+    @property
+    def num_pending(self):
+        return len(self.heap)
+
+    def attempt(self, subdir):
+        """
+        attempt number of a simulation which has been handed out, starting at 1
+        """
+        return self.attempts.get(subdir, 1)
+
+    def _hand_out(self, subdir, attempt):
+        self.attempts[subdir] = attempt
+        self.in_flight += 1
+        return subdir
+
+    def get(self, block = False, timeout = None):
+        """
+        return the next simulation directory, or None if none is available within the timeout
+        """
+        deadline = None if timeout is None else time() + timeout
+        while True:
+            subdir = self.source.get(False)
+            with self.cond:
+                if subdir is not None:
+                    return self._hand_out(subdir, 1)
+
+                now = time()
+                if len(self.heap) > 0 and self.heap[0][0] <= now:
+                    subdir = heappop(self.heap)[1]
+                    return self._hand_out(subdir, self.attempts[subdir] + 1)
+
+                if not block or (self.source.exhausted and len(self.heap) == 0 and self.in_flight == 0):
+                    return None
+
+                wait = POLL_INTERVAL
+                if len(self.heap) > 0:
+                    wait = min(wait, self.heap[0][0] - now)
+                if deadline is not None:
+                    if deadline <= now:
+                        return None
+                    wait = min(wait, deadline - now)
+
+                # the wrapped source has nothing more, wait for a retry to fall due or an outcome to arrive
+                # ========================================================================================
+                if self.source.exhausted:
+                    self.cond.wait(wait)
+                    continue
+
+            subdir = self.source.get(True, wait)
+            if subdir is not None:
+                with self.cond:
+                    return self._hand_out(subdir, 1)
+
+    def outcome(self, subdir, event):
+        """
+        record the outcome of an attempt: success, failure or timeout
+        returns True if the simulation will be retried, in which case the outcome is not final
+        """
+        with self.cond:
+            self.in_flight -= 1
+            attempt = self.attempts.get(subdir, 1)
+            if event != 'success' or subdir in self.history:
+                self.history.setdefault(subdir, []).append(event)
+
+            retry = event != 'success' and attempt < self.max_attempts
+            if retry:
+                heappush(self.heap, (time() + self.delay * self.backoff ** (attempt - 1), subdir))
+            else:
+                del self.attempts[subdir]
+            self.cond.notify_all()
+        return retry
+
+    def summary(self):
+        """
+        simulations which succeeded after failing i.e. transient failures, and those which failed every attempt
+        """
+        transient = [subdir for subdir, events in self.history.items() if events[-1] == 'success']
+        persistent = [subdir for subdir, events in self.history.items()
+                                                        if events[-1] != 'success' and subdir not in self.attempts]
+        return transient, persistent
+
+    def write_report(self, out_dir, suffix = ''):
+        """
+        one line per simulation which failed at least once: the outcome of each attempt and whether the failure
+        was transient or persistent. Returns the path of the report
+        """
+        makedirs(out_dir, exist_ok = True)
+        fname = join(out_dir, RETRIES_FNAME.format(suffix))
+        transient, persistent = self.summary()
+        with open(fname, 'w') as fobj:
+            fobj.write('subdir\tattempts\toutcomes\tfailure\n')
+            for kind, subdirs in (('transient', transient), ('persistent', persistent)):
+                for subdir in sorted(subdirs):
+                    events = self.history[subdir]
+                    fobj.write('{}\t{}\t{}\t{}\n'.format(subdir, len(events), ','.join(events), kind))
+        return fname
@@ -0,0 +1,194 @@
+#-------------------------------------------------------------------------------
+# Name:        shard_funcs.py
+# Purpose:     split a study between independent spec_run processes e.g. the tasks of a batch array job
+# Author:      Mike Martin
+# Created:     17/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#!/usr/bin/env python
+
+__prog__ = 'shard_funcs.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+from glob import glob
+from json import dump as json_dump, load as json_load
+from os import makedirs, replace, getpid
+from os.path import join, isdir
+from socket import gethostname
+from time import time
+from zlib import crc32
+
+from journal_funcs import merge_journals
+from collect_funcs import HAVE_NUMPY, RASTER_DEFN_FNAME
+
+if HAVE_NUMPY:
+    import numpy as np
+
+SHARD_BY = ['hash', 'lat-band', 'soil']
+LAT_BAND_ROWS = 120         # one degree bands of the 30 arc second grid used in lat/lon directory names
+PROGRESS_INTERVAL = 30.0    # seconds between updates of a shard's progress record
+SHARDS_DIR = 'shards'
+PROGRESS_FNAME = 'progress{}.json'
+
+def parse_shard(text):
+    """
+    return (index, count) from I/N where I runs from 1 to N, raises ValueError if not valid
+    """
+    try:
+        index, count = [int(val) for val in text.split('/')]
+    except ValueError:
+        raise ValueError('shard must be given as I/N e.g. 3/10, not {}'.format(text))
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError('shard {} out of range, I must be from 1 to N'.format(text))
+    return index, count
+
+def shard_suffix(index, count):
+    return '_shard{}of{}'.format(index, count)
+
+def shard_key(subdir, shard_by):
+    """
+    number from which the shard of a simulation directory is derived, the same in every process
+    lat-band keeps one degree bands of latitude together, by the 100 km square for OSGB directories; soil keeps all
+    directories of a soil together
+    """
+    parts = subdir.split('_')
+    if shard_by == 'lat-band':
+        if subdir[0:3] == 'lat':
+            try:
+                return int(parts[0][3:]) // LAT_BAND_ROWS
+            except ValueError:
+                pass
+        return crc32(bytes(parts[0][:2], 'utf-8'))
+    elif shard_by == 'soil':
+        return crc32(bytes(parts[-1], 'utf-8'))
+    return crc32(bytes(subdir, 'utf-8'))
+
+class ShardFilter(object):
+    """
+    Keeps the simulation directories belonging to one shard of N; used as the filter function of Discovery, so
+    every shard scans the whole simulations directory but queues only its own directories
+    num_assigned counts the directories found so far which belong to this shard
+    """
+    def __init__(self, index, count, shard_by = 'hash'):
+
+        self.index = index
+        self.count = count
+        self.shard_by = shard_by
+        self.num_assigned = 0
+
+    def __call__(self, subdirs):
+        subdirs = [subdir for subdir in subdirs if shard_key(subdir, self.shard_by) % self.count == self.index - 1]
+        self.num_assigned += len(subdirs)
+        return subdirs
+
+class ShardRecorder(object):
+    """
+    Writes the progress of a shard to a small JSON file in the shards directory of the results directory, replaced
+    atomically every PROGRESS_INTERVAL seconds and marked complete at the end of the run
+    """
+    def __init__(self, out_dir, index, count, shard_by, interval = PROGRESS_INTERVAL):
+
+        self.shards_dir = join(out_dir, SHARDS_DIR)
+        makedirs(self.shards_dir, exist_ok = True)
+        self.fname = join(self.shards_dir, PROGRESS_FNAME.format(shard_suffix(index, count)))
+        self.interval = interval
+        self.last_write = None
+        self.record = {'shard': index, 'count': count, 'shard_by': shard_by, 'host': gethostname(), 'pid': getpid(),
+                       'start_time': time(), 'complete': False}
+
+    def update(self, num_found, num_sims, completed, failed, complete = False):
+        """
+        write the record if it is due or the shard has completed
+        """
+        now = time()
+        if not complete and self.last_write is not None and now - self.last_write < self.interval:
+            return
+        self.record.update({'num_found': num_found, 'num_sims': num_sims, 'completed': completed, 'failed': failed,
+                            'update_time': now, 'complete': complete})
+        with open(self.fname + '.tmp', 'w') as fobj:
+            json_dump(self.record, fobj, indent = 2)
+        replace(self.fname + '.tmp', self.fname)
+        self.last_write = now
+
+def read_progress(out_dir):
+    """
+    progress records of all shards, in order of the number of shards and shard
+    """
+    records = []
+    for fname in sorted(glob(join(out_dir, SHARDS_DIR, PROGRESS_FNAME.format('_shard*')))):
+        try:
+            with open(fname, 'r') as fobj:
+                records.append(json_load(fobj))
+        except (OSError, ValueError):
+            continue
+    return sorted(records, key = lambda rec: (rec['count'], rec['shard']))
+
+def merge_rasters(out_dir):
+    """
+    combine the rasters written by each shard, or worker, into the rasters directory cell by cell where its mask is
+    set; rasters whose grid differs from the first are skipped. Returns the number of raster directories merged
+    """
+    shard_dirs = sorted(glob(join(out_dir, 'rasters_*')))
+    if len(shard_dirs) == 0 or not HAVE_NUMPY:
+        return 0
+
+    merged_dir = join(out_dir, 'rasters')
+    defn = None
+    num_merged = 0
+    for shard_dir in shard_dirs:
+        try:
+            with open(join(shard_dir, RASTER_DEFN_FNAME), 'r') as fobj:
+                shard_defn = json_load(fobj)
+        except (OSError, ValueError):
+            continue
+
+        if defn is None:
+            defn = shard_defn
+            shape = tuple(defn['shape'])
+            makedirs(merged_dir, exist_ok = True)
+            mask = np.lib.format.open_memmap(join(merged_dir, 'mask.npy'), mode = 'w+', dtype = 'uint8',
+                                                                                                shape = shape[:3])
+            rasters = {varname: np.lib.format.open_memmap(join(merged_dir, varname + '.npy'), mode = 'w+',
+                                                dtype = defn['dtype'], shape = shape) for varname in defn['varnames']}
+        elif shard_defn != defn:
+            continue
+
+        # one soil at a time so that memory use is bounded by the size of a single soil's raster
+        # =======================================================================================
+        shard_mask = np.load(join(shard_dir, 'mask.npy'), mmap_mode = 'r')
+        shard_rasters = {varname: np.load(join(shard_dir, varname + '.npy'), mmap_mode = 'r')
+                                                                                    for varname in defn['varnames']}
+        for isoil in range(shape[0]):
+            cells = shard_mask[isoil] == 1
+            if not cells.any():
+                continue
+            for varname in defn['varnames']:
+                rasters[varname][isoil][cells] = shard_rasters[varname][isoil][cells]
+            mask[isoil][cells] = 1
+        num_merged += 1
+
+    if defn is not None:
+        for raster in rasters.values():
+            raster.flush()
+        mask.flush()
+        with open(join(merged_dir, RASTER_DEFN_FNAME), 'w') as fobj:
+            json_dump(defn, fobj, indent = 2)
+    return num_merged
+
+def merge_shards(sims_dir, out_dir):
+    """
+    combine the records of the shards of a sharded run: their journals into the journal of an unsharded run, so
+    that the study can be resumed with any sharding or none, and their rasters. Returns a report
+    """
+    report = {'journal_cells': merge_journals(sims_dir), 'shards': read_progress(out_dir), 'missing': [],
+              'rasters_merged': 0}
+
+    counts = set(rec['count'] for rec in report['shards'])
+    for count in counts:
+        present = set(rec['shard'] for rec in report['shards'] if rec['count'] == count)
+        report['missing'] += ['{}/{}'.format(index, count) for index in range(1, count + 1) if index not in present]
+
+    if isdir(out_dir):
+        report['rasters_merged'] = merge_rasters(out_dir)
+    return report
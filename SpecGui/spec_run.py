@@ -11,11 +11,13 @@ __prog__ = 'spec_run'
 __version__ = '0.0'
 
 from argparse import ArgumentParser
-from datetime import datetime
+from glob import glob
+from datetime import datetime, timedelta
 from json import load as json_load
 import math
 from os.path import abspath, expanduser, expandvars, normpath, join, isfile, split, isdir
-from os import getcwd, walk, chdir
+from os import getcwd, getpid, name as os_name
+from concurrent.futures import ThreadPoolExecutor
 
 from subprocess import Popen, PIPE, STDOUT
 from sys import stdout, exit
@@ -24,19 +26,95 @@ from multiprocessing import cpu_count
 
 from socket import socket, AF_INET, SOCK_STREAM, gethostname
 from copy import copy, deepcopy
+from types import SimpleNamespace
 
 from set_up_logging import set_up_logging
+from reap_funcs import ChildWaiter, WAIT_MODES
+from async_engine import AsyncEngine
+from input_output_funcs import check_ecosse_success, read_study_definition, TAIL_BYTES
+from capture_funcs import OutputCapture, CaptureReader, STDOUT_MODES, EOF_WAIT
+from metrics_funcs import MetricsRecorder, wait_rusage, region_key, REGION_DEGREES
+from eta_funcs import EtaEstimator
+from order_funcs import RuntimePredictor, InputSizePredictor, LongestFirstSource, format_report, ORDERS
+from config_watch_funcs import ConfigWatcher
+from shard_funcs import ShardFilter, ShardRecorder, parse_shard, shard_suffix, merge_shards, SHARD_BY
+from watchdog_funcs import Watchdog, KILL_GRACE
+from retry_funcs import RetrySource, MAX_ATTEMPTS, RETRY_DELAY, RETRY_BACKOFF
+from memo_funcs import (MemoCache, MemoSource, file_digest, MEMO_EXCLUDE, MEMO_THREADS, MEMO_MAX_GB,
+                                                                                MEMO_MAX_AGE_DAYS, MEMO_ERRORS)
+from journal_funcs import Journal, read_journal
+from discover_funcs import Discovery, REF_SYSTEMS
+from load_funcs import ConcurrencyController
+from affinity_funcs import CorePool
+from priority_funcs import PriorityThrottle, THROTTLES, THROTTLE_NICE, IO_CLASSES
+from cleanup_funcs import Deleter, DELETE_THREADS
+from archive_funcs import ArchiveWriter, ARCHIVE_CELLS, ARCHIVE_FILES, COMPRESSIONS
+from collect_funcs import ResultsCollector, RasterWriter, read_summary, RESULTS_BATCH, MAX_SOILS, HAVE_NUMPY
+from staging_funcs import Stager, StagedSource, STAGING_OUTPUTS, STAGING_THREADS, STAGING_PREFETCH
+from cluster_funcs import Coordinator, RemoteSource, COORDINATOR_PORT, COORDINATOR_BIND, BATCH_SIZE
 
 sleepTime = 5
 WARN_STR = '*** Warning *** '
 PROGRAM_ID = 'spec_run'
 ERROR_STR = '*** Error *** '
+PROGRESS_INTERVAL = 1.0     # seconds between progress bar updates
+ENGINES = ['sync', 'asyncio']
+COORDINATOR_LINGER = 10.0   # seconds the coordinator waits for workers to disconnect once all cells are done
+VERIFY_THREADS = 32         # concurrent SUMMARY.OUT checks when rescanning the simulations directory
+EOF_POLL = 0.05             # seconds between checks for the end of captured output of instances which have exited
+LAUNCH_THREADS = 8          # instances launched at once when several slots are free
+
+ADAPTIVE_ATTRIBS = {'adaptive_min': 'min_inst', 'adaptive_load': 'target_load', 'adaptive_free_mb': 'min_free_mem',
+                    'adaptive_cpu_psi': 'max_cpu_pressure', 'adaptive_mem_psi': 'max_mem_pressure',
+                    'adaptive_interval': 'interval'}
 
 CONFIG_RQRD_ATTRIBS = {'General': ['config_check_interval', 'cropName'],
                      'Simulations': ['delete_sim_dirs', 'exepath', 'output_variables', 'resume_frm_prev', 'sims_dir',
                                      'timeout'],
                      'Speed': ['end_work', 'fast', 'slow', 'start_work', 'use_cpus', 'workdays']}
 
+# type and range of each attribute read from the config file: (kind, bound) where bound is the least value of a
+# number or the permitted values of a choice; path attributes may be null or empty
+# ===============================================================================================================
+CONFIG_ATTRIB_SPECS = {
+    'General': {'config_check_interval': ('number', 0), 'cropName': ('str', None), 'cluster_token': ('str', None)},
+    'Simulations': {'output_variables': ('strs', None), 'output_dir': ('path', None), 'results_batch': ('int', 1),
+                    'output_rasters': ('bool', None), 'max_soils': ('int', 1), 'exepath': ('str', None),
+                    'sims_dir': ('str', None), 'ref_sys': ('choice', REF_SYSTEMS + [None, '']),
+                    'timeout': ('positive', None), 'delete_sim_dirs': ('bool', None), 'delete_threads': ('int', 1),
+                    'keep_outputs': ('strs', None), 'archive': ('bool', None), 'archive_dir': ('path', None),
+                    'archive_cells': ('int', 1), 'archive_compression': ('choice', list(COMPRESSIONS)),
+                    'archive_files': ('strs', None), 'resume_frm_prev': ('bool', None), 'max_attempts': ('int', 1),
+                    'retry_delay': ('number', 0), 'retry_backoff': ('number', 1), 'retry_timeout': ('positive', None),
+                    'memo': ('bool', None), 'memo_cache_dir': ('path', None), 'memo_links': ('bool', None),
+                    'memo_exclude': ('strs', None), 'memo_threads': ('int', 1), 'memo_max_gb': ('number', 0),
+                    'memo_max_age_days': ('number', 0), 'staging_dir': ('path', None),
+                    'staging_outputs': ('strs', None), 'staging_threads': ('int', 1), 'staging_prefetch': ('int', 0),
+                    'metrics': ('bool', None), 'region_degrees': ('positive', None), 'history_files': ('strs', None),
+                    'journal': ('bool', None)},
+    'Speed': {'use_cpus': ('number', 0), 'fast': ('number', 0), 'slow': ('number', 0), 'workdays': ('strs', None),
+              'start_work': ('str', None), 'end_work': ('str', None), 'engine': ('choice', ENGINES),
+              'adaptive': ('bool', None), 'adaptive_min': ('int', 1), 'adaptive_load': ('positive', None),
+              'adaptive_free_mb': ('number', 0), 'adaptive_cpu_psi': ('number', 0),
+              'adaptive_mem_psi': ('number', 0), 'adaptive_interval': ('number', 0), 'pin_cpus': ('bool', None),
+              'order': ('choice', ORDERS), 'launch_threads': ('int', 1), 'kill_grace': ('number', 0),
+              'process_groups': ('bool', None), 'throttle': ('choice', THROTTLES), 'throttle_nice': ('int', 0),
+              'throttle_ionice': ('choice', list(IO_CLASSES)), 'stdout_mode': ('choice', STDOUT_MODES),
+              'capture_bytes': ('int', 1), 'wait_mode': ('choice', WAIT_MODES)}}
+
+# attributes which are only used when the run starts; a reloaded config file cannot change them
+# ==============================================================================================
+CONFIG_STARTUP_ATTRIBS = {
+    'General': ['cropName', 'cluster_token'],
+    'Simulations': ['output_variables', 'output_dir', 'results_batch', 'output_rasters', 'max_soils', 'exepath',
+                    'sims_dir', 'ref_sys', 'delete_sim_dirs', 'delete_threads', 'keep_outputs', 'archive',
+                    'archive_dir', 'archive_cells', 'archive_compression', 'archive_files', 'resume_frm_prev',
+                    'max_attempts', 'memo', 'memo_cache_dir', 'memo_links', 'memo_exclude', 'memo_threads',
+                    'memo_max_gb', 'memo_max_age_days', 'staging_dir', 'staging_outputs', 'staging_threads',
+                    'staging_prefetch', 'metrics', 'region_degrees', 'history_files', 'journal'],
+    'Speed': ['engine', 'pin_cpus', 'order', 'launch_threads', 'process_groups', 'stdout_mode', 'capture_bytes',
+              'wait_mode']}
+
 class Instance(object):
     """
     Class to store info about a subprocess/instance of ECOSSE     
@@ -55,6 +133,15 @@ class Instance(object):
             self.start_time = start_time
             self.finished = False
             self.successful = None
+            self.timed_out = False
+            self.attempt = 1
+            self.timeout = None     # seconds before the instance is terminated, longer for retries if so configured
+            self.cpu = None         # cpu the instance is pinned to, if any
+            self.work_dir = sim_dir # directory ECOSSE runs in, differs from sim_dir when staging
+            self.capture = None     # output held in memory rather than redirected to stdout.txt
+            self.end_time = None
+            self.exit_status = None
+            self.rusage = None      # resource usage from os.wait4, None where it is not available
 
 class RunSites(object):
     """
@@ -62,7 +149,8 @@ class RunSites(object):
     """
     daynums = {'mon': 0, 'tue': 1, 'wed': 2, 'thu': 3, 'fri': 4, 'sat': 5, 'sun': 6}
 
-    def __init__(self, configfile):
+    def __init__(self, configfile, engine = None, verify = False, worker = None, batch_size = BATCH_SIZE,
+                                                                                shard = None, shard_by = 'hash'):
 
         if not isfile(configfile):
             print('Config file <{}> does not exist'.format(configfile))
@@ -70,6 +158,38 @@ class RunSites(object):
             exit(0)
 
         self.configfile = configfile
+        self.engine_arg = engine    # overrides engine in config file when supplied on the command line
+        self.verify = verify        # rescan simulation directories rather than trust the journal when resuming
+        self.worker = worker        # HOST:PORT of the coordinator when running as a worker
+        self.batch_size = batch_size
+        self.shard = shard          # (index, count) of the part of the study run by this process, if sharded
+        self.shard_by = shard_by
+        self.shard_recorder = None  # writes the progress of this shard for merging
+        self.shard_filter = None    # picks the directories of this shard from those discovered
+        self.journal = None
+        self.discovery = None
+        self.reporter = None        # sends outcomes to the coordinator when running as a worker
+        self.controller = None      # adaptive concurrency controller
+        self.prioritiser = None     # lowers the priority of instances during the workday window
+        self.core_pool = None       # cpus available for pinning instances
+        self.stager = None          # copies simulation directories to local scratch space
+        self.collector = None       # gathers output variables from SUMMARY.OUT as simulations succeed
+        self.raster_writer = None   # writes output variables into gridded rasters
+        self.deleter = None         # removes the directories of successful simulations in the background
+        self.kept_dirs = set()      # successful simulation directories not deleted since results were not written
+        self.keep_all = False       # results could not be written at the end of the run, no more directories deleted
+        self.archiver = None        # packs the files of successful simulations into compressed archives
+        self.metrics = None         # records the resources used by each simulation
+        self.ordering = None        # hands out simulations longest expected first
+        self.eta = None             # estimates time left from recent throughput
+        self.eta_follows_window = True
+        self.capture_reader = None  # drains instance output into memory when stdout_mode is capture
+        self.launcher = None        # thread pool launching instances several at once
+        self.watchdog = None        # terminates instances which overrun their timeout
+        self.config_watcher = None  # reports changes to the config file
+        self.retries = None         # hands out failed simulations again
+        self.memo = None            # runs simulations with identical inputs once, sharing their outputs
+        self.memo_pending = []      # representatives being stored, with what is needed to dispose of them
 
         try:
             self.maxcpus = cpu_count()
@@ -82,24 +202,30 @@ class RunSites(object):
         TIMEOUT = 60
         HOST = gethostname()
         PORT = 65432  # the same port as used by the server
-        with socket(AF_INET, SOCK_STREAM) as client:
-            client.settimeout(TIMEOUT)
+        client = socket(AF_INET, SOCK_STREAM)
+        client.settimeout(TIMEOUT)
+        try:
+            client.connect((HOST, PORT))
+        except OSError as err:
+            print(WARN_STR + str(err))
+            client.close()
+        else:
+            client.sendall(b'Hello, world')
             try:
-                client.connect((HOST, PORT))
-            except ConnectionRefusedError as err:
-                print(WARN_STR + str(err))
+                data = client.recv(1024)
+            except (ConnectionAbortedError, ConnectionResetError) as err:
+                print(str(err))
             else:
-                client.sendall(b'Hello, world')
-                try:
-                    data = client.recv(1024)
-                except (ConnectionAbortedError, ConnectionResetError) as err:
-                    print(str(err))
-                else:
-                    print('Received', repr(data))
+                print('Received', repr(data))
 
-                self.client = client
+            self.client = client    # kept open for progress messages, closed at the end of the run
 
+        # watching starts before the first read so that no change is missed
+        # =================================================================
+        self.config_watcher = ConfigWatcher(configfile)
         self._get_config()
+        self.config_watcher.stat_interval = self.config_check_interval
+        self.lgr.info('Watching config file for changes using ' + self.config_watcher.mode)
 
     def _check_subprocs(self, instances):
         """
@@ -112,92 +238,254 @@ class RunSites(object):
         # Wait until the ecosse subprocesses have finished before proceeding
         # ==================================================================
         for inst in instances:
-            retcode = inst.inst.poll()
-            if retcode is not None:     # Process has finished.
-                if retcode != 0:
-                    self.lgr.error('Instance failed giving return code: {} (instance {}) ({}) '
-                                                            .format(retcode, inst.num, inst.sim_dir))
-                    inst.successful = False
-                elif not self._sim_successful(inst):
-                    self.lgr.error('Instance failed: (instance {}) ({}). Please check {} for details'
-                                                    .format(inst.num, inst.sim_dir, inst.stdout_path))
-                    inst.successful = False
-                else:
-                    self.lgr.info('Simulation sucessful: {} (instance {})'.format(inst.sim_dir, inst.num))
-                    inst.successful = True
-                inst.finished = True
+            if inst.exit_status is None:
+                retcode, inst.rusage = wait_rusage(inst.inst)
+                if retcode is None:
+                    continue
+                inst.end_time = time()      # Process has finished.
+                inst.exit_status = retcode
+                self.waiter.unregister(inst.inst)
+            retcode = inst.exit_status
+
+            # captured output is checked once the reader has reached end of file, on a later pass if need be
+            # so that other instances are not held up
+            # ================================================================================================
+            if self._awaiting_eof(inst):
+                continue
+
+            if inst.timed_out:
+                inst.successful = False
+            elif retcode != 0:
+                self.lgr.error('Instance failed giving return code: {} (instance {}) ({}) '
+                                                        .format(retcode, inst.num, inst.sim_dir))
+                inst.successful = False
+            elif not self._sim_successful(inst):
+                self.lgr.error('Instance failed: (instance {}) ({}). Please check {} for details'
+                                                .format(inst.num, inst.sim_dir, inst.stdout_path))
+                inst.successful = False
+            else:
+                self.lgr.info('Simulation sucessful: {} (instance {})'.format(inst.sim_dir, inst.num))
+                inst.successful = True
+            inst.finished = True
+
+    def _awaiting_eof(self, inst):
+        """
+        True if an instance which has exited may still have captured output to come: its pipe has not reached end
+        of file and EOF_WAIT seconds have not passed since it exited
+        """
+        if inst.capture is None or inst.timed_out or inst.exit_status != 0:
+            return False
+        return not inst.capture.done.is_set() and time() - inst.end_time < EOF_WAIT
+
+    def _spawn(self, sim_dir):
+        """
+        Stage in, launch ECOSSE in its working directory and provide the user input. Changes no process wide state
+        so can be called from several launcher threads at once. Returns the process, the path ECOSSE output goes to,
+        the working directory and the output capture if any; raises OSError if ECOSSE could not be launched
+        """
+        work_dir = self._stage_in(sim_dir)
+        capture = None
+        try:
+            if self.capture_reader is None:
+                stdout_path = join(work_dir, 'stdout.txt')
+                with open(stdout_path, 'w') as fstdout:
+                    new_inst = Popen(self.exe_path, shell = False, stdin = PIPE, stdout = fstdout, stderr = STDOUT,
+                                                        cwd = work_dir, start_new_session = self.process_groups)
+            else:
+                # output is only written to the simulation directory if the simulation fails
+                # ============================================================================
+                stdout_path = join(sim_dir, 'stdout.txt')
+                new_inst = Popen(self.exe_path, shell = False, stdin = PIPE, stdout = PIPE, stderr = STDOUT,
+                                                        cwd = work_dir, start_new_session = self.process_groups)
+                capture = OutputCapture(self.capture_bytes)
+                self.capture_reader.add(new_inst.stdout, capture)
+        except OSError:
+            if work_dir != sim_dir:
+                self.stager.stage_out(sim_dir, work_dir, False)
+            raise
+
+        # Provide the user input to ECOSSE
+        # ================================
+        try:
+            new_inst.stdin.write(bytes(self.cmd, "ascii"))
+            new_inst.stdin.close()
+        except OSError as err:
+            self.lgr.error('Could not write to instance ({}): {}'.format(sim_dir, err))
+
+        return new_inst, stdout_path, work_dir, capture
 
     def _create_inst(self, instances, inst_num, sim_dir, ref_sys_flag):
         """
+        Launch a single instance
+        """
+        return self._launch(instances, [(inst_num, sim_dir)], ref_sys_flag)
+
+    def _launch(self, instances, batch, ref_sys_flag):
+        """
+        Launch a batch of (instance number, simulation directory), several at once when there is a launcher pool
+        e.g. when many slots free up at the change from slow to fast. Returns the number launched
+        """
+        if self.launcher is not None and len(batch) > 1:
+            futures = [self.launcher.submit(self._spawn, sim_dir) for inst_num, sim_dir in batch]
+        else:
+            futures = None
+
+        num_launched = 0
+        for ibatch, (inst_num, sim_dir) in enumerate(batch):
+            try:
+                if futures is None:
+                    new_inst, stdout_path, work_dir, capture = self._spawn(sim_dir)
+                else:
+                    new_inst, stdout_path, work_dir, capture = futures[ibatch].result()
+            except OSError as err:
+                self.lgr.error('Instance {} ({}) could not be launched: {}: {}'.format(inst_num, sim_dir, self.cmd,
+                                                                                                            err))
+                self._launch_failed(sim_dir)
+                continue
+
+            self.waiter.register(new_inst)
+            inst = self._new_instance(new_inst, inst_num, sim_dir, stdout_path, ref_sys_flag, work_dir)
+            inst.capture = capture
+            instances.append(inst)
+            self.watchdog.add(inst)
+            num_launched += 1
+
+        return num_launched
+
+    def _new_instance(self, proc, inst_num, sim_dir, stdout_path, ref_sys_flag, work_dir = None):
+        """
+        Wraps a newly launched ECOSSE process in an Instance, journals the launch and pins it if requested
+        """
+        if self.journal is not None:
+            self.journal.record('launch', split(sim_dir)[1])
+
+        lat_id, lon_id, soil_id = self._parse_sim_dir(sim_dir, ref_sys_flag)
+        inst = Instance(proc, inst_num, sim_dir, stdout_path, lat_id, lon_id, soil_id, time())
+        inst.work_dir = sim_dir if work_dir is None else work_dir
+        inst.timeout = self.timeout
+        if self.retries is not None:
+            inst.attempt = self.retries.attempt(split(sim_dir)[1])
+            if inst.attempt > 1:
+                inst.timeout = self.retry_timeout
+                self.lgr.info('Retrying {} (attempt {} of {})'.format(sim_dir, inst.attempt, self.max_attempts))
+
+        if self.prioritiser is not None:
+            self.prioritiser.add(proc.pid)
+
+        # pin the single threaded ECOSSE process to a core of its own - done from here rather than in the child
+        # so that subprocess can keep using its fast spawn path
+        # =====================================================================================================
+        if self.pin_cpus:
+            if self.core_pool is None:
+                self.core_pool = CorePool()
+                if not self.core_pool.available:
+                    self.lgr.warning(WARN_STR + 'cpu affinity not supported on this platform, instances not pinned')
+            if self.core_pool.available:
+                inst.cpu = self.core_pool.pin(proc.pid)
+
+        return inst
+
+    def _launch_failed(self, sim_dir):
+        """
+        a simulation which could not be launched is retried like one which failed
+        """
+        subdir = split(sim_dir)[1]
+        if self.retries is not None and self.retries.outcome(subdir, 'failure'):
+            return
+        self._memo_finished(subdir, False, sim_dir)
 
+    def _stage_in(self, sim_dir):
         """
-        retcode = 1
+        Returns the directory ECOSSE is to run in: a local copy of the simulation directory when staging, falling
+        back to the simulation directory itself if the copy fails
+        """
+        if self.stager is None:
+            return sim_dir
+        try:
+            return self.stager.stage_in(sim_dir)
+        except OSError as err:
+            self.lgr.warning(WARN_STR + 'could not stage {}, will run in place: {}'.format(sim_dir, err))
+            return sim_dir
 
-        # Set the working directory for the ECOSSE exe
-        # ============================================
-        old_dir = getcwd()
-        chdir(sim_dir)
+    def _stage_out(self, inst):
+        """
+        Copies staged outputs back to the simulation directory and removes the local copy
+        """
+        if inst.work_dir == inst.sim_dir:
+            return
         try:
-            stdout_path = join(sim_dir, 'stdout.txt')
-            new_inst = Popen(self.exe_path, shell = False, stdin = PIPE, stdout = open(stdout_path, 'w'),
-                                                                                                stderr = STDOUT)
-            # Provide the user input to ECOSSE
-            # ================================
-            if new_inst.stdin is not None:
-                new_inst.stdin.write(bytes(self.cmd, "ascii"))
-                new_inst.stdin.close()
-            else:
-                self.lgr.error('Instance is None')
+            stdout_path = self.stager.stage_out(inst.sim_dir, inst.work_dir, inst.successful)
         except OSError as err:
-            self.lgr.error('Instance {} ({}) could not be launched: {}: {}'.format(inst_num, sim_dir, self.cmd, err))
-            retcode = 0  # non-fatal error
+            self.lgr.error('Could not copy outputs of {} back from {}: {}'.format(inst.sim_dir, inst.work_dir, err))
+            inst.successful = False
         else:
-            # deconstruct directory name to give unique identifiers
-            # =====================================================
-            directory = split(sim_dir)[1]
-            parts = directory.split('_')
-            
-            # ============================
-            if ref_sys_flag == 'WGS84':
-                lat_id = parts[0].strip('lat')
-                lon_id = parts[1].strip('lon')
-    
-                # Get rid of leading zeros
-                # ========================
-                lat_id = str(int(lat_id))
-                lon_id = str(int(lon_id))
-
-                soil_id = parts[3].lstrip('s')
-                soil_id = soil_id.lstrip('0')
-    
-                instance = Instance(new_inst, inst_num, sim_dir, stdout_path, lat_id, lon_id, soil_id, time())
-            else:
-                grid_ref = parts[0]
-                soil_id = parts[1].lstrip('s')
-                soil_id = soil_id.lstrip('0')
-
-                instance = Instance(new_inst, inst_num, sim_dir, stdout_path, grid_ref, grid_ref, soil_id, time())
-            instances.append(instance)
-
-        chdir(old_dir)
-        return retcode
-
-    def _check_simulations_performed(self, subdirs, num_sims):
-        """ checks for simulations already performed """
-        new_subdirs = []
-        for subdir in subdirs:
-            sim_dir_full = join(self.run_dir, subdir)
-            summary_out = join(sim_dir_full, 'SUMMARY.OUT')
-            if not isfile(summary_out):
-                new_subdirs.append(subdir)
-
-        num_new = len(new_subdirs)
-        if num_new == 0:
-            print('Simulations are complete: {} SUMMARY.OUT files exist - nothing to do'.format(num_sims))
+            if stdout_path is not None:
+                inst.stdout_path = stdout_path
+        inst.work_dir = inst.sim_dir
+
+    def _parse_sim_dir(self, sim_dir, ref_sys_flag):
+        """
+        deconstruct directory name to give unique identifiers
+        """
+        directory = split(sim_dir)[1]
+        parts = directory.split('_')
+
+        # ============================
+        if ref_sys_flag == 'WGS84':
+            lat_id = parts[0].strip('lat')
+            lon_id = parts[1].strip('lon')
+
+            # Get rid of leading zeros
+            # ========================
+            lat_id = str(int(lat_id))
+            lon_id = str(int(lon_id))
+
+            soil_id = parts[3].lstrip('s')
+            soil_id = soil_id.lstrip('0')
         else:
-            print('Number of simulation subdirectories before: {}\tafter: {}'.format(num_sims, num_new))
+            lat_id = parts[0]
+            lon_id = lat_id     # grid reference
+            soil_id = parts[1].lstrip('s')
+            soil_id = soil_id.lstrip('0')
+
+        return lat_id, lon_id, soil_id
+
+    def _check_simulations_performed(self):
+        """
+        returns a function which removes simulations already performed from a batch of simulation subdirectories
+        the journal of previous runs is used where one exists, otherwise, or if verification has been requested,
+        the simulation directories are rescanned for SUMMARY.OUT files
+        """
+        journal = read_journal(self.run_dir)
+        if journal is None or self.verify:
+            executor = ThreadPoolExecutor(max_workers = VERIFY_THREADS)
+            def _filter(subdirs):
+                done = self._scan_summary_files(subdirs, journal, executor)
+                return [subdir for subdir in subdirs if subdir not in done]
+        else:
+            done = set(subdir for subdir, event in journal.items() if event == 'success')
+            print('Read journal of previous runs: {} simulations recorded as successful'.format(len(done)))
+            def _filter(subdirs):
+                return [subdir for subdir in subdirs if subdir not in done]
+
+        return _filter
+
+    def _scan_summary_files(self, subdirs, journal, executor):
+        """
+        checks for SUMMARY.OUT files in parallel - slow network filesystems are latency rather than bandwidth bound
+        simulations the journal shows as launched but not finished are not done since their SUMMARY.OUT may be
+        incomplete
+        """
+        def _summary_exists(subdir):
+            return isfile(join(self.run_dir, subdir, 'SUMMARY.OUT'))
+
+        exists = executor.map(_summary_exists, subdirs)
+        done = set(subdir for subdir, summary in zip(subdirs, exists) if summary)
+
+        if journal is not None:
+            done = set(subdir for subdir in done if journal.get(subdir) != 'launch')
 
-        return new_subdirs, num_new
+        return done
 
     def _display_headers(self):
         """ Writes a header to the screen and logfile """
@@ -214,14 +502,106 @@ class RunSites(object):
 
     def _check_attribs(self, cfg, grp, cnfg_fn):
         """
-        checks JSON config file conformance
+        checks JSON config file conformance, returns a list of error messages
         """
+        if grp not in cfg:
+            return ['group {} required in config file {}'.format(grp, cnfg_fn)]
+
+        errors = []
         for attrib in CONFIG_RQRD_ATTRIBS[grp]:
             if attrib not in cfg[grp]:
-                mess = ERROR_STR + 'attribute {} required for group {} in config file {}'.format(attrib, grp, cnfg_fn)
-                print(mess)
-                self.lgr.critical(mess)
-                exit(0)
+                errors.append('attribute {} required for group {} in config file {}'.format(attrib, grp, cnfg_fn))
+        return errors
+
+    def _check_value(self, value, kind, bound):
+        """
+        checks a config file value against its kind and bound in CONFIG_ATTRIB_SPECS, returns an error message or None
+        """
+        is_number = isinstance(value, (int, float)) and not isinstance(value, bool)
+        if kind == 'bool' and not isinstance(value, bool):
+            return 'must be true or false'
+        if kind == 'str' and not isinstance(value, str):
+            return 'must be a string'
+        if kind == 'path' and value is not None and not isinstance(value, str):
+            return 'must be a path or null'
+        if kind == 'strs' and (not isinstance(value, list) or not all(isinstance(val, str) for val in value)):
+            return 'must be a list of strings'
+        if kind == 'int' and (not is_number or value != int(value) or value < bound):
+            return 'must be a whole number of at least {}'.format(bound)
+        if kind == 'number' and (not is_number or value < bound):
+            return 'must be a number of at least {}'.format(bound)
+        if kind == 'positive' and (not is_number or value <= 0):
+            return 'must be a number greater than 0'
+        if kind == 'choice' and (not isinstance(value, (str, type(None))) or value not in bound):
+            return 'must be one of {}'.format([val for val in bound if val])
+        return None
+
+    def _validate_config(self, cfg, cnfg_fn):
+        """
+        checks the whole config file before any of it is applied, returns a list of error messages
+        """
+        if not isinstance(cfg, dict):
+            return ['config file {} must hold groups of attributes'.format(cnfg_fn)]
+
+        errors = []
+        for grp in CONFIG_RQRD_ATTRIBS:
+            errors += self._check_attribs(cfg, grp, cnfg_fn)
+        if len(errors) > 0:
+            return errors
+
+        for grp, specs in CONFIG_ATTRIB_SPECS.items():
+            for attrib, (kind, bound) in specs.items():
+                if attrib in cfg[grp]:
+                    mess = self._check_value(cfg[grp][attrib], kind, bound)
+                    if mess is not None:
+                        errors.append('{} {}, not {}'.format(attrib, mess, repr(cfg[grp][attrib])))
+        if len(errors) > 0:
+            return errors
+
+        grp = 'Simulations'
+        if not isfile(expanduser(expandvars(cfg[grp]['exepath']))):
+            errors.append('ECOSSE exe path does not exist: {}'.format(cfg[grp]['exepath']))
+        if not isdir(expanduser(expandvars(cfg[grp]['sims_dir']))):
+            errors.append('Simulation directory does not exist: {}'.format(cfg[grp]['sims_dir']))
+
+        grp = 'Speed'
+        for wrkday in cfg[grp]['workdays']:
+            if wrkday.lower() not in self.daynums:
+                errors.append('workday {} not recognised, must be one of {}'.format(wrkday, list(self.daynums)))
+        for attrib in ['start_work', 'end_work']:
+            try:
+                hour, minute = [int(ival) for ival in cfg[grp][attrib].split(':')]
+            except ValueError:
+                errors.append('{} must be given as HH:MM'.format(attrib))
+            else:
+                if not (0 <= hour < 24 and 0 <= minute < 60):
+                    errors.append('{} must be a time of day, not {}'.format(attrib, cfg[grp][attrib]))
+
+        return errors
+
+    def _keep_startup_attribs(self, cfg, cnfg_fn):
+        """
+        returns a reloaded config file with the attributes which are only used when the run starts restored to the
+        values the run started with, warning of any the file changes
+        """
+        cfg = deepcopy(cfg)
+        changed = []
+        for grp, attribs in CONFIG_STARTUP_ATTRIBS.items():
+            if not isinstance(cfg.get(grp), dict):
+                continue
+            for attrib in attribs:
+                if cfg[grp].get(attrib) == self.config[grp].get(attrib):
+                    continue
+                changed.append(attrib)
+                if attrib in self.config[grp]:
+                    cfg[grp][attrib] = self.config[grp][attrib]
+                else:
+                    del cfg[grp][attrib]
+
+        if len(changed) > 0:
+            self.lgr.warning(WARN_STR + 'config file {} changes {} which only take effect when a run starts, '
+                                                    'values from the start of the run kept'.format(cnfg_fn, changed))
+        return cfg
 
     def _get_config(self, critical = True):
         """
@@ -229,21 +609,21 @@ class RunSites(object):
         Args:
         critical -  True if reading the config file is critically important e.g. first time it is being read)
                     False if failure to read can be tolerated e.g. when config file is being checked for updates
+                    in which case the previous settings are kept if the file cannot be read or is not valid
         """
-        self.last_config_check = time()
         cnfg_fn = self.configfile
 
         try:
             with open(cnfg_fn, 'r') as fobj:
-                self.config = json_load(fobj)
-        except (OSError, IOError, NameError) as err:
+                cfg = json_load(fobj)
+        except (OSError, IOError, NameError, ValueError) as err:
             if critical:
                 raise Exception(err)
             else:
+                self.lgr.warning(WARN_STR + 'could not read config file {}, previous settings kept: {}'
+                                                                                            .format(cnfg_fn, err))
                 return False
 
-        cfg = self.config
-
         # Logging settings - only required once
         # =====================================
         if critical:
@@ -257,87 +637,638 @@ class RunSites(object):
             self.settings = {'log_dir': log_dir}
             set_up_logging(self, PROGRAM_ID)
 
+        if not critical and isinstance(cfg, dict):
+            cfg = self._keep_startup_attribs(cfg, cnfg_fn)
+
+        errors = self._validate_config(cfg, cnfg_fn)
+        if len(errors) > 0:
+            if not critical:
+                self.lgr.warning(WARN_STR + 'config file {} not applied, previous settings kept: {}'
+                                                                                .format(cnfg_fn, '; '.join(errors)))
+                return False
+            for mess in errors:
+                print(ERROR_STR + mess)
+                self.lgr.critical(ERROR_STR + mess)
+            sleep(sleepTime)
+            exit(0)
+
+        # every value has been checked, so the settings are parsed in full before any is applied
+        # ======================================================================================
+        self._apply_config(self._parse_config(cfg))
+        if not critical:
+            self.lgr.info('Applied changes to config file ' + cnfg_fn)
+
+        self.config = cfg
+        return True
+
+    def _parse_config(self, cfg):
+        """
+        returns the settings of a config file which has been validated, as a namespace of attributes
+        """
+        new = SimpleNamespace()
+
         # General - this section determines Ecosse run mode
         # =================================================
         grp = 'General'
-        self._check_attribs(cfg, grp, cnfg_fn)
 
-        self.config_check_interval = cfg[grp]['config_check_interval']
+        new.config_check_interval = cfg[grp]['config_check_interval']
         if cfg[grp]['cropName'] == 'limited_data':
-            self.cmd = '{}\n\n{}\n\n'.format(3, 'input.txt')
+            new.cmd = '{}\n\n{}\n\n'.format(3, 'input.txt')
         else:
-            self.cmd = '1\n\n\n'
+            new.cmd = '1\n\n\n'
+
+        # optional: shared secret which workers present to the coordinator, required for coordinator/worker runs
+        # =======================================================================================================
+        new.cluster_token = None
+        if 'cluster_token' in cfg[grp] and cfg[grp]['cluster_token']:
+            new.cluster_token = cfg[grp]['cluster_token']
 
         # Simulations settings
         # ====================
         grp = 'Simulations'
-        self._check_attribs(cfg, grp, cnfg_fn)
-
-        self.varnames = cfg[grp]['output_variables']
-
-        self.exe_path = abspath(normpath(expanduser(expandvars(cfg[grp]['exepath']))))
-        if not isfile(self.exe_path):
-            mess = 'ECOSSE exe path does not exist: {}'.format(cfg[grp]['exepath'])
-            self.lgr.critical(mess)
-            exit(0)
 
-        self.run_dir = abspath(normpath(expanduser(expandvars(cfg[grp]['sims_dir']))))
-        if not isdir(self.run_dir):
-            mess = 'Simulation directory does not exist: {}'.format(cfg[grp]['sims_dir'])
-            self.lgr.critical(mess)
-            sleep(sleepTime)
-            exit(0)
-
-        self.timeout = cfg[grp]['timeout']
-        self.del_sim_dirs = cfg[grp]['delete_sim_dirs']
-        self.resume_frm_prev = cfg[grp]['resume_frm_prev']
+        new.varnames = cfg[grp]['output_variables']
+
+        # optional: where collected output variables are written, defaults to alongside the simulations directory
+        # ========================================================================================================
+        new.output_dir = None
+        if 'output_dir' in cfg[grp] and cfg[grp]['output_dir']:
+            new.output_dir = abspath(normpath(expanduser(expandvars(cfg[grp]['output_dir']))))
+
+        new.results_batch = RESULTS_BATCH
+        if 'results_batch' in cfg[grp]:
+            new.results_batch = cfg[grp]['results_batch']
+
+        new.output_rasters = False
+        if 'output_rasters' in cfg[grp]:
+            new.output_rasters = cfg[grp]['output_rasters']
+
+        new.max_soils = MAX_SOILS
+        if 'max_soils' in cfg[grp]:
+            new.max_soils = cfg[grp]['max_soils']
+
+        new.exe_path = abspath(normpath(expanduser(expandvars(cfg[grp]['exepath']))))
+        new.run_dir = abspath(normpath(expanduser(expandvars(cfg[grp]['sims_dir']))))
+
+        # optional: reference system of the simulation directories, WGS84 or OSGB; when given, OSGB directories are
+        # launched as they are found rather than after the scan has shown there are no lat/lon directories
+        # ==========================================================================================================
+        new.ref_sys = None
+        if 'ref_sys' in cfg[grp] and cfg[grp]['ref_sys']:
+            new.ref_sys = cfg[grp]['ref_sys']
+
+        new.timeout = cfg[grp]['timeout']
+        new.del_sim_dirs = cfg[grp]['delete_sim_dirs']
+        new.delete_threads = DELETE_THREADS
+        if 'delete_threads' in cfg[grp]:
+            new.delete_threads = cfg[grp]['delete_threads']
+
+        new.keep_outputs = []      # files moved to the results directory before a simulation directory is deleted
+        if 'keep_outputs' in cfg[grp]:
+            new.keep_outputs = cfg[grp]['keep_outputs']
+
+        # optional: pack the files of successful simulations into zip archives of archive_cells cells, indexed by
+        # lat/lon/soil; when simulation directories are deleted this is done once their archive is complete
+        # =======================================================================================================
+        new.use_archive = False
+        if 'archive' in cfg[grp]:
+            new.use_archive = cfg[grp]['archive']
+        new.archive_dir = None
+        if 'archive_dir' in cfg[grp] and cfg[grp]['archive_dir']:
+            new.archive_dir = abspath(normpath(expanduser(expandvars(cfg[grp]['archive_dir']))))
+        new.archive_cells = ARCHIVE_CELLS
+        if 'archive_cells' in cfg[grp]:
+            new.archive_cells = cfg[grp]['archive_cells']
+        new.archive_compression = 'lzma'
+        if 'archive_compression' in cfg[grp]:
+            new.archive_compression = cfg[grp]['archive_compression']
+        new.archive_files = ARCHIVE_FILES
+        if 'archive_files' in cfg[grp]:
+            new.archive_files = cfg[grp]['archive_files']
+        new.resume_frm_prev = cfg[grp]['resume_frm_prev']
+
+        # optional: rerun failed and timed out simulations, retries may be given longer than first attempts
+        # ==================================================================================================
+        new.max_attempts = MAX_ATTEMPTS
+        if 'max_attempts' in cfg[grp]:
+            new.max_attempts = cfg[grp]['max_attempts']
+        new.retry_delay = RETRY_DELAY
+        if 'retry_delay' in cfg[grp]:
+            new.retry_delay = cfg[grp]['retry_delay']
+        new.retry_backoff = RETRY_BACKOFF
+        if 'retry_backoff' in cfg[grp]:
+            new.retry_backoff = cfg[grp]['retry_backoff']
+        new.retry_timeout = new.timeout
+        if 'retry_timeout' in cfg[grp]:
+            new.retry_timeout = cfg[grp]['retry_timeout']
+
+        # optional: run ECOSSE once for simulations with identical inputs, taking the outputs of the others from a
+        # cache which persists between runs and may be shared by several studies
+        # =======================================================================================================
+        new.use_memo = False
+        if 'memo' in cfg[grp]:
+            new.use_memo = cfg[grp]['memo']
+        new.memo_cache_dir = None
+        if 'memo_cache_dir' in cfg[grp] and cfg[grp]['memo_cache_dir']:
+            new.memo_cache_dir = abspath(normpath(expanduser(expandvars(cfg[grp]['memo_cache_dir']))))
+        new.memo_links = False
+        if 'memo_links' in cfg[grp]:
+            new.memo_links = cfg[grp]['memo_links']
+        new.memo_exclude = MEMO_EXCLUDE
+        if 'memo_exclude' in cfg[grp]:
+            new.memo_exclude = cfg[grp]['memo_exclude']
+        new.memo_threads = MEMO_THREADS
+        if 'memo_threads' in cfg[grp]:
+            new.memo_threads = cfg[grp]['memo_threads']
+        new.memo_max_gb = MEMO_MAX_GB
+        if 'memo_max_gb' in cfg[grp]:
+            new.memo_max_gb = cfg[grp]['memo_max_gb']
+        new.memo_max_age_days = MEMO_MAX_AGE_DAYS
+        if 'memo_max_age_days' in cfg[grp]:
+            new.memo_max_age_days = cfg[grp]['memo_max_age_days']
+
+        # optional: run ECOSSE in local scratch space e.g. /dev/shm
+        # =========================================================
+        new.staging_dir = None
+        new.staging_outputs = STAGING_OUTPUTS
+        new.staging_threads = STAGING_THREADS
+        new.staging_prefetch = STAGING_PREFETCH
+        if 'staging_dir' in cfg[grp] and cfg[grp]['staging_dir']:
+            staging_dir = abspath(normpath(expanduser(expandvars(cfg[grp]['staging_dir']))))
+            if isdir(staging_dir):
+                new.staging_dir = staging_dir
+            else:
+                self.lgr.warning(WARN_STR + 'staging directory {} does not exist, simulations will run in place'
+                                                                                    .format(cfg[grp]['staging_dir']))
+            if 'staging_outputs' in cfg[grp]:
+                new.staging_outputs = cfg[grp]['staging_outputs']
+            if 'staging_threads' in cfg[grp]:
+                new.staging_threads = cfg[grp]['staging_threads']
+            if 'staging_prefetch' in cfg[grp]:
+                new.staging_prefetch = cfg[grp]['staging_prefetch']
+
+        # optional: record wall time, cpu time and peak memory of each simulation
+        # =======================================================================
+        new.use_metrics = True
+        if 'metrics' in cfg[grp]:
+            new.use_metrics = cfg[grp]['metrics']
+        new.region_degrees = REGION_DEGREES
+        if 'region_degrees' in cfg[grp]:
+            new.region_degrees = cfg[grp]['region_degrees']
+
+        # optional: metrics files of earlier runs, in addition to those in the results directory, used to predict
+        # simulation wall times when launching longest first
+        # ========================================================================================================
+        new.history_files = []
+        if 'history_files' in cfg[grp]:
+            new.history_files = [abspath(normpath(expanduser(expandvars(fname))))
+                                                                            for fname in cfg[grp]['history_files']]
+
+        # optional: record launches and outcomes in a journal in the simulations directory
+        # ================================================================================
+        new.use_journal = True
+        if 'journal' in cfg[grp]:
+            new.use_journal = cfg[grp]['journal']
 
         # Speed settings
         # ==============
         grp = 'Speed'
-        self._check_attribs(cfg, grp, cnfg_fn)
 
-        self.requested_cpus = cfg[grp]['use_cpus']
+        new.requested_cpus = cfg[grp]['use_cpus']
         if self.maxcpus:
-            if self.requested_cpus < self.maxcpus:
-                self.cpus = self.requested_cpus
+            if new.requested_cpus < self.maxcpus:
+                new.cpus = new.requested_cpus
             else:
-                self.cpus = self.maxcpus
+                new.cpus = self.maxcpus
         else:
-            self.cpus = self.requested_cpus  # For better or for worse!
+            new.cpus = new.requested_cpus  # For better or for worse!
 
-        self.fast = cfg[grp]['fast']
-        self.fast = int(math.ceil(self.cpus * self.fast))
+        new.fast = cfg[grp]['fast']
+        new.fast = int(math.ceil(new.cpus * new.fast))
 
-        self.slow = cfg[grp]['slow']
-        self.slow = int(math.ceil(self.cpus * self.slow))
+        new.slow = cfg[grp]['slow']
+        new.slow = int(math.ceil(new.cpus * new.slow))
 
-        self.workdays = cfg[grp]['workdays']
-        self.workday_nums = [self.daynums[wrkday.lower()] for wrkday in self.workdays]
-        if len(self.workday_nums) == 0:
-            self.workday_nums = [-999]  # i.e. no days are workdays
+        new.workdays = cfg[grp]['workdays']
+        new.workday_nums = [self.daynums[wrkday.lower()] for wrkday in new.workdays]
+        if len(new.workday_nums) == 0:
+            new.workday_nums = [-999]  # i.e. no days are workdays
 
-        self.workstart = cfg[grp]['start_work'].split(':')
-        self.workstart = [int(ival) for ival in self.workstart]
+        new.workstart = cfg[grp]['start_work'].split(':')
+        new.workstart = [int(ival) for ival in new.workstart]
 
-        self.workend = cfg[grp]['end_work'].split(':')
-        self.workend = [int(ival) for ival in self.workend]
+        new.workend = cfg[grp]['end_work'].split(':')
+        new.workend = [int(ival) for ival in new.workend]
 
-        return True
+        # optional: engine used to drive ECOSSE
+        # =====================================
+        new.engine = 'sync'
+        if 'engine' in cfg[grp]:
+            new.engine = cfg[grp]['engine']
+
+        # optional: adapt the number of instances to load, memory and pressure stall information
+        # ======================================================================================
+        new.adaptive = False
+        if 'adaptive' in cfg[grp]:
+            new.adaptive = cfg[grp]['adaptive']
+        new.adaptive_settings = {}
+        for key, attrib in ADAPTIVE_ATTRIBS.items():
+            if key in cfg[grp]:
+                new.adaptive_settings[attrib] = cfg[grp][key]
+
+        # optional: pin each instance to a core of its own
+        # ================================================
+        new.pin_cpus = False
+        if 'pin_cpus' in cfg[grp]:
+            new.pin_cpus = cfg[grp]['pin_cpus']
+
+        # optional: order in which simulations are launched, longest expected wall time first or as discovered
+        # expected wall times come from the metrics files of earlier runs; without any the simulations with the
+        # largest input files i.e. the most years of weather are launched first
+        # ======================================================================================================
+        new.order = 'discovery'
+        if 'order' in cfg[grp]:
+            new.order = cfg[grp]['order']
+
+        # optional: number of instances launched at once when several slots are free
+        # ===========================================================================
+        new.launch_threads = LAUNCH_THREADS
+        if 'launch_threads' in cfg[grp]:
+            new.launch_threads = cfg[grp]['launch_threads']
+
+        # optional: seconds a timed out instance is given to stop before it is killed and whether each instance
+        # runs in a session of its own, so that processes ECOSSE forks are also stopped; instances in their own
+        # session do not receive Ctrl-C from the terminal
+        # =======================================================================================================
+        new.kill_grace = KILL_GRACE
+        if 'kill_grace' in cfg[grp]:
+            new.kill_grace = cfg[grp]['kill_grace']
+        new.process_groups = False
+        if 'process_groups' in cfg[grp]:
+            new.process_groups = cfg[grp]['process_groups'] and os_name != 'nt'
+
+        # optional: during the workday window keep fast instances running at lower cpu and I/O priority rather than
+        # cutting them to slow, so that idle daytime cycles still go to simulations
+        # =========================================================================================================
+        new.throttle = 'concurrency'
+        if 'throttle' in cfg[grp]:
+            new.throttle = cfg[grp]['throttle']
+        new.throttle_nice = THROTTLE_NICE
+        if 'throttle_nice' in cfg[grp]:
+            new.throttle_nice = cfg[grp]['throttle_nice']
+        new.throttle_ionice = 'idle'
+        if 'throttle_ionice' in cfg[grp]:
+            new.throttle_ionice = cfg[grp]['throttle_ionice']
+
+        # optional: keep ECOSSE output in memory, writing the tail to stdout.txt only if a simulation fails
+        # ================================================================================================
+        new.stdout_mode = 'file'
+        if 'stdout_mode' in cfg[grp]:
+            new.stdout_mode = cfg[grp]['stdout_mode']
+        new.capture_bytes = TAIL_BYTES
+        if 'capture_bytes' in cfg[grp]:
+            new.capture_bytes = cfg[grp]['capture_bytes']
+
+        # optional: how the scheduler waits for ECOSSE instances to finish
+        # ================================================================
+        new.wait_mode = 'event'
+        if 'wait_mode' in cfg[grp]:
+            new.wait_mode = cfg[grp]['wait_mode']
+
+        return new
+
+    def _apply_config(self, new):
+        """
+        makes parsed settings current in a single step, then brings the helpers they configure into line
+        """
+        self.__dict__.update(vars(new))
+
+        if self.retries is not None:
+            self.retries.delay = self.retry_delay
+            self.retries.backoff = self.retry_backoff
+        if self.watchdog is not None:
+            self.watchdog.grace = self.kill_grace
+
+        if self.adaptive:
+            if self.controller is None:
+                self.controller = ConcurrencyController(self.maxcpus if self.maxcpus else self.cpus)
+                if not self.controller.available:
+                    self.lgr.warning(WARN_STR + 'load information not available, adaptive concurrency disabled')
+            self.controller.configure(**self.adaptive_settings)
+        else:
+            self.controller = None
+
+        if self.throttle == 'priority':
+            if self.prioritiser is None:
+                self.prioritiser = PriorityThrottle(group = self.process_groups)
+                if not self.prioritiser.available:
+                    self.lgr.warning(WARN_STR + 'process priority not supported on this platform, the workday '
+                                                                            'window will reduce concurrency instead')
+            self.prioritiser.group = self.process_groups
+            self.prioritiser.niceness = self.throttle_nice
+            self.prioritiser.io_class = IO_CLASSES[self.throttle_ionice]
+            if not self.prioritiser.available:
+                self.throttle = 'concurrency'
+        elif self.prioritiser is not None:
+            self.prioritiser.update(False)
+            self.prioritiser = None
+
+    def _within_window(self, now):
+        """
+        True during working hours on a workday
+        """
+        if now.weekday() not in self.workday_nums:
+            return False
+        return self._within_times(now, self.workstart[0], self.workstart[1], self.workend[0], self.workend[1])
+
+    def _window_cap(self, now):
+        """
+        return slow or fast operation according to the workday window; always fast when the window lowers priority
+        """
+        if self.throttle == 'concurrency' and self._within_window(now):
+            return self.slow
+        return self.fast
+
+    def _update_priority(self):
+        """
+        lower or restore the priority of running instances as the workday window starts or ends - called at every
+        scheduler tick
+        """
+        if self.prioritiser is None:
+            return
+        if self.prioritiser.update(self._within_window(datetime.now())):
+            if self.prioritiser.throttled:
+                self.lgr.info('Working hours: {} instances running at lower priority'.format(
+                                                                                    len(self.prioritiser.pids)))
+            else:
+                self.lgr.info('Outside working hours: instances running at normal priority')
+                if self.prioritiser.num_stuck > 0:
+                    self.lgr.warning(WARN_STR + 'priority of {} instances could not be raised, they will finish at '
+                                        'lower priority'.format(self.prioritiser.num_stuck))
+                    self.prioritiser.num_stuck = 0
+            if self.prioritiser.io_error is not None:
+                self.lgr.warning(WARN_STR + 'I/O priority could not be set, only cpu priority is lowered: {}'
+                                                                                .format(self.prioritiser.io_error))
+                self.prioritiser.io_error = None
+
+    def _eta_cap(self, tstamp):
+        return self._window_cap(datetime.fromtimestamp(tstamp))
+
+    def _next_window_change(self, tstamp):
+        """
+        time stamp of the next time the workday window may change concurrency: start or end of work, or midnight
+        """
+        now = datetime.fromtimestamp(tstamp)
+        day = now.replace(hour = 0, minute = 0, second = 0, microsecond = 0)
+        changes = [day.replace(hour = self.workstart[0], minute = self.workstart[1]),
+                   day.replace(hour = self.workend[0], minute = self.workend[1]) + timedelta(minutes = 1),
+                   day + timedelta(days = 1)]
+        return min(change for change in changes if change > now).timestamp()
 
     def _get_max_inst(self):
         """
-        return slow or fast operation
+        return slow or fast operation, reduced further by the adaptive controller if enabled
         """
-        now = datetime.now()
-        if now.weekday() not in self.workday_nums:
-            max_inst = self.fast
-        elif self._within_times(now, self.workstart[0], self.workstart[1], self.workend[0], self.workend[1]):
-            max_inst = self.slow
-        else:  # Must be outside working hours
-            max_inst = self.fast
+        max_inst = self._window_cap(datetime.now())
+
+        # the workday window is an upper cap on what the machine load permits
+        # ===================================================================
+        if self.controller is not None:
+            max_inst = self.controller.update(max_inst)
         return max_inst
 
+    def _reap_instances(self, instances):
+        """
+        Terminates instances which have overrun their timeout, then removes finished instances from the instances
+        list and updates the counters. A terminated instance keeps its slot until it has exited and been reaped
+        """
+        # ECOSSE has probably hung trying to spin-up
+        # ==========================================
+        terminated, killed = self.watchdog.expire(time())
+        for inst in terminated:
+            self.lgr.error('Simulation timed out: {}'.format(inst.sim_dir))
+        for inst in killed:
+            self.lgr.error('Simulation did not stop within {}s of being terminated, killed: {}'
+                                                                        .format(self.kill_grace, inst.sim_dir))
+
+        for inst in list(instances):
+            if not inst.finished:
+                continue
+            if not inst.successful:
+                self.lgr.error('Simulation failed: {0}'.format(inst.sim_dir))
+
+            self.waiter.unregister(inst.inst)
+            self.watchdog.remove(inst)
+            instances.remove(inst)
+            self._finish_inst(inst)
+
+    def _finish_inst(self, inst):
+        """
+        Bookkeeping for an instance which has finished, failed or timed out - common to all engines
+        """
+        # collect results before staged outputs are copied back and the local copy removed
+        # =================================================================================
+        collected = True
+        if inst.successful:
+            collected = self._collect_results(inst.work_dir, inst.sim_dir, inst.lat_id, inst.lon_id, inst.soil_id)
+
+        self._stage_out(inst)
+
+        if inst.capture is not None:
+            if not inst.successful:
+                try:
+                    inst.capture.write_tail(inst.stdout_path)
+                except OSError as err:
+                    self.lgr.error('Could not write ECOSSE output for {}: {}'.format(inst.sim_dir, err))
+            inst.capture = None
+
+        if inst.timed_out:
+            event = 'timeout'
+        elif inst.successful:
+            event = 'success'
+        else:
+            event = 'failure'
+        subdir = split(inst.sim_dir)[1]
+
+        # a simulation to be retried has not finished as far as progress and the coordinator are concerned
+        # ================================================================================================
+        retry = False
+        if self.retries is not None:
+            retry = self.retries.outcome(subdir, event)
+
+        if inst.end_time is None:
+            inst.end_time = time()
+        if self.eta is not None and not retry:
+            self.eta.record(inst.end_time, inst.end_time - inst.start_time)
+        if self.metrics is not None:
+            self.metrics.record(inst, event)
+
+        if self.prioritiser is not None:
+            self.prioritiser.remove(inst.inst.pid)
+        if self.core_pool is not None:
+            self.core_pool.release(inst.cpu)
+            inst.cpu = None
+
+        if self.journal is not None:
+            self.journal.record(event, subdir)
+
+        if retry:
+            return
+
+        # outputs are stored in the background and the directory disposed of once they have been
+        # =======================================================================================
+        future = self._memo_finished(subdir, inst.successful, inst.sim_dir)
+
+        if self.reporter is not None:
+            self.reporter.report(subdir, event)
+
+        if inst.successful:
+            if future is None:
+                self._dispose(inst.sim_dir, inst.lat_id, inst.lon_id, inst.soil_id, collected)
+            else:
+                self.memo_pending.append((future, inst.sim_dir, inst.lat_id, inst.lon_id, inst.soil_id, collected))
+
+        if not inst.successful:
+            self.failed += 1
+        self.completed += 1
+
+    def _collect_results(self, summary_dir, sim_dir, lat_id, lon_id, soil_id):
+        """
+        pass the output variables of a successful simulation to the collector and raster writer
+        returns False if they could not be written, in which case the directory must not be deleted. Results which
+        the collector could not write stay in its buffer, so directories are held until a later chunk is written
+        """
+        if self.collector is None and self.raster_writer is None:
+            return True
+        try:
+            values = read_summary(join(summary_dir, 'SUMMARY.OUT'), self.varnames)
+        except (OSError, ValueError) as err:
+            self.lgr.warning(WARN_STR + 'could not collect results for {}: {}'.format(sim_dir, err))
+            return True
+        if self.collector is not None:
+            try:
+                self.collector.add(lat_id, lon_id, soil_id, values)
+            except (OSError, ValueError) as err:
+                self.lgr.warning(WARN_STR + 'could not write results chunk, will retry: {}'.format(err))
+        if self.raster_writer is not None:
+            try:
+                self.raster_writer.add(lat_id, lon_id, soil_id, values)
+            except (OSError, ValueError) as err:
+                self.lgr.warning(WARN_STR + 'could not write results of {} to rasters: {}'.format(sim_dir, err))
+                return False
+        return True
+
+    def _memo_finished(self, subdir, successful, sim_dir):
+        """
+        a simulation has finished for good: its outputs are stored for any simulations with the same inputs by the
+        memo's storer thread. Returns the future of the store, or None if there is nothing to store
+        """
+        if self.memo is None:
+            return None
+        return self.memo.finish_later(subdir, successful, sim_dir)
+
+    def _drain_memo(self, wait = False):
+        """
+        dispose of representatives whose outputs have been stored and record the simulations which have been given
+        outputs by the memo cache as successful - called at each scheduler tick, and with wait at the end of the run
+        """
+        if self.memo is None:
+            return
+        pending = []
+        for future, sim_dir, lat_id, lon_id, soil_id, deletable in self.memo_pending:
+            if not wait and not future.done():
+                pending.append((future, sim_dir, lat_id, lon_id, soil_id, deletable))
+                continue
+            try:
+                future.result()
+            except MEMO_ERRORS as err:
+                self.lgr.warning(WARN_STR + 'could not cache outputs of {}: {}'.format(sim_dir, err))
+            self._dispose(sim_dir, lat_id, lon_id, soil_id, deletable)
+        self.memo_pending = pending
+
+        for subdir in self.memo.pop_hits():
+            sim_dir = join(self.run_dir, subdir)
+            lat_id, lon_id, soil_id = self._parse_sim_dir(sim_dir, self.discovery.ref_sys_flag)
+            collected = self._collect_results(sim_dir, sim_dir, lat_id, lon_id, soil_id)
+
+            if self.journal is not None:
+                self.journal.record('success', subdir)
+            if self.reporter is not None:
+                self.reporter.report(subdir, 'success')
+            self._dispose(sim_dir, lat_id, lon_id, soil_id, collected)
+            self.completed += 1
+
+    def _dispose(self, sim_dir, lat_id, lon_id, soil_id, deletable = True):
+        """
+        a successful simulation directory is archived and/or deleted; when both, deletion waits for the archive
+        directories whose results could not be written are kept
+        """
+        if not deletable:
+            self.kept_dirs.add(sim_dir)
+        if self.archiver is not None:
+            self.archiver.add(sim_dir, lat_id, lon_id, soil_id)
+        elif self.deleter is not None and deletable:
+            self.deleter.hold(sim_dir)
+
+    def _drain_archived(self):
+        """
+        simulation directories in complete archives, or successful ones when not archiving, are released for
+        deletion - called at each scheduler tick so that the journal is synced once per sweep, not per simulation
+        """
+        if self.archiver is not None:
+            archived = self.archiver.pop_archived()
+            if self.deleter is not None:
+                for sim_dir in archived:
+                    if sim_dir not in self.kept_dirs and not self.keep_all:
+                        self.deleter.hold(sim_dir)
+        if self.deleter is not None and len(self.deleter.held) > 0:
+            self._release_deletions()
+
+    def _keep_held(self):
+        """
+        results could not be written at the end of the run: keep the directories waiting to be deleted, and those
+        still to be archived
+        """
+        self.keep_all = True
+        if self.deleter is not None and len(self.deleter.held) > 0:
+            self.lgr.warning(WARN_STR + '{} simulation directories kept since their results were not written'
+                                                                                    .format(len(self.deleter.held)))
+            self.kept_dirs.update(self.deleter.held)
+            self.deleter.held = []
+
+    def _release_deletions(self):
+        """
+        directories are only deleted once their outputs have been written by the collector i.e. its buffer is empty
+        """
+        if self.collector is not None and len(self.collector.keys) > 0:
+            return
+
+        if self.raster_writer is not None:
+            try:
+                self.raster_writer.flush()
+            except (OSError, ValueError) as err:
+                self.lgr.warning(WARN_STR + 'could not flush rasters, directories will be kept: {}'.format(err))
+                return
+
+        # journalled successes reach the disk before their directories are deleted
+        # ========================================================================
+        if self.journal is not None and len(self.deleter.held) > 0:
+            self.journal.sync()
+        self.deleter.release()
+
+    def _record_remote(self, subdir, event):
+        """
+        Bookkeeping for a simulation reported by a worker when running as coordinator
+        """
+        if self.journal is not None:
+            self.journal.record(event, subdir)
+        if self.eta is not None:
+            self.eta.record(time())
+
+        if event != 'success':
+            self.failed += 1
+        self.completed += 1
+
     def _s2hms(self, seconds):
         """
         Converts time period in seconds to hours, minutes and seconds.
@@ -350,59 +1281,131 @@ class RunSites(object):
 
     def _sim_successful(self, inst):
         """
-        Searches the ecosse redirected output file for the phrase "simulation of cells completed"
+        Searches the tail of the ecosse redirected output file for the phrase "SIMULATION SUCCESSFULLY COMPLETED"
         to check whether ECOSSE ran OK.
         """
+        if inst.capture is not None:
+            return inst.capture.successful(0)
+
         success = False
-        # Read in ecosse redirected output
         try:
-            with open(inst.stdout_path, "r") as outfile:
-                for line in outfile:
-                    if line.find('SIMULATION SUCCESSFULLY COMPLETED') != -1:
-                        success = True
-                        break
+            success = check_ecosse_success(inst.stdout_path)
         except (OSError, IOError) as err:
             self.lgr.error('Unable to open ECOSSE redirection file. Cannot '
                            'determine if simulation was successful. {0}.'.format(err))
         return success
 
+    def _schedule(self, discovery):
+        """
+        Synchronous engine: launches ECOSSE instances and reaps them as they finish
+        Returns the number of instances permitted at the end of the run
+        """
+        sim_num = 0         # No. of sims that have run & are currently running
+        instances = []      # List containing a dict about each subprocess
+        last_time = time()
+        self.waiter = ChildWaiter(self.wait_mode)
+        self.watchdog = Watchdog(self.kill_grace, self.process_groups)
+        self.launcher = None
+        if self.launch_threads > 1:
+            self.launcher = ThreadPoolExecutor(max_workers = self.launch_threads)
+        self.capture_reader = None
+        if self.stdout_mode == 'capture':
+            self.capture_reader = CaptureReader()
+
+        # single scheduler loop: blocks until an instance exits, a timeout falls due or the progress bar needs
+        # refreshing; free slots are refilled as soon as an instance has been reaped
+        # ====================================================================================================
+        while True:
+            self._update_config()
+            self._update_priority()
+            max_inst = self._get_max_inst()
+            last_time = self._update_progress(last_time, discovery.num_sims, instances, max_inst)
+
+            # loop to check instances
+            # =======================
+            self._check_subprocs(instances)
+            self._reap_instances(instances)
+            self._drain_memo()
+            self._drain_archived()
+
+            # fill all free slots in one batch; block on discovery only when there is nothing else to wait for
+            # ================================================================================================
+            batch = []
+            while len(instances) + len(batch) < max_inst:
+                subdir = discovery.get(len(instances) + len(batch) == 0, PROGRESS_INTERVAL)
+                if subdir is None:
+                    break
+                batch.append((sim_num, join(self.run_dir, subdir)))
+                sim_num += 1
+            if len(batch) > 0:
+                self._launch(instances, batch, discovery.ref_sys_flag)
+
+            if len(instances) == 0:
+                if discovery.exhausted:
+                    break
+                continue
+
+            self.waiter.wait(self._wait_timeout(instances, last_time))
+
+        self.waiter.close()
+        if self.launcher is not None:
+            self.launcher.shutdown(wait = True)
+            self.launcher = None
+        if self.capture_reader is not None:
+            self.capture_reader.close()
+            self.capture_reader = None
+
+        return max_inst
+
     def _update_config(self):
         """
-        check to see if configuration file needs to be reread
+        reread the configuration file if it has changed - called at every scheduler tick so that changes, such as
+        to use_cpus, apply straight away
         """
-        if time() - self.last_config_check > self.config_check_interval:
+        if self.config_watcher.changed():
             success = self._get_config(critical=False)
-            self.last_config_check = time()
+            self.config_watcher.stat_interval = self.config_check_interval
 
     def _update_progress(self, last_time, num_sims, instances, max_inst):
         """
         Update progress bar - all times in seconds
         """
-        from datetime import timedelta
-        if time() - last_time > 1.0:
-            sec_elapsed = int(time() - self.start_time)
+        if time() - last_time > PROGRESS_INTERVAL:
+            now = time()
+            sec_elapsed = int(now - self.start_time)
             time_elpsd = str(timedelta(seconds=sec_elapsed))
 
             ncomplete = self.completed
-            pc_complete = max(float(ncomplete) / float(num_sims), 0.0000001)
-            prcnt = round(pc_complete * 100.0, 1)
-
-            t_left = int(sec_elapsed / pc_complete - sec_elapsed)
-            time_left = str(timedelta(seconds=t_left))
+            pc_complete = max(float(ncomplete) / float(max(num_sims, 1)), 0.0000001)
+            prcnt = '{}%'.format(round(pc_complete * 100.0, 1))
+            time_left, rate = self._estimate_left(now, max(num_sims - ncomplete, 0), max_inst)
+
+            # totals are not known until the simulations directory has been scanned
+            # ======================================================================
+            if self.discovery is not None and not self.discovery.finished:
+                prcnt = 'of {}+'.format(num_sims)
+                time_left += '+'
             stdout.flush()
 
-            line_frag = 'Done: {} ({}%)\t Fail: {}\tWarn: {} '.format(ncomplete, prcnt, self.failed, self.warn_count)
+            line_frag = 'Done: {} ({})\t Fail: {}\tWarn: {} '.format(ncomplete, prcnt, self.failed, self.warn_count)
 
             line = ('\r' + line_frag +  'Taken: {}\tLeft: {}\tCPUs: {}'.format(time_elpsd, time_left, max_inst))
+            if self.deleter is not None:
+                line += '\tDel: {}'.format(self.deleter.depth())
+            if self.retries is not None:
+                line += '\tRetry: {}'.format(self.retries.num_pending)
             padding = ' ' * (79 - len(line))
             line += padding
             stdout.write(line)
             last_time = time()
 
+            if self.shard_recorder is not None:
+                self._record_shard()
+
             # send message to parent
             # ======================
             if self.client is not None:
-                bs = bytes(line_frag, 'utf-8')
+                bs = bytes(line_frag + 'Left: {}\tRate: {}/min'.format(time_left, rate), 'utf-8')
                 try:
                     self.client.sendall(bs)
                 except OSError as err:
@@ -411,6 +1414,55 @@ class RunSites(object):
 
         return last_time
 
+    def _record_shard(self, complete = False):
+        """
+        progress of this shard for merging
+        """
+        discovery = self.discovery
+        try:
+            self.shard_recorder.update(discovery.num_found, discovery.num_sims, self.completed, self.failed, complete)
+        except OSError as err:
+            self.lgr.warning(WARN_STR + 'could not write shard progress: {}'.format(err))
+            self.shard_recorder = None
+
+    def _estimate_left(self, now, remaining, max_inst):
+        """
+        return the time left as expected (earliest-latest) and the throughput in simulations per minute
+        when coordinating, concurrency is that reported by the workers rather than the workday window
+        """
+        if self.eta is None:
+            return '?', '?'
+
+        self.eta.sample(now, max_inst)
+        if self.eta_follows_window:
+            estimate = self.eta.estimate(now, remaining, max_inst, self._eta_cap, self._next_window_change)
+        else:
+            estimate = self.eta.estimate(now, remaining, max_inst)
+        if estimate is None:
+            return '?', '?'
+
+        expected, earliest, latest = [('?' if secs is None else str(timedelta(seconds = int(secs))))
+                                                                                            for secs in estimate]
+        rate_per_slot = self.eta.rate(now)[0]
+        rate = '?' if rate_per_slot is None else '{:.1f}'.format(rate_per_slot * max_inst * 60.0)
+        if remaining == 0:
+            return expected, rate
+        return '{} ({}-{})'.format(expected, earliest, latest), rate
+
+    def _wait_timeout(self, instances, last_time):
+        """
+        Returns the time in seconds the scheduler can block before the next progress update or instance timeout
+        """
+        now = time()
+        wait_secs = last_time + PROGRESS_INTERVAL - now
+        next_due = self.watchdog.next_due()
+        if next_due is not None:
+            wait_secs = min(wait_secs, next_due - now)
+        if any(self._awaiting_eof(inst) for inst in instances):
+            wait_secs = min(wait_secs, EOF_POLL)
+
+        return max(wait_secs, 0.01)
+
     def _within_times(self, dt, starthour, startminute, endhour, endminute):
         """
         Determines if the time is within the specified boundaries
@@ -426,142 +1478,500 @@ class RunSites(object):
             within = True
         return within
 
-    def run_ecosse(self):
+    def _open_journal(self):
+        """
+        start recording launches and outcomes if requested
         """
+        if self.use_journal:
+            try:
+                self.journal = Journal(self.run_dir, self.resume_frm_prev, self._output_suffix())
+            except OSError as err:
+                self.lgr.warning(WARN_STR + 'unable to open journal, simulations will not be recorded: ' + str(err))
 
+    def _output_tag(self):
         """
-        self._display_headers()
-        sim_num = 0         # No. of sims that have run & are currently running
-        self.completed = 0  # No. of sims that have completed successfully
-        self.failed = 0     # No. of sims that failed to complete due to error
-        self.warn_count = 0   # No. of warnings
-        instances = []      # List containing a dict about each subprocess
-        self.start_time = time()
+        distinguishes the files written by this process when others write to the same results directory: workers
+        by host and process id, shards by their index
+        """
+        if self.worker is not None:
+            return '{}-{}'.format(gethostname(), getpid())
+        if self.shard is not None:
+            return shard_suffix(*self.shard)[1:]
+        return None
 
-        last_time = time()
-        for directory, subdirs_raw, files in walk(self.run_dir):
-            num_sims = len(subdirs_raw)
-            max_isim = num_sims - 1
-            break
+    def _output_suffix(self):
+        tag = self._output_tag()
+        return '' if tag is None else '_' + tag
 
-        if num_sims == 0:
-            print(ERROR_STR + 'no sub-directories under path ' + self.run_dir)
+    def _results_dir(self):
+
+        if self.output_dir is None:
+            return self.run_dir + '_results'
+        return self.output_dir
+
+    def _open_metrics(self):
+        """
+        start recording the resources used by each simulation if requested
+        """
+        if not self.use_metrics:
+            return
+        try:
+            self.metrics = MetricsRecorder(self._results_dir(), self._output_suffix(), self.resume_frm_prev,
+                                                                                                self.region_degrees)
+        except OSError as err:
+            self.lgr.warning(WARN_STR + 'unable to open metrics file, resources will not be recorded: ' + str(err))
+
+    def _close_metrics(self):
+        """
+        write the summary of resources used and report the overall figures
+        """
+        try:
+            summary = self.metrics.close()
+        except OSError as err:
+            self.lgr.warning(WARN_STR + 'could not write metrics summary: ' + str(err))
+            summary = None
+        self.metrics = None
+        if summary is None or 'all' not in summary['all']:
             return
 
-        del directory
-        del files
-
-        # filter weather directories to leave only simulation directories
-        # ===============================================================
-        subdirs, subdirs_osgb = [], []
-        for subdir in subdirs_raw:
-            if subdir[0:5] == 'lat00':
-                subdirs.append(subdir)
-            elif subdir[:2].isupper():
-                subdirs_osgb.append(subdir)
-            else:
-                # make sure directory is valid
-                # ============================
-                if subdir.find('_') >= 0:
-                    eastng, nrthng = subdir.split('_')
-                    subdirs_osgb.append(subdir)
+        overall = summary['all']['all']
+        mess = 'Simulation wall time median {}s, 90th percentile {}s'.format(overall['wall']['p50'],
+                                                                                            overall['wall']['p90'])
+        if 'cpu' in overall:
+            mess += '; cpu time median {}s; peak memory 99th percentile {} MB'.format(overall['cpu']['p50'],
+                                                                                    overall['max_rss_mb']['p99'])
+        self.lgr.info(mess)
 
-        num_sims = len(subdirs)
-        if num_sims == 0:
-            num_sims = len(subdirs_osgb)
-            if num_sims == 0:
-                print(ERROR_STR + 'no lat/lon or OSGB sub-directories under path ' + self.run_dir)
+    def _open_deleter(self):
+        """
+        start the background deletion of successful simulation directories if requested
+        """
+        if not self.del_sim_dirs:
+            return
+        try:
+            self.deleter = Deleter(self.delete_threads, self.keep_outputs, join(self._results_dir(), 'kept'))
+        except OSError as err:
+            self.lgr.warning(WARN_STR + 'simulation directories will not be deleted: ' + str(err))
+
+    def _open_archiver(self):
+        """
+        start archiving successful simulations if requested
+        """
+        if not self.use_archive:
+            return
+        archive_dir = self.archive_dir
+        if archive_dir is None:
+            archive_dir = join(self._results_dir(), 'archive')
+        try:
+            self.archiver = ArchiveWriter(archive_dir, self._output_suffix(), self.archive_cells,
+                                                                    self.archive_compression, self.archive_files)
+        except OSError as err:
+            self.lgr.warning(WARN_STR + 'simulations will not be archived: ' + str(err))
+            return
+        print('Successful simulations will be archived in: ' + archive_dir)
+
+    def _close_archiver(self):
+        """
+        complete the last archive and hand the directories archived to the deleter
+        """
+        self.archiver.close()
+        self._drain_archived()
+        self.lgr.info('Archived {} simulations'.format(self.archiver.num_archived))
+        for mess in self.archiver.errors:
+            self.lgr.warning(WARN_STR + 'could not archive ' + mess)
+        self.archiver = None
+
+    def _open_collector(self):
+        """
+        start collecting output variables if any are configured, as NumPy chunks and optionally as rasters
+        """
+        if len(self.varnames) == 0:
+            return
+        if not HAVE_NUMPY:
+            self.lgr.warning(WARN_STR + 'numpy not available, output variables will not be collected')
+            return
+
+        out_dir = self._results_dir()
+        tag = self._output_tag()
+        prefix = 'chunk' if tag is None else 'chunk-' + tag
+        try:
+            self.collector = ResultsCollector(out_dir, self.varnames, self.results_batch, prefix)
+        except OSError as err:
+            self.lgr.warning(WARN_STR + 'could not create results directory {}: {}'.format(out_dir, err))
+            return
+        print('Output variables {} will be collected in: {}'.format(self.varnames, out_dir))
+
+        if self.output_rasters:
+            study_defn = read_study_definition(self.run_dir)
+            if study_defn is None:
+                self.lgr.warning(WARN_STR + 'study definition not found, output rasters will not be written')
                 return
+            try:
+                rasters_dir = join(out_dir, 'rasters' + self._output_suffix())
+                self.raster_writer = RasterWriter(rasters_dir, self.varnames, study_defn,
+                                                        max_soils = self.max_soils, flush_every = self.results_batch)
+            except (OSError, ValueError, KeyError) as err:
+                self.lgr.warning(WARN_STR + 'output rasters will not be written: {}'.format(err))
 
-            ref_sys_flag = 'OSGB'
-            subdirs = subdirs_osgb
+    def _start_discovery(self):
+        """
+        simulation directories are found in the background: the first instance is launched as soon as the first
+        directory is found and the total fills in as the scan proceeds
+        """
+        filter_func = None
+        if self.resume_frm_prev:
+            filter_func = self._check_simulations_performed()
+
+        # a shard takes its own directories before any are checked for having been performed
+        # ===================================================================================
+        if self.shard is not None:
+            shard_filter = self.shard_filter = ShardFilter(self.shard[0], self.shard[1], self.shard_by)
+            if filter_func is None:
+                filter_func = shard_filter
+            else:
+                resume_filter = filter_func
+                filter_func = lambda subdirs: resume_filter(shard_filter(subdirs))
+            self.lgr.info('Running shard {} of {} by {}'.format(self.shard[0], self.shard[1], self.shard_by))
+
+        self.discovery = Discovery(self.run_dir, filter_func, self.ref_sys)
+
+        # wall times recorded by earlier runs are read before this run's metrics file is opened
+        # ======================================================================================
+        if self.order == 'longest_first':
+            metrics_fnames = sorted(glob(join(self._results_dir(), 'spec_run_metrics*.tsv'))) + self.history_files
+            predictor = RuntimePredictor(metrics_fnames)
+            if not predictor.has_history:
+                self.lgr.warning(WARN_STR + 'no wall times from earlier runs, simulations with the largest input '
+                                                                                        'files will be launched first')
+                predictor = InputSizePredictor(self.run_dir, self.memo_exclude)
+            self.ordering = LongestFirstSource(self.discovery, predictor, self._cell_features)
+            self.discovery = self.ordering
+
+    def _open_memo(self):
+        """
+        hash the inputs of each simulation ahead of use, so that those with identical inputs are run once; the
+        digest includes the ECOSSE executable and user input so that outputs of a different model are not reused
+        """
+        cache_dir = self.memo_cache_dir
+        if cache_dir is None:
+            cache_dir = join(self._results_dir(), 'memo_cache')
+        try:
+            cache = MemoCache(cache_dir, self.memo_links)
+            prefix = '{}\0{}'.format(file_digest(self.exe_path), self.cmd)
+        except MEMO_ERRORS as err:
+            self.lgr.warning(WARN_STR + 'could not open memo cache {}, all simulations will be run: {}'
+                                                                                            .format(cache_dir, err))
+            return
+        self.memo = MemoSource(self.discovery, cache, self.run_dir, prefix, self.memo_exclude, self.memo_threads)
+        self.discovery = self.memo
+        self.lgr.info('Memoizing simulations with identical inputs using cache ' + cache_dir)
+
+    def _close_memo(self):
+        """
+        record the last simulations given outputs, then trim the cache to its permitted age and size
+        """
+        self._drain_memo(wait = True)
+        self.memo.close()
+        cache = self.memo.cache
+        self.lgr.info('Memo cache: outputs of {} simulations taken from earlier runs, {} shared within this run'
+                                                                .format(self.memo.num_cached, self.memo.num_shared))
+        try:
+            num_evicted, num_bytes = cache.evict(self.memo_max_gb * 1e9, self.memo_max_age_days * 86400)
+        except MEMO_ERRORS as err:
+            self.lgr.warning(WARN_STR + 'could not trim memo cache: {}'.format(err))
         else:
-            ref_sys_flag = 'WGS84'
+            if num_evicted > 0:
+                self.lgr.info('Evicted {} entries ({:.1f} MB) from memo cache'.format(num_evicted, num_bytes / 1e6))
+        cache.close()
+        self.memo = None
 
-        # skip simulations already performed if requested
-        # ===============================================
-        if self.resume_frm_prev:
-            subdirs, num_sims = self._check_simulations_performed(subdirs, num_sims)
-            if num_sims == 0:
-                print(ERROR_STR + 'no simulations to be processed under path ' + self.run_dir)
-                return
+    def _cell_features(self, subdir):
+        """
+        soil and region of a simulation directory, used to predict its wall time
+        """
+        lat_id, lon_id, soil_id = self._parse_sim_dir(subdir, self.discovery.ref_sys_flag)
+        return soil_id, region_key(lat_id, lon_id, self.region_degrees)
 
-        print('Number of simulation subdirectories: {}'.format(num_sims))
-        max_isim = num_sims - 1
-        while True:
-            self._update_config()
-            max_inst = self._get_max_inst()
-            last_time = self._update_progress(last_time, num_sims, instances, max_inst)
+    def _report_ordering(self, max_inst):
+        """
+        log what launching longest first is expected to have saved
+        """
+        if self.ordering is not None:
+            if self.ordering.predictor.has_history:
+                self.lgr.info(format_report(self.ordering.report(max_inst)))
+            self.ordering = None
 
-            # loop to check instances
-            # =======================
-            self._check_subprocs(instances)
-            for inst in instances:
-                if inst.finished:
-                    if inst.successful:
-                        pass
-                    else:
-                        self.lgr.error('Simulation failed: {0}'.format(inst.sim_dir))
-                        self.failed += 1
-                    instances.remove(inst)
-                    self.completed += 1
-
-                elif time() - inst.start_time > self.timeout:
-                    # ECOSSE has probably hung trying to spin-up
-                    # ==========================================
-                    self.lgr.error('Simulation timed out: {}'.format(sim_dir))
-                    if inst.inst.stdout is not None:
-                        inst.inst.stdout.close()
-                    inst.inst.terminate()
-                    self.failed += 1
-                    self.completed += 1
-                    instances.remove(inst)
-
-            if max_inst - len(instances) > 0:
-                for i in range(max_inst - len(instances)):
-                    if sim_num > max_isim:
-                        break
-                    sim_dir = join(self.run_dir, subdirs[sim_num])
-                    self._create_inst(instances, sim_num, sim_dir, ref_sys_flag)
-                    sim_num += 1
+    def _report_retries(self):
+        """
+        log how many failures were transient i.e. succeeded on a later attempt and how many persistent, and write
+        the outcome of every attempt of the simulations concerned to the results directory
+        """
+        if self.retries is None:
+            return
+
+        transient, persistent = self.retries.summary()
+        self.lgr.info('Retries: {} simulations succeeded after failing (transient), {} failed on every attempt '
+                                                                '(persistent)'.format(len(transient), len(persistent)))
+        if len(transient) + len(persistent) > 0:
+            try:
+                fname = self.retries.write_report(self._results_dir(), self._output_suffix())
+            except OSError as err:
+                self.lgr.warning(WARN_STR + 'could not write retries report: {}'.format(err))
             else:
-                sleep(0.05)
-            if len(instances) == 0:
-                break
+                self.lgr.info('Outcome of each attempt written to ' + fname)
+        self.retries = None
 
-        # Wait for the last remaining simulations to finish TODO: duplicate code
-        # =================================================
-        while len(instances) > 0:
-            self._check_subprocs(instances)
-            for inst in instances:
-                if inst.finished:
-                    if inst.successful:
-                        pass
-                    else:
-                        self.failed += 1
-                    self.completed += 1
-                    instances.remove(inst)
-                else:
-                    if time() - inst.start_time > self.timeout:
-                        # ECOSSE has probably hung trying to spin-up
-                        # ==========================================
-                        self.lgr.error('Simulation timed out: {}.'.format(sim_dir))
-                        if inst.inst.stdout is not None:
-                            inst.inst.stdout.close()
-                        inst.inst.terminate()
-                        self.failed += 1
-                        self.completed += 1
-                        instances.remove(inst)
-            sleep(0.05)
-            last_time = self._update_progress(last_time, num_sims, instances, max_inst)
+    def run_coordinator(self, port = COORDINATOR_PORT, bind = COORDINATOR_BIND):
+        """
+        hand out simulation directories to spec_run workers and record their results - no ECOSSE instances are
+        run by the coordinator itself
+        """
+        if self.cluster_token is None:
+            print(ERROR_STR + 'cluster_token must be set in the General group of the config file to coordinate')
+            return
+
+        self._display_headers()
+        self.completed = 0
+        self.failed = 0
+        self.warn_count = 0
+        self.start_time = time()
+        self.eta = EtaEstimator()
+        self.eta_follows_window = False
+
+        self._start_discovery()
+        self._open_journal()
+
+        try:
+            coordinator = Coordinator(self, self.discovery, self.cluster_token, port, bind)
+        except OSError as err:
+            print(ERROR_STR + 'could not listen on {} port {}: {}'.format(bind, port, err))
+            return
+        print('Coordinator listening on {}:{} ({})'.format(bind, coordinator.port, gethostname()))
 
+        last_time = time()
+        max_slots = 0
+        while not coordinator.is_complete():
+            self._update_config()
+            last_time = self._update_progress(last_time, self.discovery.num_sims, [], coordinator.total_inst())
+            max_slots = max(max_slots, coordinator.total_inst())
+            sleep(PROGRESS_INTERVAL / 4)
+
+        # give workers the chance to ask for more work and be told there is none
+        # =======================================================================
+        linger_end = time() + COORDINATOR_LINGER
+        while coordinator.num_workers() > 0 and time() < linger_end:
+            sleep(PROGRESS_INTERVAL / 4)
+        coordinator.close()
+
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+
+        self._report_ordering(max_slots)
         sleep(0.75) # delay so that result is reported
-        last_time = self._update_progress(self.start_time, num_sims, instances, max_inst)
+        self._update_progress(self.start_time, self.discovery.num_sims, [], 0)
         self.lgr.info('\nSimulations completed.')
 
         if self.client is not None:
             self.client.close()
 
+    def run_ecosse(self):
+        """
+        the connection to the GUI, if any, is closed however the run ends
+        """
+        try:
+            self._run_ecosse()
+        finally:
+            if self.client is not None:
+                self.client.close()
+                self.client = None
+
+    def _run_ecosse(self):
+        """
+
+        """
+        self._display_headers()
+        self.completed = 0  # No. of sims that have completed successfully
+        self.failed = 0     # No. of sims that failed to complete due to error
+        self.warn_count = 0   # No. of warnings
+        self.start_time = time()
+        self.eta = EtaEstimator()
+
+        if self.worker is None:
+            self._start_discovery()
+            self._open_journal()
+        else:
+            # cells are handed out by the coordinator, which also keeps the journal
+            # ======================================================================
+            if self.cluster_token is None:
+                print(ERROR_STR + 'cluster_token must be set in the General group of the config file to work for a '
+                                                                                                    'coordinator')
+                return
+            try:
+                self.discovery = RemoteSource(self, self.worker, self.cluster_token, self.batch_size)
+            except OSError as err:
+                print(ERROR_STR + 'could not connect to coordinator {}: {}'.format(self.worker, err))
+                return
+            self.reporter = self.discovery
+
+        self._open_collector()
+        self._open_metrics()
+        self._open_deleter()
+        self._open_archiver()
+        if self.shard is not None:
+            try:
+                self.shard_recorder = ShardRecorder(self._results_dir(), self.shard[0], self.shard[1], self.shard_by)
+            except OSError as err:
+                self.lgr.warning(WARN_STR + 'shard progress will not be recorded: {}'.format(err))
+
+        # identical simulations are weeded out before any are staged
+        # ==========================================================
+        if self.use_memo:
+            self._open_memo()
+
+        if self.staging_dir is not None:
+            try:
+                self.stager = Stager(self.staging_dir, self.staging_outputs, self.staging_threads)
+            except OSError as err:
+                self.lgr.warning(WARN_STR + 'could not create staging area, simulations will run in place: ' + str(err))
+            else:
+                self.discovery = StagedSource(self.discovery, self.stager, self.run_dir, self.staging_prefetch)
+
+        if self.max_attempts > 1:
+            self.retries = RetrySource(self.discovery, self.max_attempts, self.retry_delay, self.retry_backoff)
+            self.discovery = self.retries
+
+        engine = self.engine if self.engine_arg is None else self.engine_arg
+        if self.stdout_mode == 'capture' and os_name == 'nt':
+            self.lgr.warning(WARN_STR + 'stdout_mode capture needs a POSIX platform, output will go to stdout.txt')
+            self.stdout_mode = 'file'
+        if engine == 'asyncio':
+            max_inst = AsyncEngine(self).run(self.discovery)
+        else:
+            max_inst = self._schedule(self.discovery)
+
+        if self.memo is not None:
+            self._close_memo()
+
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+
+        if self.reporter is not None:
+            self.reporter.close()
+            self.reporter = None
+
+        if self.stager is not None:
+            self.stager.close()
+            self.stager = None
+
+        # directories still held have results which could not be written, so are not deleted
+        # ===================================================================================
+        if self.collector is not None:
+            try:
+                self.collector.close()
+            except (OSError, ValueError) as err:
+                self.lgr.warning(WARN_STR + 'could not write last results chunk: {}'.format(err))
+                self._keep_held()
+            self.lgr.info('Collected output variables for {} simulations'.format(self.collector.num_collected))
+            self.collector = None
+
+        if self.raster_writer is not None:
+            try:
+                self.raster_writer.close()
+            except (OSError, ValueError) as err:
+                self.lgr.warning(WARN_STR + 'could not flush rasters: {}'.format(err))
+                self._keep_held()
+            if self.raster_writer.num_outside > 0:
+                self.lgr.warning(WARN_STR + '{} simulations could not be placed on the output raster grid'
+                                                                            .format(self.raster_writer.num_outside))
+            self.raster_writer = None
+
+        if self.metrics is not None:
+            self._close_metrics()
+
+        self._report_ordering(max_inst)
+        self._report_retries()
+
+        if self.archiver is not None:
+            self._close_archiver()
+
+        if self.deleter is not None:
+            self.deleter.close()
+            self.lgr.info('Deleted {} simulation directories'.format(self.deleter.num_deleted))
+            for mess in self.deleter.errors:
+                self.lgr.warning(WARN_STR + 'could not delete simulation directory ' + mess)
+            self.deleter = None
+
+        # the shard is complete unless the simulations directory could not be scanned
+        # ============================================================================
+        if self.shard_recorder is not None:
+            self._record_shard(complete = self.discovery.error is None)
+            self.shard_recorder = None
+
+        discovery = self.discovery
+        num_sims = discovery.num_sims
+        if discovery.error is not None:
+            print(ERROR_STR + 'simulation directories could not be obtained: {}'.format(discovery.error))
+            return
+        if discovery.num_found == 0:
+            print(ERROR_STR + 'no lat/lon or OSGB sub-directories under path ' + self.run_dir)
+            return
+        if num_sims == 0:
+            self._report_nothing_to_do()
+            return
+
+        sleep(0.75) # delay so that result is reported
+        last_time = self._update_progress(self.start_time, num_sims, [], max_inst)
+        self.lgr.info('\nSimulations completed.')
+
+    def _report_nothing_to_do(self):
+        """
+        a shard reports on its own directories, num_found covers the whole study
+        """
+        num_found = self.discovery.num_found
+        if self.shard_filter is None:
+            print('Simulations are complete: {} simulations already performed - nothing to do'.format(num_found))
+            return
+
+        index, count = self.shard
+        num_assigned = self.shard_filter.num_assigned
+        if num_assigned == 0:
+            print('Shard {}/{}: none of the {} simulation directories found belong to this shard - nothing to do'
+                                                                                    .format(index, count, num_found))
+        else:
+            print('Shard {}/{} is complete: {} simulations already performed - nothing to do'
+                                                                                    .format(index, count, num_assigned))
+
+    def merge_shards(self):
+        """
+        combine the journals and rasters of the shards of a sharded run and report their progress
+        """
+        report = merge_shards(self.run_dir, self._results_dir())
+        if report['journal_cells'] is None:
+            print('No journals found in ' + self.run_dir)
+        else:
+            print('Merged journals: last events of {} simulations written to the journal'
+                                                                                    .format(report['journal_cells']))
+
+        completed = failed = 0
+        for rec in report['shards']:
+            status = 'complete' if rec['complete'] else 'updated {}'.format(
+                                                    datetime.fromtimestamp(rec['update_time']).strftime('%H:%M:%S'))
+            print('Shard {}/{} on {}: {} of {} done, {} failed - {}'.format(rec['shard'], rec['count'], rec['host'],
+                                                        rec['completed'], rec['num_sims'], rec['failed'], status))
+            completed += rec['completed']
+            failed += rec['failed']
+        if len(report['shards']) > 0:
+            num_complete = sum(1 for rec in report['shards'] if rec['complete'])
+            print('{} of {} shards complete: {} simulations done, {} failed'.format(num_complete,
+                                                                    len(report['shards']), completed, failed))
+        if len(report['missing']) > 0:
+            print(WARN_STR + 'no progress recorded for shards ' + ', '.join(report['missing']))
+        if report['rasters_merged'] > 0:
+            print('Merged rasters of {} shards into {}'.format(report['rasters_merged'],
+                                                                                join(self._results_dir(), 'rasters')))
+
 def main():
     """
     Entry point
@@ -571,14 +1981,49 @@ def main():
             usage = '{} configfile'.format(__prog__))
 
     argparser.add_argument('configfile', help = 'Full path of the config file.')
+    argparser.add_argument('--engine', choices = ENGINES, default = None,
+                                        help = 'Engine used to drive ECOSSE, overrides the config file setting.')
+    argparser.add_argument('--verify', action = 'store_true',
+                help = 'When resuming, rescan simulation directories for SUMMARY.OUT rather than trust the journal.')
+    argparser.add_argument('--coordinator', action = 'store_true',
+                help = 'Hand out simulation directories to workers on other hosts rather than run ECOSSE.')
+    argparser.add_argument('--port', type = int, default = COORDINATOR_PORT,
+                help = 'Port the coordinator listens on, default {}.'.format(COORDINATOR_PORT))
+    argparser.add_argument('--bind', default = COORDINATOR_BIND,
+                help = 'Address the coordinator listens on, default {}; use 0.0.0.0 to accept workers on other '
+                                                                                    'hosts.'.format(COORDINATOR_BIND))
+    argparser.add_argument('--worker', metavar = 'HOST:PORT', default = None,
+                help = 'Run ECOSSE on simulation directories handed out by the coordinator at HOST:PORT.')
+    argparser.add_argument('--batch', type = int, default = BATCH_SIZE,
+                help = 'Number of simulation directories a worker asks for at a time, default {}.'.format(BATCH_SIZE))
+    argparser.add_argument('--shard', metavar = 'I/N', default = None,
+                help = 'Run only the I-th of N parts of the study, I from 1 to N, e.g. as one task of an array job.')
+    argparser.add_argument('--shard-by', choices = SHARD_BY, default = 'hash',
+                help = 'How simulation directories are split between shards, default hash.')
+    argparser.add_argument('--merge', action = 'store_true',
+                help = 'Combine the journals and rasters written by the shards of a sharded run, then exit.')
     argparser.add_argument('--version', action = 'version', version = '{} {}'.format(__prog__, __version__),
                                                                         help = 'Display the version number.')
     args = argparser.parse_args()
 
     args.configfile = abspath(normpath(expanduser(expandvars(args.configfile))))
 
-    sim = RunSites(args.configfile)
-    sim.run_ecosse()
+    shard = None
+    if args.shard is not None:
+        if args.coordinator or args.worker is not None:
+            argparser.error('--shard cannot be used with --coordinator or --worker')
+        try:
+            shard = parse_shard(args.shard)
+        except ValueError as err:
+            argparser.error(str(err))
+
+    sim = RunSites(args.configfile, args.engine, args.verify, args.worker, args.batch, shard, args.shard_by)
+    if args.merge:
+        sim.merge_shards()
+    elif args.coordinator:
+        sim.run_coordinator(args.port, args.bind)
+    else:
+        sim.run_ecosse()
 
 if __name__ == '__main__':
     main()
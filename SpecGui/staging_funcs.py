@@ -0,0 +1,124 @@
+#-------------------------------------------------------------------------------
+# Name:        staging_funcs.py
+# Purpose:     run ECOSSE in a local scratch directory e.g. /dev/shm rather than on shared storage
+# Author:      Mike Martin
+# Created:     17/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#!/usr/bin/env python
+
+__prog__ = 'staging_funcs.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from os import getpid, makedirs
+from os.path import join, split, isfile
+from shutil import copytree, copy2, rmtree
+
+STAGING_OUTPUTS = ['SUMMARY.OUT']
+STAGING_THREADS = 4
+STAGING_PREFETCH = 8
+
+class Stager(object):
+    """
+    Copies simulation directories to a local scratch directory ahead of use, using a thread pool so that the
+    copying overlaps with running simulations, and copies the configured outputs back on success
+    The cell inputs must be self contained i.e. not refer to files outside the simulation directory by relative path
+    """
+    def __init__(self, staging_dir, outputs = None, nthreads = STAGING_THREADS):
+
+        self.scratch_dir = join(staging_dir, 'spec_run_{}'.format(getpid()))
+        makedirs(self.scratch_dir, exist_ok = True)
+        self.outputs = STAGING_OUTPUTS if outputs is None else outputs
+        self.executor = ThreadPoolExecutor(max_workers = nthreads)
+        self.futures = {}
+
+    def _copy_in(self, sim_dir):
+        work_dir = join(self.scratch_dir, split(sim_dir)[1])
+        rmtree(work_dir, ignore_errors = True)
+        copytree(sim_dir, work_dir)
+        return work_dir
+
+    def prefetch(self, sim_dir):
+        """
+        start copying a simulation directory in the background
+        """
+        if sim_dir not in self.futures:
+            self.futures[sim_dir] = self.executor.submit(self._copy_in, sim_dir)
+
+    def stage_in(self, sim_dir):
+        """
+        return the local copy of a simulation directory, waiting for the prefetch if necessary
+        raises OSError if the copy failed
+        """
+        future = self.futures.pop(sim_dir, None)
+        if future is None:
+            return self._copy_in(sim_dir)
+        return future.result()
+
+    def stage_out(self, sim_dir, work_dir, successful):
+        """
+        copy the configured outputs back on success or the redirected ECOSSE output on failure, then remove the
+        local copy. Returns the path of stdout.txt in the simulation directory if it was copied back
+        """
+        stdout_path = None
+        try:
+            if successful:
+                for fname in self.outputs:
+                    if isfile(join(work_dir, fname)):
+                        copy2(join(work_dir, fname), join(sim_dir, fname))
+            elif isfile(join(work_dir, 'stdout.txt')):
+                stdout_path = join(sim_dir, 'stdout.txt')
+                copy2(join(work_dir, 'stdout.txt'), stdout_path)
+        finally:
+            rmtree(work_dir, ignore_errors = True)
+
+        return stdout_path
+
+    def close(self):
+        self.executor.shutdown(wait = True)
+        for future in self.futures.values():
+            try:
+                rmtree(future.result(), ignore_errors = True)
+            except OSError:
+                pass
+        self.futures = {}
+        rmtree(self.scratch_dir, ignore_errors = True)
+
+class StagedSource(object):
+    """
+    Wraps a source of simulation subdirectories, such as Discovery, keeping the next few subdirectories in hand
+    so that they can be prefetched by the stager
+    """
+    def __init__(self, source, stager, run_dir, depth = STAGING_PREFETCH):
+
+        self.source = source
+        self.stager = stager
+        self.run_dir = run_dir
+        self.depth = depth
+        self.ahead = deque()
+
+    def __getattr__(self, name):
+        return getattr(self.source, name)
+
+    @property
+    def exhausted(self):
+        return self.source.exhausted and len(self.ahead) == 0
+
+    def _top_up(self, block, timeout):
+        while len(self.ahead) < self.depth:
+            subdir = self.source.get(block and len(self.ahead) == 0, timeout)
+            if subdir is None:
+                break
+            self.ahead.append(subdir)
+            self.stager.prefetch(join(self.run_dir, subdir))
+
+    def get(self, block = False, timeout = None):
+        self._top_up(block, timeout)
+        if len(self.ahead) == 0:
+            return None
+        subdir = self.ahead.popleft()
+        self._top_up(False, None)
+        return subdir
@@ -0,0 +1,85 @@
+#-------------------------------------------------------------------------------
+# Name:        conftest.py
+# Purpose:     shared fixtures for the spec_run tests, which run studies of fake ECOSSE cells
+# Author:      Mike Martin
+# Created:     17/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#!/usr/bin/env python
+
+__prog__ = 'conftest.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+import sys
+from json import dump as json_dump
+from os.path import abspath, dirname, isfile, join
+
+import pytest
+
+# the SpecGui modules import each other as top level modules
+# ==========================================================
+SPECGUI_DIR = dirname(dirname(abspath(__file__)))
+if SPECGUI_DIR not in sys.path:
+    sys.path.insert(0, SPECGUI_DIR)
+
+from fake_ecosse import FAKE_CONFIG_ENV, DEFAULT_CONFIG
+
+EVENTS_FNAME = 'events.log'     # appended to by the stand-in executable, next to the config file
+
+def write_config(config_file, config):
+    with open(config_file, 'w') as fobj:
+        json_dump(config, fobj, indent = 2)
+
+def read_events(config_file):
+    """
+    (start time, end time, cell) of each run of the stand-in executable for the study of config_file, in the order
+    they ended
+    """
+    events = []
+    events_log = join(dirname(config_file), EVENTS_FNAME)
+    if isfile(events_log):
+        with open(events_log, 'r') as fobj:
+            for line in fobj:
+                parts = line.rstrip('\n').split('\t')
+                if len(parts) == 3:
+                    events.append((float(parts[0]), float(parts[1]), parts[2]))
+    return events
+
+@pytest.fixture
+def study(tmp_path, monkeypatch):
+    """
+    returns a function which creates a simulations directory of fake ECOSSE cells together with a spec_run config
+    file, returning the path of the config file; settings are added to the groups of the config file by keyword
+    spec_run needs set_up_logging, which is not part of this repository, so tests using a study are skipped
+    without it
+    """
+    pytest.importorskip('set_up_logging')
+    from bench_spec_run import make_sims_tree, install_fake_ecosse, STUDY
+
+    monkeypatch.delenv(FAKE_CONFIG_ENV, raising = False)     # restored once the test is done
+
+    def make(num_cells = 8, fake = None, general = None, simulations = None, speed = None, layout = 'latlon'):
+
+        sims_dir = join(str(tmp_path), STUDY)
+        make_sims_tree(sims_dir, num_cells, layout)
+        fake_config = dict(DEFAULT_CONFIG, output_kb = 1, events_log = join(str(tmp_path), EVENTS_FNAME))
+        fake_config.update(fake or {})
+        exe_path = install_fake_ecosse(str(tmp_path), fake_config)
+
+        config = {
+            'General': {'config_check_interval': 3600, 'cropName': 'limited_data'},
+            'Simulations': {'delete_sim_dirs': False, 'exepath': exe_path, 'output_variables': ['total_soc'],
+                            'resume_frm_prev': False, 'sims_dir': sims_dir, 'timeout': 60},
+            'Speed': {'use_cpus': 4, 'fast': 1, 'slow': 1, 'workdays': [], 'start_work': '09:00',
+                      'end_work': '17:00'},
+            'Logging': {'log_dir': str(tmp_path), 'level': 'INFO'}
+        }
+        config['General'].update(general or {})
+        config['Simulations'].update(simulations or {})
+        config['Speed'].update(speed or {})
+        config_file = join(str(tmp_path), 'config.json')
+        write_config(config_file, config)
+        return config_file
+
+    return make
@@ -0,0 +1,60 @@
+#-------------------------------------------------------------------------------
+# Name:        test_capture.py
+# Purpose:     instances whose output pipe is held open by a process they forked must not hold up the run
+# Author:      Mike Martin
+# Created:     17/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#!/usr/bin/env python
+
+__prog__ = 'test_capture.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+import os
+from time import time
+
+import pytest
+
+import async_engine
+import capture_funcs
+
+pytestmark = pytest.mark.skipif(os.name == 'nt', reason = 'stdout_mode capture needs a POSIX platform')
+
+ORPHAN_SECS = 30        # processes left holding the pipes outlive any wait which is not bounded
+MAX_RUN_SECS = 20
+
+@pytest.fixture
+def spec_run(study, monkeypatch):
+    import spec_run
+    for module in (spec_run, async_engine, capture_funcs):
+        monkeypatch.setattr(module, 'EOF_WAIT', 0.5)
+    return spec_run
+
+@pytest.mark.parametrize('engine', ['sync', 'asyncio'])
+def test_pipe_held_open_after_success(study, spec_run, engine):
+
+    config_file = study(4, fake = {'orphan_fraction': 1.0, 'orphan_secs': ORPHAN_SECS},
+                                                                speed = {'stdout_mode': 'capture', 'engine': engine})
+    sim = spec_run.RunSites(config_file)
+    start_time = time()
+    sim.run_ecosse()
+
+    assert time() - start_time < MAX_RUN_SECS
+    assert sim.completed == 4
+    assert sim.failed == 0
+
+@pytest.mark.parametrize('engine', ['sync', 'asyncio'])
+def test_pipe_held_open_after_kill(study, spec_run, engine):
+
+    config_file = study(2, fake = {'orphan_fraction': 1.0, 'orphan_secs': ORPHAN_SECS, 'hang_fraction': 1.0,
+                                                                                            'ignore_term': True},
+                                                        simulations = {'timeout': 1},
+                                                        speed = {'stdout_mode': 'capture', 'engine': engine,
+                                                                                                'kill_grace': 0.5})
+    sim = spec_run.RunSites(config_file)
+    start_time = time()
+    sim.run_ecosse()
+
+    assert time() - start_time < MAX_RUN_SECS
+    assert sim.failed == 2
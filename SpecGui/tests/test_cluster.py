@@ -0,0 +1,110 @@
+#-------------------------------------------------------------------------------
+# Name:        test_cluster.py
+# Purpose:     a coordinator and two workers on this host complete a study, each cell run once
+# Author:      Mike Martin
+# Created:     17/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#!/usr/bin/env python
+
+__prog__ = 'test_cluster.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+import os
+import socket
+import sys
+from collections import Counter
+from json import load as json_load
+from os import listdir
+from os.path import dirname, join
+from subprocess import Popen, PIPE, STDOUT
+from time import sleep, time
+
+import pytest
+
+from conftest import SPECGUI_DIR, read_events, write_config
+from journal_funcs import read_journal
+
+TOKEN = 'test-token'
+BIND = '127.0.0.1'
+NUM_CELLS = 12
+START_SECS = 30
+RUN_SECS = 120
+
+def _free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind((BIND, 0))
+        return sock.getsockname()[1]
+
+def _spec_run(config_file, *args, stdout = PIPE):
+    """
+    spec_run in a process of its own, finding the modules this process has found
+    """
+    env = dict(os.environ, PYTHONPATH = os.pathsep.join(sys.path))
+    cmd = [sys.executable, '-u', join(SPECGUI_DIR, 'spec_run.py'), config_file] + list(args)
+    return Popen(cmd, env = env, stdin = PIPE, stdout = stdout, stderr = STDOUT, universal_newlines = True)
+
+def _wait_listening(coordinator_log):
+    deadline = time() + START_SECS
+    while time() < deadline:
+        with open(coordinator_log, 'r') as fobj:
+            if 'Coordinator listening' in fobj.read():
+                return True
+        sleep(0.1)
+    return False
+
+@pytest.fixture
+def cluster(study):
+    """
+    a coordinator listening on this host for the workers of a study, the config file of the study and the address
+    of the coordinator; the coordinator's output is written to a file next to the config file
+    """
+    config_file = study(NUM_CELLS, fake = {'mean': 0.2}, general = {'cluster_token': TOKEN})
+    coordinator_log = join(dirname(config_file), 'coordinator.txt')
+    port = _free_port()
+
+    with open(coordinator_log, 'w') as fobj:
+        coordinator = _spec_run(config_file, '--coordinator', '--port', str(port), '--bind', BIND, stdout = fobj)
+    try:
+        assert _wait_listening(coordinator_log)
+        yield coordinator, config_file, '{}:{}'.format(BIND, port)
+    finally:
+        if coordinator.poll() is None:
+            coordinator.kill()
+        coordinator.wait()
+
+def test_coordinator_and_two_workers(cluster):
+
+    coordinator, config_file, address = cluster
+    with open(config_file, 'r') as fobj:
+        config = json_load(fobj)
+    sims_dir = config['Simulations']['sims_dir']
+
+    # a worker without the token is turned away before it is given any cells
+    # =======================================================================
+    bad_config_file = join(dirname(config_file), 'bad_config.json')
+    config['General']['cluster_token'] = 'not-' + TOKEN
+    write_config(bad_config_file, config)
+    intruder = _spec_run(bad_config_file, '--worker', address)
+    out = intruder.communicate(timeout = RUN_SECS)[0]
+    assert 'cluster token not accepted' in out
+    assert len(read_events(config_file)) == 0
+
+    workers = [_spec_run(config_file, '--worker', address, '--batch', '2') for iworker in range(2)]
+    for worker in workers:
+        worker.communicate(timeout = RUN_SECS)
+        assert worker.returncode == 0
+    coordinator.wait(timeout = RUN_SECS)
+    assert coordinator.returncode == 0
+
+    # every cell is run once by one worker or the other and the coordinator's journal records them all
+    # =================================================================================================
+    subdirs = set(subdir for subdir in listdir(sims_dir) if subdir.startswith('lat'))
+    attempts = Counter(cell for start_time, end_time, cell in read_events(config_file))
+    assert set(attempts) == subdirs
+    assert all(num_attempts == 1 for num_attempts in attempts.values())
+
+    journal = read_journal(sims_dir)
+    assert set(journal) == subdirs
+    assert all(event == 'success' for event in journal.values())
@@ -0,0 +1,81 @@
+#-------------------------------------------------------------------------------
+# Name:        test_config.py
+# Purpose:     a config file changed during a run is applied only if valid, and startup-only settings are kept
+# Author:      Mike Martin
+# Created:     17/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#!/usr/bin/env python
+
+__prog__ = 'test_config.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+from json import load as json_load
+
+import pytest
+
+from conftest import write_config
+
+@pytest.fixture
+def reload(study):
+    """
+    returns the loaded RunSites and a function which rewrites its config file with changes to one group then
+    rereads it as is done during a run, returning whether the changes were applied
+    """
+    import spec_run
+
+    config_file = study(2, simulations = {'max_attempts': 2, 'retry_delay': 5})
+    sim = spec_run.RunSites(config_file)
+
+    def change(grp, **attribs):
+        with open(config_file, 'r') as fobj:
+            config = json_load(fobj)
+        config[grp].update(attribs)
+        write_config(config_file, config)
+        return sim._get_config(critical = False)
+
+    return sim, change
+
+@pytest.mark.parametrize('grp, attrib, value', [('Simulations', 'retry_delay', 'soon'),
+                                                ('Simulations', 'timeout', -1),
+                                                ('General', 'config_check_interval', '10'),
+                                                ('Speed', 'use_cpus', -1),
+                                                ('Speed', 'workdays', 'Monday'),
+                                                ('Speed', 'end_work', '25:00')])
+def test_bad_reload_rejected(reload, grp, attrib, value):
+
+    sim, change = reload
+    timeout = sim.timeout
+
+    # a bad value stops the whole file being applied, a good change alongside it included
+    # ====================================================================================
+    with open(sim.configfile, 'r') as fobj:
+        config = json_load(fobj)
+    config['Simulations']['timeout'] = timeout + 1
+    config[grp][attrib] = value
+    write_config(sim.configfile, config)
+
+    assert not sim._get_config(critical = False)
+    assert sim.timeout == timeout
+    assert sim.retry_delay == 5
+
+def test_good_reload_applied(reload):
+
+    sim, change = reload
+    assert change('Simulations', retry_delay = 1)
+    assert sim.retry_delay == 1
+
+def test_startup_attribs_kept(reload):
+
+    sim, change = reload
+    assert change('Simulations', max_attempts = 5, retry_delay = 1)
+    assert sim.max_attempts == 2
+    assert sim.retry_delay == 1
+
+    # a startup-only setting is put back before the file is checked, so even a bad value does not stop a reload
+    # ==========================================================================================================
+    stdout_mode = sim.stdout_mode
+    assert change('Speed', stdout_mode = 'pipe', use_cpus = 2)
+    assert sim.stdout_mode == stdout_mode
+    assert sim.requested_cpus == 2
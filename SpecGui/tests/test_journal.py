@@ -0,0 +1,62 @@
+#-------------------------------------------------------------------------------
+# Name:        test_journal.py
+# Purpose:     a run resumed from the journal of a run killed mid-write reruns only what was not recorded as done
+# Author:      Mike Martin
+# Created:     17/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#!/usr/bin/env python
+
+__prog__ = 'test_journal.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+from collections import Counter
+from json import load as json_load
+from os.path import join
+
+from conftest import read_events, write_config
+from journal_funcs import JOURNAL_FNAME, read_journal
+
+def test_resume_after_torn_line(study):
+    import spec_run
+
+    config_file = study(8)
+    spec_run.RunSites(config_file).run_ecosse()
+
+    with open(config_file, 'r') as fobj:
+        config = json_load(fobj)
+    sims_dir = config['Simulations']['sims_dir']
+    journal_fname = join(sims_dir, JOURNAL_FNAME.format(''))
+
+    # the last line records a success: cut it part way through as if the run had been killed while writing it
+    # ========================================================================================================
+    with open(journal_fname, 'rb') as fobj:
+        lines = fobj.readlines()
+    torn_cell = lines[-1].decode().rstrip('\n').split('\t')[2]
+    assert lines[-1].decode().split('\t')[1] == 'success'
+    with open(journal_fname, 'wb') as fobj:
+        fobj.writelines(lines[:-1])
+        fobj.write(lines[-1][:len(lines[-1]) // 2])
+
+    assert read_journal(sims_dir)[torn_cell] == 'launch'
+
+    config['Simulations']['resume_frm_prev'] = True
+    write_config(config_file, config)
+    sim = spec_run.RunSites(config_file)
+    sim.run_ecosse()
+
+    # only the simulation whose success was torn is run again, and the journal is whole once more
+    # ============================================================================================
+    attempts = Counter(cell for start_time, end_time, cell in read_events(config_file))
+    assert len(attempts) == 8
+    assert [cell for cell, num_runs in attempts.items() if num_runs > 1] == [torn_cell]
+    assert sim.completed == 1
+
+    with open(journal_fname, 'r') as fobj:
+        text = fobj.read()
+    assert text.endswith('\n')
+    assert all(len(line.split('\t')) == 3 for line in text.splitlines())
+    journal = read_journal(sims_dir)
+    assert len(journal) == 8
+    assert all(event == 'success' for event in journal.values())
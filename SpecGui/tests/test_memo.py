@@ -0,0 +1,57 @@
+#-------------------------------------------------------------------------------
+# Name:        test_memo.py
+# Purpose:     simulations with identical inputs are run once, their outputs shared in the run and across runs
+# Author:      Mike Martin
+# Created:     17/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#!/usr/bin/env python
+
+__prog__ = 'test_memo.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+from json import load as json_load
+from os import listdir
+from os.path import isfile, join
+
+import pytest
+
+from conftest import read_events
+
+@pytest.mark.parametrize('engine', ['sync', 'asyncio'])
+def test_memo_fan_out_and_hits(study, engine):
+    import spec_run
+
+    config_file = study(8, simulations = {'memo': True}, speed = {'engine': engine})
+    with open(config_file, 'r') as fobj:
+        sims_dir = json_load(fobj)['Simulations']['sims_dir']
+    subdirs = sorted(subdir for subdir in listdir(sims_dir) if subdir.startswith('lat'))
+
+    # every cell has the same inputs bar one
+    # ======================================
+    odd_cell = subdirs[-1]
+    with open(join(sims_dir, odd_cell, 'input.txt'), 'w') as fobj:
+        fobj.write('fake ECOSSE input with a difference\n')
+
+    sim = spec_run.RunSites(config_file)
+    sim.run_ecosse()
+
+    # one representative of the seven identical cells is run, its outputs fanned out to the other six
+    # ================================================================================================
+    runs = [cell for start_time, end_time, cell in read_events(config_file)]
+    assert len(runs) == 2
+    assert odd_cell in runs
+    assert sim.completed == 8
+    assert sim.failed == 0
+    for subdir in subdirs:
+        assert isfile(join(sims_dir, subdir, 'SUMMARY.OUT'))
+
+    # a second run takes every output from the cache
+    # ==============================================
+    sim = spec_run.RunSites(config_file)
+    sim.run_ecosse()
+
+    assert len(read_events(config_file)) == 2
+    assert sim.completed == 8
+    assert sim.failed == 0
@@ -0,0 +1,57 @@
+#-------------------------------------------------------------------------------
+# Name:        test_retry.py
+# Purpose:     failed simulations are run again, after a delay growing with each attempt, up to max_attempts
+# Author:      Mike Martin
+# Created:     17/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#!/usr/bin/env python
+
+__prog__ = 'test_retry.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+from collections import Counter
+from random import Random
+from zlib import crc32
+
+from conftest import read_events
+
+FAIL_FRACTION = 0.5
+MAX_ATTEMPTS = 3
+RETRY_DELAY = 0.5
+RETRY_BACKOFF = 2.0
+
+def _fails(cell):
+    """
+    the stand-in executable fails a cell by its name, so every attempt of a failing cell fails
+    """
+    return Random(crc32(bytes(cell, 'utf-8'))).random() < FAIL_FRACTION
+
+def test_retry_with_backoff(study):
+    import spec_run
+
+    config_file = study(8, fake = {'fail_fraction': FAIL_FRACTION},
+                        simulations = {'max_attempts': MAX_ATTEMPTS, 'retry_delay': RETRY_DELAY,
+                                                                                'retry_backoff': RETRY_BACKOFF})
+    sim = spec_run.RunSites(config_file)
+    sim.run_ecosse()
+
+    events = read_events(config_file)
+    attempts = Counter(cell for start_time, end_time, cell in events)
+    failing = [cell for cell in attempts if _fails(cell)]
+    assert len(attempts) == 8
+    assert 0 < len(failing) < 8
+
+    for cell, num_attempts in attempts.items():
+        assert num_attempts == (MAX_ATTEMPTS if cell in failing else 1)
+    assert sim.completed == 8
+    assert sim.failed == len(failing)
+
+    # each retry waits at least the delay for its attempt after the previous attempt ended
+    # ====================================================================================
+    for cell in failing:
+        runs = sorted((start_time, end_time) for start_time, end_time, name in events if name == cell)
+        for attempt in range(1, MAX_ATTEMPTS):
+            delay = RETRY_DELAY * RETRY_BACKOFF ** (attempt - 1)
+            assert runs[attempt][0] - runs[attempt - 1][1] >= delay
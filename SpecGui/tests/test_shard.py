@@ -0,0 +1,62 @@
+#-------------------------------------------------------------------------------
+# Name:        test_shard.py
+# Purpose:     the shards of a sharded run split the study between them and --merge combines their records
+# Author:      Mike Martin
+# Created:     17/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#!/usr/bin/env python
+
+__prog__ = 'test_shard.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+from collections import Counter
+from json import load as json_load
+from os import listdir
+
+import pytest
+
+from conftest import read_events
+from journal_funcs import read_journal
+from shard_funcs import SHARD_BY
+
+NUM_SHARDS = 3
+
+@pytest.mark.parametrize('shard_by', SHARD_BY)
+def test_shards_and_merge(study, shard_by, capsys):
+    import spec_run
+
+    config_file = study(12)
+    with open(config_file, 'r') as fobj:
+        sims_dir = json_load(fobj)['Simulations']['sims_dir']
+    subdirs = set(subdir for subdir in listdir(sims_dir) if subdir.startswith('lat'))
+
+    num_runs = 0
+    for index in range(1, NUM_SHARDS + 1):
+        sim = spec_run.RunSites(config_file, shard = (index, NUM_SHARDS), shard_by = shard_by)
+        sim.run_ecosse()
+        assert sim.failed == 0
+        num_runs += sim.completed
+
+        # a shard with no cells says so rather than reporting the study as already performed
+        # ===================================================================================
+        if sim.completed == 0:
+            assert 'none of the {} simulation directories found belong to this shard'.format(len(subdirs)) in \
+                                                                                            capsys.readouterr().out
+
+    # every cell is run by exactly one shard
+    # ======================================
+    attempts = Counter(cell for start_time, end_time, cell in read_events(config_file))
+    assert set(attempts) == subdirs
+    assert all(num_attempts == 1 for num_attempts in attempts.values())
+    assert num_runs == len(subdirs)
+
+    capsys.readouterr()
+    spec_run.RunSites(config_file).merge_shards()
+    out = capsys.readouterr().out
+    assert '{0} of {0} shards complete: {1} simulations done, 0 failed'.format(NUM_SHARDS, len(subdirs)) in out
+
+    journal = read_journal(sims_dir)
+    assert set(journal) == subdirs
+    assert all(event == 'success' for event in journal.values())
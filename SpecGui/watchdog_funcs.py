@@ -0,0 +1,104 @@
+#-------------------------------------------------------------------------------
+# Name:        watchdog_funcs.py
+# Purpose:     terminate ECOSSE instances which overrun their timeout, escalating to kill if they do not stop
+# Author:      Mike Martin
+# Created:     17/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#!/usr/bin/env python
+
+__prog__ = 'watchdog_funcs.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+import os
+import signal
+from heapq import heappush, heappop, heapify
+
+KILL_GRACE = 5.0        # seconds between asking an instance to terminate and killing it
+COMPACT_MIN = 64        # entries of finished instances tolerated before the heap is compacted
+
+def signal_instance(proc, kill = False, group = False):
+    """
+    terminate or kill an instance, or its whole process group when it was started in a session of its own so that
+    any processes ECOSSE has forked go too. Processes which have already gone are ignored
+    proc is either a Popen or an asyncio subprocess
+    """
+    try:
+        if group and hasattr(os, 'killpg'):
+            os.killpg(proc.pid, signal.SIGKILL if kill else signal.SIGTERM)
+        elif kill:
+            proc.kill()
+        else:
+            proc.terminate()
+    except (ProcessLookupError, PermissionError):
+        pass
+
+class Watchdog(object):
+    """
+    Deadlines of running instances in a min-heap so that only instances which are due cost anything at each tick
+    An instance which overruns is asked to terminate and killed if it is still running after the grace period; it
+    keeps its slot until it has been reaped. Entries of instances which finish in time are discarded lazily
+    """
+    def __init__(self, grace = KILL_GRACE, group = False):
+
+        self.grace = grace
+        self.group = group
+        self.heap = []      # (due time, sequence, instance, kill)
+        self.seq = 0
+        self.num_active = 0
+
+    def _push(self, due, inst, kill):
+        heappush(self.heap, (due, self.seq, inst, kill))
+        self.seq += 1
+
+    def add(self, inst):
+        """
+        watch a newly launched instance, which is due to finish within inst.timeout seconds of its start
+        """
+        self._push(inst.start_time + inst.timeout, inst, False)
+        self.num_active += 1
+        if len(self.heap) > 2 * self.num_active + COMPACT_MIN:
+            self.heap = [entry for entry in self.heap if not entry[2].finished]
+            heapify(self.heap)
+
+    def remove(self, inst):
+        """
+        an instance has been reaped: clear up any processes it forked if it was terminated
+        """
+        self.num_active -= 1
+        if inst.timed_out and self.group:
+            signal_instance(inst.inst, True, True)
+
+    def _discard_finished(self):
+        while len(self.heap) > 0 and self.heap[0][2].finished:
+            heappop(self.heap)
+
+    def next_due(self):
+        """
+        time of the next deadline, or None if no instances are running
+        """
+        self._discard_finished()
+        if len(self.heap) == 0:
+            return None
+        return self.heap[0][0]
+
+    def expire(self, now):
+        """
+        terminate instances whose deadline has passed and kill those which have not stopped within the grace period
+        returns the lists of instances terminated and killed
+        """
+        terminated, killed = [], []
+        self._discard_finished()
+        while len(self.heap) > 0 and self.heap[0][0] <= now:
+            due, seq, inst, kill = heappop(self.heap)
+            if inst.finished or inst.exit_status is not None:
+                continue    # exited, possibly waiting for the last of its output
+            signal_instance(inst.inst, kill, self.group)
+            if kill:
+                killed.append(inst)
+            else:
+                inst.timed_out = True
+                self._push(now + self.grace, inst, True)
+                terminated.append(inst)
+        return terminated, killed